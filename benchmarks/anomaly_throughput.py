@@ -0,0 +1,47 @@
+"""
+Throughput benchmark for the streaming anomaly detector.
+
+Feeds a synthetic fleet (devices reporting once a second on NR or LTE) through AnomalyDetector.update in batches of several sizes and reports
+readings scored per second.
+
+    python -m benchmarks.anomaly_throughput --rows 1000000 --devices 100
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.anomaly import AnomalyDetector
+
+
+def make_readings(rows, devices, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(rows) // devices, unit="s"),
+        "Device_ID": (np.arange(rows) % devices).astype(str),
+        # A third of the devices on NR, the rest on LTE
+        "Network_Type": pd.Categorical(np.where(np.arange(rows) % devices % 3 == 0, "NR", "LTE")),
+        "Signal_dBm": np.round(rng.normal(-90, 5, rows)),
+        "Latency_ms": rng.gamma(4, 10, rows)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anomaly detector throughput benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    readings = make_readings(args.rows, args.devices)
+    for batch_size in args.batch_sizes:
+        detector = AnomalyDetector()
+        found = 0
+        started = time.perf_counter()
+        for start in range(0, args.rows, batch_size):
+            found += len(detector.update(readings.iloc[start:start + batch_size]))
+        elapsed = time.perf_counter() - started
+        print(f"Batch {batch_size:>7,}: {args.rows / elapsed:>10,.0f} readings/s ({found:,} anomalies)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Disk footprint and query latency of a store before and after compaction
+and retention.
+
+Writes a synthetic year of readings (src.synth, a few devices) the way the
+ingestion server does, in many small batches that each add a file to their
+device/day partitions, and keeps the 1m/1h/1d rollups next to them. Then
+measures the store as ingested, after compact_store() and after
+expire_store() dropping raw readings and 1-minute rollups past their windows:
+files and MiB on disk, and the best-of-N latency of typical queries (one
+device's day, the fleet's last week, a scan of every raw reading, a summary
+of the year up to a bound that isn't on a minute and the dashboard's
+timeline over the year). The year summary must not change with compaction
+or expiry: the expired minutes are answered from the hourly rollups and the
+partial last minute from the raw readings.
+
+    python -m benchmarks.compaction_footprint --devices 4 --interval 30 --batch-minutes 60
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src.analyzer import analyze_data
+from src.compaction import compact_store, expire_store
+from src.downsample import downsample_frame
+from src.rollups import compute_rollups, rollup_timeline, rollups_path, update_rollups
+from src.store import load_readings, load_retention, readings_path, write_readings
+from src.synth import DEFAULT_START, generate_device
+
+# Points per network type in the timeline, as on the dashboard
+TIMELINE_POINT_BUDGET = 2000
+
+
+def write_year(store_dir, devices, interval, batch_minutes, days):
+    rows = int(days * 86400 // interval)
+    batch_rows = max(1, int(batch_minutes * 60 // interval))
+    for device in range(devices):
+        df = generate_device(rows, interval=interval, seed=(0, device)).assign(Device_ID=f"device-{device:04d}")
+        df = df.astype({"Device_ID": "category", "Network_Type": "category", "Location": "category"})
+        for start in range(0, rows, batch_rows):
+            write_readings(df.iloc[start:start + batch_rows], store_dir)
+        update_rollups(store_dir, compute_rollups(df))
+    return rows * devices
+
+
+def footprint(path):
+    """(files, bytes) under path."""
+    sizes = [os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+    return len(sizes), sum(sizes)
+
+
+def timeline(store_dir, start, end):
+    """The dashboard's year timeline: rollups before the raw readings kept, the readings after."""
+    view = load_readings(store_dir, ["Timestamp", "Signal_dBm", "Network_Type"])
+    raw_from = load_retention(store_dir).get("raw_from")
+    if raw_from is not None:
+        view = view[view["Timestamp"] >= raw_from]
+        view = pd.concat([rollup_timeline(store_dir, start, raw_from), view], ignore_index=True)
+    return downsample_frame(view, point_budget=TIMELINE_POINT_BUDGET, start=start, end=end)
+
+
+def timed(query, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = query()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compaction and retention footprint benchmark")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between readings")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-minutes", type=float, default=60.0, help="readings per ingest batch, in minutes")
+    parser.add_argument("--raw-days", type=int, default=30)
+    parser.add_argument("--minute-days", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    first = pd.Timestamp(DEFAULT_START)
+    last_day = first + pd.Timedelta(days=args.days - 1)
+    end = first + pd.Timedelta(days=args.days)
+    device = "device-0000"
+    queries = {
+        "device, 1 day": lambda: len(load_readings(store_dir, devices=[device], start=last_day, end=end)),
+        "fleet, 7 days": lambda: len(load_readings(store_dir, start=end - pd.Timedelta(days=7), end=end)),
+        "fleet, all raw": lambda: len(load_readings(store_dir, ["Timestamp", "Signal_dBm"])),
+        # Not on the hour, so the 1-minute rollups (or the hourly ones where they expired) answer it
+        "year summary": lambda: analyze_data(store_dir, first, end - pd.Timedelta(minutes=30, seconds=30)),
+        "year timeline": lambda: len(timeline(store_dir, first, end))
+    }
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        started = time.perf_counter()
+        rows = write_year(store_dir, args.devices, args.interval, args.batch_minutes, args.days)
+        print(f"Wrote {rows:,} readings ({args.devices} devices, {args.days} days, one every {args.interval:g} s) "
+              f"in batches of {args.batch_minutes:g} min in {time.perf_counter() - started:.1f} s")
+
+        phases = {}
+        for phase, step in (("ingested", None), ("compacted", compact_store),
+                            ("expired", lambda path: expire_store(path, args.raw_days, args.minute_days))):
+            if step is not None:
+                started = time.perf_counter()
+                step(store_dir)
+                print(f"{phase.capitalize()} in {time.perf_counter() - started:.1f} s")
+            phases[phase] = {
+                "readings": footprint(readings_path(store_dir)),
+                "rollups": footprint(rollups_path(store_dir)),
+                "store": footprint(store_dir),
+                "queries": {name: timed(query, args.repeat) for name, query in queries.items()}
+            }
+
+        print(f"\nDisk footprint (raw readings kept {args.raw_days} days, 1-minute rollups {args.minute_days} days)")
+        print(f"{'':<12}" + "".join(f"{part + ' files':>16}{'MiB':>10}" for part in ("readings", "rollups", "store")))
+        for phase, result in phases.items():
+            print(f"{phase:<12}" + "".join(
+                f"{result[part][0]:>16,}{result[part][1] / 2**20:>10.1f}" for part in ("readings", "rollups", "store")
+            ))
+
+        print(f"\nQuery latency, best of {args.repeat} (seconds)")
+        print(f"{'':<16}" + "".join(f"{phase:>12}" for phase in phases))
+        for name in queries:
+            print(f"{name:<16}" + "".join(f"{result['queries'][name][0]:>12.3f}" for result in phases.values()))
+
+        summaries = [result["queries"]["year summary"][1] for result in phases.values()]
+        distribution = [sum(summary["Signal Quality Distribution"].values()) for summary in summaries]
+        print(f"\nReadings in the year summary per phase: {', '.join(f'{n:,}' for n in distribution)}")
+        assert summaries[0] == summaries[1], "compaction changed the year summary"
+        assert distribution[1] == distribution[2], "expiry changed the readings in the year summary"
+        assert np.isclose(summaries[1]["Average Signal (dBm)"], summaries[2]["Average Signal (dBm)"], atol=0.01)
+
+
+if __name__ == "__main__":
+    main()
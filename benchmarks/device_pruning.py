@@ -0,0 +1,79 @@
+"""
+Scan-size benchmark for per-device queries.
+
+Writes a synthetic fleet (src.synth readings, one Device_ID per device)
+straight into a readings store partitioned by device and day, then loads one
+device's readings two ways: with the device filter pruning partitions
+(load_readings(devices=...)), and by scanning every device and filtering
+afterwards, as the store had to before it was partitioned by device.
+Reports files and bytes opened and the time taken by each.
+
+    python -m benchmarks.device_pruning --devices 1000 --rows-per-device 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+import pyarrow.dataset as ds
+from src.store import load_readings, readings_path, write_readings
+from src.synth import generate_device
+
+
+def write_fleet(store_dir, devices, rows_per_device):
+    for device in range(devices):
+        df = generate_device(rows_per_device, seed=(0, device)).assign(Device_ID=f"device-{device:04d}")
+        write_readings(df.astype({"Device_ID": "category", "Network_Type": "category", "Location": "category"}),
+                       store_dir)
+
+
+def scanned(store_dir, devices=None):
+    """(files, bytes) a scan with an optional device filter has to open."""
+    dataset = ds.dataset(readings_path(store_dir), format="parquet", partitioning="hive")
+    expression = ds.field("Device_ID").isin(devices) if devices else None
+    paths = [fragment.path for fragment in dataset.get_fragments(filter=expression)]
+    return len(paths), sum(os.path.getsize(path) for path in paths)
+
+
+def timed_load(load, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(load())
+        best = min(best, time.perf_counter() - started)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-device query scan-size benchmark")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rows-per-device", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        started = time.perf_counter()
+        write_fleet(store_dir, args.devices, args.rows_per_device)
+        print(f"Wrote {args.devices:,} devices x {args.rows_per_device:,} readings "
+              f"in {time.perf_counter() - started:.1f} s")
+
+        device = f"device-{args.devices // 2:04d}"
+        pruned_files, pruned_bytes = scanned(store_dir, [device])
+        all_files, all_bytes = scanned(store_dir)
+        pruned_seconds, pruned_rows = timed_load(lambda: load_readings(store_dir, devices=[device]), args.repeat)
+
+        def full_scan():
+            df = load_readings(store_dir)
+            return df[df["Device_ID"] == device]
+        full_seconds, full_rows = timed_load(full_scan, args.repeat)
+
+        assert pruned_rows == full_rows, (pruned_rows, full_rows)
+        print(f"{'':<16}{'files':>8}{'MiB':>10}{'seconds':>10}{'rows':>10}")
+        print(f"{'device filter':<16}{pruned_files:>8,}{pruned_bytes / 2**20:>10.2f}{pruned_seconds:>10.3f}"
+              f"{pruned_rows:>10,}")
+        print(f"{'full scan':<16}{all_files:>8,}{all_bytes / 2**20:>10.2f}{full_seconds:>10.3f}{full_rows:>10,}")
+        print(f"Scan size reduced {all_bytes / max(pruned_bytes, 1):,.0f}x, "
+              f"query {full_seconds / pruned_seconds:,.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
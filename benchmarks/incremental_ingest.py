@@ -0,0 +1,57 @@
+"""
+Per-run cost of collect_data as the export archive grows.
+
+Every round adds the same number of new synthetic device exports (one day
+each, src.synth) to the archive and runs collect_data over all of it twice:
+once to ingest the new exports, once more with nothing new, as the dashboard
+does on every rerun. With the manifest only the new exports are parsed, so
+both timings should stay roughly flat while the archive keeps growing.
+
+    python -m benchmarks.incremental_ingest --rounds 10 --exports-per-round 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import pandas as pd
+from src.collector import collect_data
+from src.synth import DEFAULT_INTERVAL, write_exports
+
+
+def timed_collect(sources, store_dir):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        collect_data(sources, store_dir)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental ingestion cost as the archive grows")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--exports-per-round", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between readings")
+    args = parser.parse_args()
+
+    rows_per_export = int(86400 // args.interval)
+    with tempfile.TemporaryDirectory() as work_dir:
+        store_dir = os.path.join(work_dir, "store")
+        sources = []
+        print(f"{'round':>5}{'exports':>10}{'rows':>14}{'ingest s':>10}{'rerun s':>10}")
+        for round_number in range(args.rounds):
+            # Each round is a new day of exports from the same devices
+            folder = os.path.join(work_dir, f"round-{round_number:03d}")
+            start = pd.Timestamp("2025-01-01") + pd.Timedelta(days=round_number)
+            write_exports(folder, args.exports_per_round, "1D", args.interval, start=start, seed=round_number)
+            sources.append(folder)
+
+            ingest_seconds = timed_collect(sources, store_dir)
+            rerun_seconds = timed_collect(sources, store_dir)
+            exports = len(sources) * args.exports_per_round
+            print(f"{round_number + 1:>5}{exports:>10,}{exports * rows_per_export:>14,}"
+                  f"{ingest_seconds:>10.3f}{rerun_seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
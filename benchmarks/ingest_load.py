@@ -0,0 +1,131 @@
+"""
+Load generator for the ingestion server (local only).
+
+Starts the server on a scratch data folder in a separate process, then
+simulates many devices that each keep one connection open and upload a
+batch of readings, wait for the acknowledgement and upload the next one.
+Reports sustained rows/s and ack latency percentiles.
+
+    python -m benchmarks.ingest_load --devices 1000 --batch-rows 50 --duration 30
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+from src.server import serve
+
+NETWORK_TYPES = ["LTE", "NR", "HSPA", "EDGE"]
+
+
+def make_batch(rng, device, sequence, rows):
+    """One CSV upload in the Android export format, unique per device and sequence."""
+    start = 1_700_000_000 + (sequence * rows)
+    lines = ["Timestamp,NetworkType,dBm,Location,Download_Mbps,Upload_Mbps,Latency_ms"]
+    for i in range(rows):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + i))
+        lines.append(
+            f"{timestamp},{NETWORK_TYPES[device % len(NETWORK_TYPES)]},"
+            f"{rng.uniform(-120, -60):.3f},Device {device},"
+            f"{rng.uniform(1, 300):.2f},{rng.uniform(1, 60):.2f},{rng.uniform(10, 200):.1f}"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def post(reader, writer, path, body, content_type="text/csv"):
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers
+
+
+async def device(port, device_id, batch_rows, deadline, latencies, counters):
+    rng = np.random.default_rng(device_id)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    sequence = 0
+    try:
+        while time.perf_counter() < deadline:
+            body = make_batch(rng, device_id, sequence, batch_rows)
+            sent = time.perf_counter()
+            status, headers = await post(reader, writer, "/readings", body)
+            if status == 200:
+                latencies.append(time.perf_counter() - sent)
+                counters["rows"] += batch_rows
+                sequence += 1
+            elif status == 503:
+                counters["rejected"] += 1
+                await asyncio.sleep(float(headers.get("retry-after", 1)))
+            else:
+                counters["errors"] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(port, devices, batch_rows, duration):
+    latencies = []
+    counters = {"rows": 0, "rejected": 0, "errors": 0}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        device(port, device_id, batch_rows, deadline, latencies, counters)
+        for device_id in range(devices)
+    ))
+    return time.perf_counter() - started, latencies, counters
+
+
+async def wait_for_server(port, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion server load benchmark")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--batch-rows", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        store_dir = os.path.join(data_folder, "store")
+        server = multiprocessing.Process(target=serve, args=(data_folder, store_dir, "127.0.0.1", args.port))
+        server.start()
+        try:
+            asyncio.run(wait_for_server(args.port))
+            elapsed, latencies, counters = asyncio.run(
+                run_load(args.port, args.devices, args.batch_rows, args.duration)
+            )
+        finally:
+            server.terminate()
+            server.join()
+
+    latencies = np.array(latencies) * 1000
+    print(f"Devices:          {args.devices} x {args.batch_rows} rows per upload")
+    print(f"Sustained rate:   {counters['rows'] / elapsed:,.0f} rows/s over {elapsed:.1f}s")
+    if len(latencies):
+        print(f"Ack latency (ms): p50 {np.percentile(latencies, 50):.0f}, "
+              f"p99 {np.percentile(latencies, 99):.0f}, max {latencies.max():.0f}")
+    print(f"Rejected (503):   {counters['rejected']}, errors: {counters['errors']}")
+
+
+if __name__ == "__main__":
+    main()
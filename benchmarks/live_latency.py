@@ -0,0 +1,106 @@
+"""
+Latency from a line appended to an export to the live dashboard panel.
+
+A writer thread appends synthetic readings (src.synth) to a growing export
+at a steady rate, a few lines at a time, noting when each line was flushed.
+The main thread does what the dashboard's live panel does on every tick: a
+LogTailer poll into its RingBuffer, then the buffer as a frame downsampled
+for the chart. A reading is visible once the tick that picked it up is done,
+so its latency is the poll interval it waited plus the tick's own work.
+Reports latency percentiles over all readings and the cost of a tick.
+
+    python -m benchmarks.live_latency --rate 1000 --duration 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from src.downsample import downsample_frame
+from src.formats import OUTPUT_COLUMNS
+from src.live import LogTailer
+from src.synth import generate_device
+
+# As the dashboard's live panel (LIVE_REFRESH_SECONDS, LIVE_POINT_BUDGET)
+POLL_INTERVAL = 0.5
+LIVE_POINT_BUDGET = 1000
+# Appends per second; each one writes rate / WRITES_PER_SECOND lines
+WRITES_PER_SECOND = 100
+
+
+def export_lines(rows):
+    """Header and CSV lines of `rows` readings, as a device logger writes them."""
+    columns = [column for column in OUTPUT_COLUMNS if column != "Device_ID"]
+    df = generate_device(rows, start=time.strftime("%Y-%m-%d %H:%M:%S"), interval=1.0)[columns]
+    text = df.to_csv(index=False, date_format="%Y-%m-%d %H:%M:%S")
+    header, *lines = text.encode().splitlines(keepends=True)
+    return header, lines
+
+
+def write_steadily(path, lines, rate, written):
+    """Appends lines at `rate` per second, recording (lines written so far, time flushed) per write."""
+    per_write = max(1, rate // WRITES_PER_SECOND)
+    started = time.perf_counter()
+    with open(path, "ab") as f:
+        for write, start in enumerate(range(0, len(lines), per_write)):
+            delay = started + write * per_write / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            f.write(b"".join(lines[start:start + per_write]))
+            f.flush()
+            written.append((min(start + per_write, len(lines)), time.perf_counter()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append-to-dashboard latency of live mode")
+    parser.add_argument("--rate", type=int, default=1000, help="readings appended per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to append for")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    header, lines = export_lines(int(args.rate * args.duration))
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "signal_log.csv")
+        with open(path, "wb") as f:
+            f.write(header)
+        tailer = LogTailer(data_dir)
+        tailer.poll()
+
+        written = []
+        writer = threading.Thread(target=write_steadily, args=(path, lines, args.rate, written))
+        writer.start()
+
+        # (lines visible so far, time the tick finished) and the seconds each tick took
+        visible, ticks = [], []
+        seen = 0
+        next_tick = time.perf_counter()
+        while writer.is_alive() or seen < (written[-1][0] if written else 0):
+            next_tick += args.poll_interval
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+            started = time.perf_counter()
+            seen += tailer.poll()
+            downsample_frame(tailer.buffer.to_frame(), point_budget=LIVE_POINT_BUDGET)
+            finished = time.perf_counter()
+            ticks.append(finished - started)
+            visible.append((seen, finished))
+        writer.join()
+
+    # Per line: when it was flushed and when the first tick that had it finished
+    flushed_counts, flushed_at = np.array(written).T
+    visible_counts, visible_at = np.array(visible).T
+    line = np.arange(int(flushed_counts[-1]))
+    flushed = flushed_at[np.searchsorted(flushed_counts, line, side="right")]
+    shown = visible_at[np.searchsorted(visible_counts, line, side="right")]
+    latency = (shown - flushed) * 1000
+    ticks = np.array(ticks) * 1000
+
+    print(f"{len(line):,} readings at {args.rate:,}/s, polled every {args.poll_interval * 1000:.0f} ms")
+    print(f"{'':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, values in (("append to visible, ms", latency), ("tick work, ms", ticks)):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{name:<22}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{values.max():>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Memory footprint of loaded readings, before and after the compact schema.
+
+Builds a synthetic fleet sample in the old in-memory layout (object strings,
+float64 measurements) and in the compact one from src.schema, reports bytes
+per reading for both, the cost of a network type filter as a copied frame
+versus row positions, and what a year of the given fleet would take.
+
+    python -m benchmarks.memory_footprint --rows 1000000 --devices 500 --interval 60
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from src.analyzer import classify_signal
+from src.schema import bytes_per_reading, compact_readings, select_positions
+
+
+def make_readings(rows, locations=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(rows), unit="s"),
+        "Network_Type": rng.choice(["LTE", "NR", "HSPA", "EDGE"], rows, p=[0.6, 0.3, 0.08, 0.02]).astype(object),
+        "Signal_dBm": np.round(rng.normal(-95, 10, rows)),
+        "Location": np.array([f"Cell-{i:05d}" for i in range(locations)], dtype=object)[rng.integers(0, locations, rows)],
+        "Download_Mbps": np.round(rng.lognormal(3, 1, rows), 2),
+        "Upload_Mbps": np.round(rng.lognormal(1, 1, rows), 2),
+        "Latency_ms": np.round(rng.gamma(2, 30, rows), 1),
+        "Latitude": rng.uniform(8, 13, rows),
+        "Longitude": rng.uniform(74, 78, rows)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per reading before and after the compact schema")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=500, help="fleet size for the one-year projection")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between readings per device")
+    args = parser.parse_args()
+
+    legacy = make_readings(args.rows)
+    legacy["Signal_Quality"] = classify_signal(legacy["Signal_dBm"]).astype(object)
+    compact = compact_readings(legacy)
+
+    year_rows = args.devices * 365 * 86400 / args.interval
+    print(f"{args.rows:,} readings; a year of {args.devices:,} devices every {args.interval:g}s is {year_rows:,.0f}")
+    for name, df in [("before", legacy), ("after", compact)]:
+        per_reading = bytes_per_reading(df)
+        print(f"{name:>7}: {per_reading:7.1f} bytes/reading, {per_reading * year_rows / 2**30:8.1f} GiB per year")
+
+    # The dashboard used to hold a filtered copy per selection
+    selection = ["LTE", "NR"]
+    copied = compact[compact["Network_Type"].isin(selection)]
+    positions = select_positions(compact, "Network_Type", selection)
+    print(f" filter: copy {copied.memory_usage(deep=True).sum() / 2**20:.1f} MiB, "
+          f"positions {positions.nbytes / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Scaling benchmark for sessionization.
+
+Sessionizes synthetic fleets of growing size (readings every 3 s from
+src.synth, devices told apart by a Device_ID column) in one batch each and
+reports readings per second, which should stay flat as the fleet grows.
+
+    python -m benchmarks.sessions_scaling --rows 1000000 2000000 5000000 10000000
+"""
+import argparse
+import time
+import pandas as pd
+from src.sessions import SessionTracker
+from src.synth import generate_device
+
+ROWS_PER_DEVICE = 100_000
+
+
+def make_readings(rows, seed=0):
+    devices = max(1, rows // ROWS_PER_DEVICE)
+    frames = [
+        generate_device(rows // devices, seed=(seed, device)).assign(Device_ID=f"device-{device:04d}")
+        for device in range(devices)
+    ]
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({"Network_Type": "category", "Location": "category", "Device_ID": "category"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sessionization scaling benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 2_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        readings = make_readings(rows)
+        started = time.perf_counter()
+        tables = SessionTracker().update(readings)
+        elapsed = time.perf_counter() - started
+        print(f"{len(readings):>11,} readings: {elapsed:6.2f} s, {len(readings) / elapsed:>10,.0f} readings/s "
+              f"({len(tables['spans']):,} sessions, {len(tables['handovers']):,} handovers, "
+              f"{len(tables['dwell']):,} dwell rows)")
+
+
+if __name__ == "__main__":
+    main()
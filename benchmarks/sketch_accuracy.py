@@ -0,0 +1,77 @@
+"""
+Accuracy and cost check for the quantile sketches.
+
+Sketches synthetic readings (skewed throughput with zeros, gamma latency,
+integer dBm signal) in batches, merges the batches the way ingest does and
+compares every sketch percentile, per metric and per network type, with the
+exact inverted-CDF percentile of the raw values. Exits non-zero if any
+estimate is off by more than RELATIVE_ACCURACY.
+
+    python -m benchmarks.sketch_accuracy --rows 2000000
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.sketches import (
+    MIN_VALUE, RELATIVE_ACCURACY, SKETCH_QUANTILES, compute_sketches, exact_quantiles, merge_sketches,
+    sketch_quantiles
+)
+
+
+def make_readings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 7 * 86400, rows), unit="s"),
+        "Network_Type": rng.choice(["LTE", "NR", "HSPA"], rows),
+        "Signal_dBm": np.round(rng.normal(-95, 10, rows)),
+        # One in ten speed tests failed and reported 0 Mbps
+        "Download_Mbps": rng.lognormal(3, 1, rows) * (rng.random(rows) > 0.1),
+        "Upload_Mbps": rng.lognormal(1, 1, rows),
+        "Latency_ms": rng.gamma(2, 30, rows)
+    })
+
+
+def relative_errors(estimates, exact):
+    labels = list(SKETCH_QUANTILES)
+    error = (estimates[labels] - exact.loc[estimates.index, labels]).abs()
+    # Values under MIN_VALUE are reported as 0, an absolute error below it
+    return error / exact.loc[estimates.index, labels].abs().clip(lower=MIN_VALUE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantile sketch accuracy check")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=250_000)
+    args = parser.parse_args()
+
+    readings = make_readings(args.rows)
+    started = time.perf_counter()
+    batches = [compute_sketches(readings.iloc[start:start + args.batch_size])
+               for start in range(0, args.rows, args.batch_size)]
+    sketches = {name: merge_sketches([batch[name] for batch in batches]) for name in batches[0]}
+    elapsed = time.perf_counter() - started
+    print(f"Sketched {args.rows:,} readings in {elapsed:.2f}s "
+          f"({len(sketches['1h']):,} hourly / {len(sketches['1d']):,} daily bins)")
+
+    worst = 0.0
+    started = time.perf_counter()
+    overall = sketch_quantiles(sketches["1d"])
+    print(f"Percentiles over all days in {(time.perf_counter() - started) * 1000:.1f} ms")
+    errors = relative_errors(overall, exact_quantiles(readings))
+    print(errors.round(5).to_string())
+    worst = max(worst, errors.to_numpy().max())
+
+    per_network = sketch_quantiles(sketches["1h"], by=["Network_Type", "metric"])
+    for network, group in readings.groupby("Network_Type"):
+        estimates = per_network.loc[network]
+        worst = max(worst, relative_errors(estimates, exact_quantiles(group)).to_numpy().max())
+
+    print(f"Worst relative error {worst:.5f} (bound {RELATIVE_ACCURACY})")
+    if worst > RELATIVE_ACCURACY:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
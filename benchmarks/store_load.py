@@ -0,0 +1,87 @@
+"""
+Load time and memory of the readings: merged CSV versus the columnar store.
+
+Writes a synthetic fleet (src.synth), ingests it into a store with
+collect_data and writes the same readings as one merged CSV, the analysis
+format the store replaced. Then loads them the way readers used to (CSV
+parse plus timestamp parsing, object columns) and the way they do now
+(load_readings: typed, compressed Parquet, only the columns asked for), and
+reports the best-of-N load time and the size of the loaded frame.
+
+    python -m benchmarks.store_load --rows 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import pandas as pd
+from src.collector import collect_data
+from src.store import load_readings, readings_path
+from src.synth import duration_for_rows, write_exports
+
+# Columns the charts read, as in src.main
+CHART_COLUMNS = ["Timestamp", "Network_Type", "Signal_dBm"]
+ROWS_PER_DEVICE = 50_000
+
+
+def load_csv(path, columns=None):
+    # What analyze_data and the dashboard did with the merged CSV
+    df = pd.read_csv(path, usecols=columns)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    return df
+
+
+def disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def timed_load(load, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = load()
+        best = min(best, time.perf_counter() - started)
+    return best, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merged CSV versus columnar store load benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        exports = os.path.join(work_dir, "exports")
+        store_dir = os.path.join(work_dir, "store")
+        merged = os.path.join(work_dir, "network_data_output.csv")
+        devices = max(1, args.rows // ROWS_PER_DEVICE)
+        write_exports(exports, devices, duration_for_rows(args.rows, devices))
+        with contextlib.redirect_stdout(io.StringIO()):
+            collect_data(exports, store_dir)
+        load_readings(store_dir).to_csv(merged, index=False)
+
+        cases = {
+            "CSV, all columns": (merged, lambda: load_csv(merged)),
+            "CSV, chart columns": (merged, lambda: load_csv(merged, CHART_COLUMNS)),
+            "store, all columns": (readings_path(store_dir), lambda: load_readings(store_dir)),
+            "store, chart columns": (readings_path(store_dir), lambda: load_readings(store_dir, CHART_COLUMNS))
+        }
+        print(f"{'':<22}{'disk MiB':>10}{'seconds':>10}{'frame MiB':>11}{'rows':>12}")
+        results = {}
+        for name, (path, load) in cases.items():
+            seconds, df = timed_load(load, args.repeat)
+            frame = df.memory_usage(deep=True).sum()
+            results[name] = (seconds, frame)
+            print(f"{name:<22}{disk_size(path) / 2**20:>10.1f}{seconds:>10.3f}{frame / 2**20:>11.1f}{len(df):>12,}")
+
+        for columns in ("all columns", "chart columns"):
+            (csv_seconds, csv_frame), (store_seconds, store_frame) = results[f"CSV, {columns}"], results[f"store, {columns}"]
+            print(f"{columns}: {csv_seconds / store_seconds:.1f}x faster, {csv_frame / store_frame:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
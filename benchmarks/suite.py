@@ -0,0 +1,218 @@
+"""
+Benchmark suite for the main entry points on synthetic fleets.
+
+For every size, writes a synthetic fleet with src.synth (a quarter of the
+devices with the Android logger's headers), then times collect_data into a
+fresh store, analyze_data and visualize_data on that store and the
+dashboard's data preparation (load, classify and sort the readings, filter
+to the busiest network type, downsample its timeline, KPIs and percentiles
+from the rollups and sketches). Every case runs in its own process, so its
+peak RSS is its own. With --workers, collect runs once per worker count
+(named collect-4w for 4 workers) and the speedup over the first is shown.
+
+Results are compared with a stored baseline; a case that got slower or
+bigger than the tolerance allows fails the run. Baselines are only
+meaningful on the machine that recorded them, so record one first:
+
+    python -m benchmarks.suite --sizes 10k,1m --update-baseline
+    python -m benchmarks.suite --sizes 10k,1m
+    python -m benchmarks.suite --sizes 1m --workers 1,2,4,8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+CASES = ["collect", "analyze", "visualize", "dashboard"]
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Readings per device in the synthetic fleets
+ROWS_PER_DEVICE = 50_000
+# Timings shorter than this are mostly noise; they never count as regressions
+MIN_SECONDS = 0.2
+# Points per network type in the timeline, as on the dashboard
+TIMELINE_POINT_BUDGET = 2000
+
+
+def prepare_dashboard(store_dir):
+    from src.analyzer import percentile_dict, prepare_readings, summarize_rollups
+    from src.downsample import downsample_frame
+    from src.rollups import load_rollups
+    from src.schema import select_positions, take_rows
+    from src.sketches import load_sketches, sketch_quantiles
+    from src.store import load_readings
+
+    df = prepare_readings(load_readings(store_dir))
+    network_types = [df["Network_Type"].value_counts().index[0]]
+    positions = select_positions(df, "Network_Type", network_types)
+    timeline = take_rows(df, positions, ["Timestamp", "Signal_dBm", "Network_Type"])
+    downsample_frame(timeline, point_budget=TIMELINE_POINT_BUDGET)
+    summarize_rollups(load_rollups(store_dir, "1d", network_types=network_types))
+    percentile_dict(sketch_quantiles(load_sketches(store_dir, network_types=network_types, name="1d")))
+    take_rows(df, positions, last=100)
+
+
+def case_name(case, workers):
+    return case if workers == 1 else f"{case}-{workers}w"
+
+
+def run_case(case, exports_dir, store_dir, output_dir, workers=1):
+    """
+    Runs one case in this process; returns seconds taken, peak RSS and how
+    much the case added to the RSS of the imported modules, in MiB. Peak RSS
+    doesn't include the collect workers' processes.
+    """
+    from src.analyzer import analyze_data
+    from src.collector import collect_data
+    from src.visualizer import visualize_data
+
+    cases = {
+        "collect": lambda: collect_data(exports_dir, store_dir, workers=workers),
+        "analyze": lambda: analyze_data(store_dir),
+        "visualize": lambda: visualize_data(store_dir, save_figures=True, output_dir=output_dir, show=False),
+        "dashboard": lambda: prepare_dashboard(store_dir)
+    }
+    # ru_maxrss is in KiB on Linux
+    imported = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases[case]()
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"seconds": seconds, "peak_mib": peak, "added_mib": peak - imported}
+
+
+def measure(case, exports_dir, store_dir, output_dir, workers=1):
+    # A fresh interpreter per case, so peak memory isn't inherited from earlier cases
+    env = dict(os.environ, MPLBACKEND="Agg")
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--case", case, "--workers", str(workers),
+         exports_dir, store_dir, output_dir],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_size(label, rows, work_dir, repeat, workers=(1,)):
+    from src.synth import duration_for_rows, write_exports
+
+    devices = max(1, rows // ROWS_PER_DEVICE)
+    exports_dir = os.path.join(work_dir, label)
+    store_dir = os.path.join(exports_dir, "store")
+    output_dir = os.path.join(work_dir, f"{label}-graphs")
+    write_exports(exports_dir, devices, duration_for_rows(rows, devices), legacy_share=0.25)
+
+    results = {}
+    for case in CASES:
+        # Every collect of the sweep builds the same store for the cases after it
+        for case_workers in workers if case == "collect" else (1,):
+            name = case_name(case, case_workers)
+            runs = []
+            for _ in range(repeat):
+                if case == "collect":
+                    shutil.rmtree(store_dir, ignore_errors=True)
+                runs.append(measure(case, exports_dir, store_dir, output_dir, case_workers))
+            # Best of the repeats: noise only ever adds time
+            results[name] = {
+                "seconds": round(min(run["seconds"] for run in runs), 3),
+                "peak_mib": round(max(run["peak_mib"] for run in runs), 1),
+                "added_mib": round(max(run["added_mib"] for run in runs), 1)
+            }
+            print(f"{label:>4} {name:<12} {results[name]['seconds']:9.3f} s {results[name]['peak_mib']:9.1f} MiB "
+                  f"peak (+{results[name]['added_mib']:.1f} MiB)")
+
+    if len(workers) > 1:
+        first = results[case_name("collect", workers[0])]["seconds"]
+        speedups = ", ".join(
+            f"{n} workers {first / results[case_name('collect', n)]['seconds']:.2f}x" for n in workers[1:]
+        )
+        print(f"{label:>4} collect speedup over {workers[0]} worker(s), {os.cpu_count()} CPUs: {speedups}")
+    return results
+
+
+def regressions(results, baseline, time_tolerance, memory_tolerance):
+    """Messages for every case slower or bigger than its baseline allows."""
+    found = []
+    for label, cases in results.items():
+        for case, result in cases.items():
+            expected = baseline.get(label, {}).get(case)
+            if expected is None:
+                continue
+            seconds_limit = max(expected["seconds"] * (1 + time_tolerance), MIN_SECONDS)
+            if result["seconds"] > seconds_limit:
+                found.append(f"{label} {case}: {result['seconds']:.3f} s, baseline {expected['seconds']:.3f} s")
+            if result["peak_mib"] > expected["peak_mib"] * (1 + memory_tolerance):
+                found.append(f"{label} {case}: {result['peak_mib']:.1f} MiB, baseline {expected['peak_mib']:.1f} MiB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and peak memory of NetPulse entry points")
+    parser.add_argument("--sizes", default="10k,1m", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="allowed peak memory growth")
+    parser.add_argument("--workers", default="1", help="comma-separated worker counts to time collect with")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    try:
+        workers = [int(n) for n in args.workers.split(",") if n]
+    except ValueError:
+        parser.error(f"--workers takes comma-separated numbers, not {args.workers}")
+    if not workers or min(workers) < 1:
+        parser.error("--workers needs at least one worker count, each at least 1")
+
+    if args.case:
+        print(json.dumps(run_case(args.case, *args.paths, workers=workers[0])))
+        return
+
+    labels = [label for label in args.sizes.split(",") if label]
+    unknown = sorted(set(labels) - set(SIZES))
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label in labels:
+            results[label] = run_size(label, SIZES[label], work_dir, args.repeat, workers)
+
+    baseline = {"machine": {}, "results": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline["machine"] = {"platform": platform.platform(), "python": platform.python_version(),
+                               "cpus": os.cpu_count()}
+        baseline["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not baseline["results"]:
+        print(f"No baseline at {args.baseline}, record one with --update-baseline")
+        return
+    found = regressions(results, baseline["results"], args.time_tolerance, args.memory_tolerance)
+    for message in found:
+        print(f"REGRESSION {message}")
+    if found:
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,195 @@
+from dataclasses import dataclass, field, replace
+import os
+import numpy as np
 import pandas as pd
+from src.leaderboard import best_and_worst
+from src.metrics import instrument
+from src.rollups import QUALITY_COLUMNS, load_range_rollups
+from src.sketches import exact_quantiles, load_sketches, sketch_quantiles
+from src.store import filter_readings, load_readings, read_dataset
 
-def analyze_data(input_file):
-    df = pd.read_csv(input_file)
+METRIC_COLUMNS = ["Signal_dBm", "Download_Mbps", "Upload_Mbps", "Latency_ms"]
+ANALYSIS_COLUMNS = METRIC_COLUMNS + ["Location"]
+# Read from a merged CSV as well, for analyze_data's filters
+FILTER_COLUMNS = ["Timestamp", "Network_Type", "Device_ID"]
 
-    # Basic metrics
-    avg_signal = round(df["Signal_dBm"].mean(), 2)
-    avg_download = round(df["Download_Mbps"].mean(), 2)
-    avg_upload = round(df["Upload_Mbps"].mean(), 2)
-    avg_latency = round(df["Latency_ms"].mean(), 2)
+# Signal quality classes, worst first; a reading above QUALITY_THRESHOLDS[i]
+# is in class i + 1 (Excellent: > -85 dBm, Good: > -95 dBm, otherwise Poor)
+QUALITY_LABELS = ["Poor", "Good", "Excellent"]
+QUALITY_THRESHOLDS = [-95, -85]
 
-    # Classify signal quality
-    df["Signal_Quality"] = df["Signal_dBm"].apply(
-        lambda x: "Excellent" if x > -85 else ("Good" if x > -95 else "Poor")
+# Weight of each quality class in the network health score
+HEALTH_WEIGHTS = {"Excellent": 100, "Good": 60, "Poor": 20}
+
+
+def quality_codes(signal):
+    """
+    Returns the index into QUALITY_LABELS for every reading. Missing readings
+    are Poor, as they were with the old per-row classification.
+    """
+    values = np.asarray(signal, dtype="float64")
+    codes = np.searchsorted(QUALITY_THRESHOLDS, values, side="left").astype("int8")
+    codes[np.isnan(values)] = 0
+    return codes
+
+
+@instrument("analyze.classify")
+def classify_signal(signal):
+    """Vectorized signal quality classification as a categorical Series."""
+    labels = pd.Categorical.from_codes(quality_codes(signal), QUALITY_LABELS)
+    return pd.Series(labels, index=getattr(signal, "index", None), name="Signal_Quality")
+
+
+def prepare_readings(df):
+    """Adds the signal quality class and sorts readings by time, as the dashboard shows them."""
+    df["Signal_Quality"] = classify_signal(df["Signal_dBm"])
+    if "Timestamp" in df.columns:
+        df = df.sort_values("Timestamp", kind="stable", ignore_index=True)
+    return df
+
+
+@dataclass(frozen=True)
+class AnalysisSummary:
+    rows: int
+    avg_signal: float
+    avg_download: float
+    avg_upload: float
+    avg_latency: float
+    quality_counts: dict
+    best_location: str
+    worst_location: str
+    # metric -> {"p5": ..., "p50": ..., "p95": ..., "p99": ...}, when known
+    percentiles: dict = field(default_factory=dict)
+
+    @property
+    def health_score(self):
+        """Quality-weighted score from 20 (all Poor) to 100 (all Excellent)."""
+        if not self.rows:
+            return 0.0
+        return sum(HEALTH_WEIGHTS[label] * count for label, count in self.quality_counts.items()) / self.rows
+
+    def as_dict(self):
+        return {
+            "Average Signal (dBm)": self.avg_signal,
+            "Average Download Speed (Mbps)": self.avg_download,
+            "Average Upload Speed (Mbps)": self.avg_upload,
+            "Average Latency (ms)": self.avg_latency,
+            "Signal Quality Distribution": {k: v for k, v in self.quality_counts.items() if v},
+            "Best Location": self.best_location,
+            "Worst Location": self.worst_location,
+            **({"Percentiles": self.percentiles} if self.percentiles else {})
+        }
+
+
+@instrument("analyze.summarize")
+def summarize(df):
+    """
+    Computes every summary statistic from an in-memory frame with vectorized
+    reductions and no per-row Python calls: column means, quality counts from
+    two threshold comparisons and best/worst location by mean signal among
+    locations with enough readings (see leaderboard.best_and_worst).
+    Percentiles are exact.
+    """
+    means = {col: df[col].mean() for col in METRIC_COLUMNS}
+
+    signal = df["Signal_dBm"].to_numpy(dtype="float64", na_value=np.nan)
+    excellent = np.count_nonzero(signal > QUALITY_THRESHOLDS[1])
+    good = np.count_nonzero(signal > QUALITY_THRESHOLDS[0]) - excellent
+    # Missing readings fail both comparisons and count as Poor
+    poor = len(signal) - good - excellent
+
+    per_location = df.groupby("Location", observed=True)["Signal_dBm"].agg(["sum", "count"])
+    best_location, worst_location = best_and_worst(per_location.index, per_location["sum"], per_location["count"])
+
+    return AnalysisSummary(
+        rows=len(df),
+        avg_signal=round(float(means["Signal_dBm"]), 2),
+        avg_download=round(float(means["Download_Mbps"]), 2),
+        avg_upload=round(float(means["Upload_Mbps"]), 2),
+        avg_latency=round(float(means["Latency_ms"]), 2),
+        quality_counts={"Poor": int(poor), "Good": int(good), "Excellent": int(excellent)},
+        best_location=best_location,
+        worst_location=worst_location,
+        percentiles=percentile_dict(exact_quantiles(df))
     )
 
-    signal_quality_counts = df["Signal_Quality"].value_counts().to_dict()
-    best_location = df.loc[df["Signal_dBm"].idxmax(), "Location"]
-    worst_location = df.loc[df["Signal_dBm"].idxmin(), "Location"]
-
-    summary = {
-        "Average Signal (dBm)": avg_signal,
-        "Average Download Speed (Mbps)": avg_download,
-        "Average Upload Speed (Mbps)": avg_upload,
-        "Average Latency (ms)": avg_latency,
-        "Signal Quality Distribution": signal_quality_counts,
-        "Best Location": best_location,
-        "Worst Location": worst_location
+
+def percentile_dict(quantiles):
+    """{metric: {label: value}} from a per-metric quantile frame, rounded like the means."""
+    return {
+        metric: {label: round(float(value), 2) for label, value in row.items() if label != "count"}
+        for metric, row in quantiles.iterrows()
     }
-    return summary
+
+
+@instrument("analyze.summarize_rollups")
+def summarize_rollups(rollup):
+    """
+    Computes the same summary as summarize() from pre-aggregated rollups.
+    Results are exact: means and the per-location means that pick the
+    best/worst location come from summed counts and sums.
+    """
+    totals = rollup[["rows"] + [f"{m}_{s}" for m in METRIC_COLUMNS for s in ("count", "sum")]
+                    + QUALITY_COLUMNS].sum()
+
+    def mean(metric):
+        count = totals[f"{metric}_count"]
+        return round(float(totals[f"{metric}_sum"] / count), 2) if count else float("nan")
+
+    per_location = rollup.groupby("Location", observed=True)[["Signal_dBm_sum", "Signal_dBm_count"]].sum()
+    best_location, worst_location = best_and_worst(
+        per_location.index, per_location["Signal_dBm_sum"], per_location["Signal_dBm_count"]
+    )
+
+    return AnalysisSummary(
+        rows=int(totals["rows"]),
+        avg_signal=mean("Signal_dBm"),
+        avg_download=mean("Download_Mbps"),
+        avg_upload=mean("Upload_Mbps"),
+        avg_latency=mean("Latency_ms"),
+        quality_counts={
+            label: int(totals[column]) for label, column in zip(QUALITY_LABELS, QUALITY_COLUMNS)
+        },
+        best_location=best_location,
+        worst_location=worst_location
+    )
+
+
+@instrument("analyze")
+def analyze_data(input_file, start=None, end=None, network_types=None, devices=None):
+    """
+    Summarizes readings from an in-memory frame, the readings store directory
+    or a merged CSV. For a store, the summary is answered from its rollups
+    (optionally limited to [start, end) and some network types) without
+    touching raw readings, except for the partial minutes at bounds that
+    aren't on a minute (ValueError once those have expired); percentiles come
+    from the quantile sketches kept next to them, to the hour and within
+    their documented relative accuracy. The rollups cover the whole fleet,
+    so a summary of some devices reads just their partitions of the readings
+    instead, with exact percentiles; once old readings have expired (see
+    src.compaction) that covers only the days still kept raw. A frame or
+    merged CSV is filtered in memory (ValueError if it lacks a filtered
+    column).
+    """
+    if isinstance(input_file, pd.DataFrame):
+        return summarize(filter_readings(input_file, network_types, start, end, devices)).as_dict()
+
+    if os.path.isdir(input_file) and devices is not None:
+        df = load_readings(input_file, ANALYSIS_COLUMNS, network_types, start, end, devices)
+        return summarize(df).as_dict()
+
+    if os.path.isdir(input_file):
+        rollup = load_range_rollups(input_file, start, end, network_types)
+        if rollup is not None:
+            summary = summarize_rollups(rollup)
+            sketch = load_sketches(input_file, start, end, network_types)
+            if sketch is not None:
+                summary = replace(summary, percentiles=percentile_dict(sketch_quantiles(sketch)))
+            return summary.as_dict()
+
+    if os.path.isdir(input_file):
+        df = load_readings(input_file, ANALYSIS_COLUMNS, network_types, start, end, devices)
+    else:
+        df = read_dataset(input_file, columns=ANALYSIS_COLUMNS + FILTER_COLUMNS)
+        df = filter_readings(df, network_types, start, end, devices)
+    return summarize(df).as_dict()
@@ -0,0 +1,376 @@
+import json
+import os
+import shutil
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.analyzer import quality_codes
+from src.schema import runs
+from src.store import STORE_DIR
+
+# Readings without a Device_ID column are attributed to this device
+DEFAULT_DEVICE = "default"
+
+# EWMA smoothing factor; roughly the last 2 / ALPHA readings shape a baseline
+ALPHA = 0.1
+# Readings a stream must have seen before its deviations are scored
+WARMUP_READINGS = 10
+# An EWMA of absolute deviations times this estimates the standard deviation
+ABS_DEV_TO_SIGMA = 1.2533
+
+# A signal drop needs a robust z-score below -DROP_Z and at least MIN_DROP_DB
+# under the baseline; a latency spike a z-score above SPIKE_Z and at least
+# MIN_SPIKE_MS over it. The absolute floors keep quiet streams from flagging
+# every 1 dB or 1 ms wobble.
+DROP_Z = 3.5
+MIN_DROP_DB = 10.0
+SPIKE_Z = 3.5
+MIN_SPIKE_MS = 50.0
+
+# Continuous Poor-quality readings for this long are flagged once per stretch
+POOR_STRETCH_SECONDS = 60
+# Readings of a stream further apart than this don't continue a stretch: the
+# device was offline in between (as sessions.SESSION_GAP_SECONDS ends a session)
+STRETCH_GAP_SECONDS = 60
+
+# Higher is better; a device moving to a lower rank is a downgrade
+NETWORK_RANKS = {
+    "GSM": 1, "GPRS": 1, "EDGE": 1, "2G": 1,
+    "UMTS": 2, "WCDMA": 2, "HSPA": 2, "HSPA+": 2, "HSDPA": 2, "HSUPA": 2, "3G": 2,
+    "LTE": 3, "LTE-A": 3, "4G": 3,
+    "NR": 4, "NR_NSA": 4, "NR_SA": 4, "5G": 4
+}
+
+ANOMALY_COLUMNS = ["Timestamp", "Device_ID", "Network_Type", "kind", "value", "baseline", "detail"]
+RECENT_ANOMALIES = 1000
+
+# Separates device and network type in stream keys
+_SEP = "\x1f"
+
+
+def anomalies_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "anomalies")
+
+
+def clear_anomalies(store_dir=STORE_DIR):
+    shutil.rmtree(anomalies_path(store_dir), ignore_errors=True)
+
+
+def empty_anomalies():
+    return pd.DataFrame({
+        "Timestamp": pd.Series(dtype="datetime64[ns]"),
+        "Device_ID": pd.Series(dtype=object),
+        "Network_Type": pd.Series(dtype=object),
+        "kind": pd.Series(dtype=object),
+        "value": pd.Series(dtype="float64"),
+        "baseline": pd.Series(dtype="float64"),
+        "detail": pd.Series(dtype=object)
+    })
+
+
+def _grouped_ewma(groups, values):
+    frame = pd.DataFrame({"group": groups, "value": values})
+    ewma = frame.groupby("group", sort=False)["value"].ewm(alpha=ALPHA, adjust=False).mean()
+    return ewma.droplevel(0).sort_index().to_numpy()
+
+
+def _ewma_scores(streams, values, state):
+    """
+    Scores values (grouped by stream, in time order) against each stream's
+    EWMA baseline as it stood before the reading, then folds them into it.
+
+    Each stream is seeded with one row carrying its saved mean and absolute
+    deviation (its first value for new streams), so a single grouped EWMA pass
+    continues exactly where the previous batch stopped.
+    Returns (robust z-scores, baselines) aligned with values.
+    """
+    if not len(values):
+        return np.empty(0), np.empty(0)
+
+    starts, lengths = runs(streams)
+    keys = streams[starts]
+    seeds = [state.get(key) or {"count": 0, "mean": values[start], "dev": 0.0}
+             for key, start in zip(keys, starts)]
+
+    # Row positions once every stream's seed row is placed before it
+    rows = np.arange(len(values)) + np.repeat(np.arange(1, len(starts) + 1), lengths)
+    seed_rows = rows[starts] - 1
+    groups = np.empty(len(rows) + len(seeds), dtype=object)
+    groups[rows], groups[seed_rows] = streams, keys
+
+    series = np.empty(len(groups))
+    series[rows], series[seed_rows] = values, [seed["mean"] for seed in seeds]
+    mean = _grouped_ewma(groups, series)
+    baseline = mean[rows - 1]
+
+    deviations = np.empty(len(groups))
+    deviations[rows], deviations[seed_rows] = np.abs(values - baseline), [seed["dev"] for seed in seeds]
+    dev = _grouped_ewma(groups, deviations)
+    scale = np.maximum(ABS_DEV_TO_SIGMA * dev[rows - 1], 1e-9)
+
+    counts = np.array([seed["count"] for seed in seeds], dtype="int64")
+    seen = np.repeat(counts - starts, lengths) + np.arange(len(values))
+    z = np.where(seen >= WARMUP_READINGS, (values - baseline) / scale, np.nan)
+
+    last_rows = rows[starts + lengths - 1]
+    for key, count, length, row in zip(keys, counts, lengths, last_rows):
+        state[key] = dict(state.get(key, {}), count=int(count + length), mean=float(mean[row]), dev=float(dev[row]))
+    return z, baseline
+
+
+def _onsets(streams, flags, state):
+    """
+    Keeps only the first reading of every run of flagged readings in a stream,
+    so a sustained drop is reported once rather than on every reading until
+    the baseline catches up. Whether a stream's last reading was flagged is
+    carried over in its state.
+    """
+    if not len(flags):
+        return flags
+    starts, lengths = runs(streams)
+    previous = np.r_[False, flags[:-1]]
+    previous[starts] = [state[streams[start]].get("active", False) for start in starts]
+    for start, length in zip(starts, lengths):
+        state[streams[start]]["active"] = bool(flags[start + length - 1])
+    return flags & ~previous
+
+
+class AnomalyDetector:
+    """
+    Online detector for signal drops, latency spikes, prolonged Poor-quality
+    stretches and network downgrades.
+
+    State is a handful of numbers per device x network type stream (EWMA
+    baseline and absolute deviation, open Poor stretch) plus the last network
+    rank per device, so memory stays constant and every batch is scored
+    without looking at earlier readings. Batches are expected in time order
+    per device. Where an export lists several cells per timestamp, the
+    strongest one is taken as the serving cell (cells of one timestamp split
+    across two batches are scored as two readings).
+    """
+
+    def __init__(self, state=None, recent=RECENT_ANOMALIES):
+        state = state or {}
+        self.signal = state.get("signal", {})
+        self.latency = state.get("latency", {})
+        self.poor = state.get("poor", {})
+        self.ranks = state.get("ranks", {})
+        self.recent = deque(maxlen=recent)
+
+    def state(self):
+        """JSON-serializable detector state, see load_detector/save_detector."""
+        return {"signal": self.signal, "latency": self.latency, "poor": self.poor, "ranks": self.ranks}
+
+    def recent_anomalies(self, limit=None):
+        """The latest anomalies found by this detector, newest first."""
+        records = list(self.recent)[::-1][:limit]
+        return pd.DataFrame(records, columns=ANOMALY_COLUMNS) if records else empty_anomalies()
+
+    def update(self, df, device=DEFAULT_DEVICE):
+        """
+        Scores a batch of normalized readings and updates the baselines.
+        Returns the anomalies found in the batch as a DataFrame.
+        """
+        readings = self._serving_cells(df, device)
+        found = [
+            self._signal_drops(readings),
+            self._latency_spikes(readings),
+            self._poor_stretches(readings),
+            self._downgrades(readings)
+        ]
+        found = [frame for frame in found if not frame.empty]
+        if not found:
+            return empty_anomalies()
+
+        anomalies = pd.concat(found, ignore_index=True).sort_values("Timestamp", kind="stable")
+        anomalies = anomalies.reset_index(drop=True)[ANOMALY_COLUMNS]
+        self.recent.extend(anomalies.tail(self.recent.maxlen).to_dict("records"))
+        return anomalies
+
+    @staticmethod
+    def _serving_cells(df, device):
+        devices = df["Device_ID"] if "Device_ID" in df.columns else pd.Series(device, index=df.index)
+        readings = pd.DataFrame({
+            "Timestamp": df["Timestamp"].to_numpy(),
+            "Device_ID": devices.astype(str).to_numpy(),
+            "Network_Type": df["Network_Type"].astype(str).to_numpy(),
+            "Signal_dBm": df["Signal_dBm"].to_numpy(dtype="float64", na_value=np.nan),
+            "Latency_ms": df["Latency_ms"].to_numpy(dtype="float64", na_value=np.nan)
+        })
+        readings = readings[readings["Timestamp"].notna()]
+        readings = readings.groupby(["Device_ID", "Network_Type", "Timestamp"], sort=True, as_index=False).agg(
+            {"Signal_dBm": "max", "Latency_ms": "max"}
+        )
+        readings["stream"] = readings["Device_ID"] + _SEP + readings["Network_Type"]
+        return readings
+
+    @staticmethod
+    def _anomalies(rows, kind, value, baseline, detail):
+        return pd.DataFrame({
+            "Timestamp": rows["Timestamp"].to_numpy(),
+            "Device_ID": rows["Device_ID"].to_numpy(),
+            "Network_Type": rows["Network_Type"].to_numpy(),
+            "kind": kind,
+            "value": value,
+            "baseline": baseline,
+            "detail": detail
+        })
+
+    def _signal_drops(self, readings):
+        readings = readings[readings["Signal_dBm"].notna()]
+        streams = readings["stream"].to_numpy()
+        signal = readings["Signal_dBm"].to_numpy()
+        z, baseline = _ewma_scores(streams, signal, self.signal)
+        drop = _onsets(streams, (z <= -DROP_Z) & (baseline - signal >= MIN_DROP_DB), self.signal)
+        rows = readings[drop]
+        detail = [f"{value:.0f} dBm vs {base:.1f} dBm baseline" for value, base in zip(signal[drop], baseline[drop])]
+        return self._anomalies(rows, "signal_drop", signal[drop], baseline[drop], detail)
+
+    def _latency_spikes(self, readings):
+        # Latency is 0 when the export didn't measure it
+        readings = readings[readings["Latency_ms"] > 0]
+        streams = readings["stream"].to_numpy()
+        latency = readings["Latency_ms"].to_numpy()
+        z, baseline = _ewma_scores(streams, latency, self.latency)
+        spike = _onsets(streams, (z >= SPIKE_Z) & (latency - baseline >= MIN_SPIKE_MS), self.latency)
+        rows = readings[spike]
+        detail = [f"{value:.0f} ms vs {base:.0f} ms baseline" for value, base in zip(latency[spike], baseline[spike])]
+        return self._anomalies(rows, "latency_spike", latency[spike], baseline[spike], detail)
+
+    def _poor_stretches(self, readings):
+        readings = readings[readings["Signal_dBm"].notna()]
+        if readings.empty:
+            return self._anomalies(readings, "poor_stretch", np.nan, np.nan, [])
+        streams = readings["stream"].to_numpy()
+        times = readings["Timestamp"].to_numpy(dtype="datetime64[ns]").view("int64")
+        poor = quality_codes(readings["Signal_dBm"]) == 0
+
+        # Runs of Poor readings within a stream, broken where it went quiet
+        gap = np.diff(times) > STRETCH_GAP_SECONDS * 10**9
+        boundary = np.r_[True, (streams[1:] != streams[:-1]) | (poor[1:] != poor[:-1]) | gap]
+        run_starts, run_lengths = runs(np.cumsum(boundary))
+        run_ids = np.repeat(np.arange(len(run_starts)), run_lengths)
+        stretch_start = times[run_starts]
+        flagged = np.zeros(len(run_starts), dtype=bool)
+
+        # A stream's first run continues the Poor stretch left open last batch,
+        # unless the stream went quiet in between
+        stream_starts, stream_lengths = runs(streams)
+        for start in stream_starts:
+            open_stretch = self.poor.get(streams[start])
+            last_seen = open_stretch.get("last", times[start]) if open_stretch else None
+            if open_stretch and poor[start] and times[start] - last_seen <= STRETCH_GAP_SECONDS * 10**9:
+                run = run_ids[start]
+                stretch_start[run] = open_stretch["start"]
+                flagged[run] = open_stretch["flagged"]
+
+        elapsed = times - stretch_start[run_ids]
+        due = poor & (elapsed >= POOR_STRETCH_SECONDS * 10**9) & ~flagged[run_ids]
+        hits = np.flatnonzero(due)
+        hits = hits[np.r_[True, run_ids[hits][1:] != run_ids[hits][:-1]]] if len(hits) else hits
+        flagged[run_ids[hits]] = True
+
+        for start, length in zip(stream_starts, stream_lengths):
+            last = start + length - 1
+            if poor[last]:
+                run = run_ids[last]
+                self.poor[streams[last]] = {"start": int(stretch_start[run]), "last": int(times[last]),
+                                            "flagged": bool(flagged[run])}
+            else:
+                self.poor.pop(streams[last], None)
+
+        rows = readings.iloc[hits]
+        seconds = elapsed[hits] / 1e9
+        detail = [f"Poor signal for {value:.0f}s" for value in seconds]
+        return self._anomalies(rows, "poor_stretch", seconds, np.nan, detail)
+
+    def _downgrades(self, readings):
+        # Best network per device and timestamp, so a device reporting NR and
+        # LTE cells at once isn't seen flapping between them
+        ranks = readings["Network_Type"].map(NETWORK_RANKS)
+        best = readings.assign(rank=ranks).dropna(subset=["rank"])
+        best = best.sort_values(["Device_ID", "Timestamp", "rank"], kind="stable")
+        best = best.drop_duplicates(["Device_ID", "Timestamp"], keep="last")
+
+        devices = best["Device_ID"].to_numpy()
+        rank = best["rank"].to_numpy()
+        networks = best["Network_Type"].to_numpy()
+        previous_rank = np.r_[np.nan, rank[:-1]]
+        previous_network = np.r_[None, networks[:-1]]
+
+        starts, lengths = runs(devices)
+        for start, length in zip(starts, lengths):
+            last_seen = self.ranks.get(devices[start])
+            previous_rank[start] = last_seen["rank"] if last_seen else np.nan
+            previous_network[start] = last_seen["network"] if last_seen else None
+            last = start + length - 1
+            self.ranks[devices[last]] = {"rank": float(rank[last]), "network": networks[last]}
+
+        downgrade = rank < previous_rank
+        rows = best[downgrade]
+        detail = [f"{old} → {new}" for old, new in zip(previous_network[downgrade], networks[downgrade])]
+        return self._anomalies(rows, "downgrade", rank[downgrade], previous_rank[downgrade], detail)
+
+
+def load_detector(store_dir=STORE_DIR):
+    """Restores the detector state saved alongside a store, or starts fresh."""
+    try:
+        with open(os.path.join(anomalies_path(store_dir), "state.json")) as f:
+            return AnomalyDetector(json.load(f))
+    except (OSError, ValueError):
+        return AnomalyDetector()
+
+
+def save_detector(detector, store_dir=STORE_DIR):
+    path = os.path.join(anomalies_path(store_dir), "state.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(detector.state(), f)
+    os.replace(tmp_path, path)
+
+
+def save_anomalies(anomalies, store_dir=STORE_DIR):
+    """Appends anomalies to the store's event log, partitioned by day."""
+    if anomalies is None or anomalies.empty:
+        return
+    day = anomalies["Timestamp"].dt.strftime("%Y-%m-%d")
+    anomalies.assign(day=day).to_parquet(
+        os.path.join(anomalies_path(store_dir), "events"),
+        engine="pyarrow",
+        compression="zstd",
+        partition_cols=["day"],
+        index=False
+    )
+
+
+def load_anomalies(store_dir=STORE_DIR, start=None, end=None, kinds=None, network_types=None, limit=None,
+                   devices=None):
+    """
+    Loads logged anomalies inside [start, end), optionally limited to some
+    kinds, network types and devices, newest first. This is what the CLI and the
+    dashboard query.
+    """
+    path = os.path.join(anomalies_path(store_dir), "events")
+    if not os.path.isdir(path):
+        return empty_anomalies()
+
+    filters = []
+    if start is not None:
+        filters.append(("day", ">=", pd.Timestamp(start).strftime("%Y-%m-%d")))
+    if end is not None:
+        filters.append(("day", "<=", pd.Timestamp(end).strftime("%Y-%m-%d")))
+    if kinds:
+        filters.append(("kind", "in", list(kinds)))
+    if network_types:
+        filters.append(("Network_Type", "in", list(network_types)))
+    if devices:
+        filters.append(("Device_ID", "in", list(devices)))
+
+    anomalies = pd.read_parquet(path, engine="pyarrow", filters=filters or None)[ANOMALY_COLUMNS]
+    if start is not None:
+        anomalies = anomalies[anomalies["Timestamp"] >= pd.Timestamp(start)]
+    if end is not None:
+        anomalies = anomalies[anomalies["Timestamp"] < pd.Timestamp(end)]
+    anomalies = anomalies.sort_values("Timestamp", ascending=False, kind="stable")
+    return anomalies.head(limit) if limit else anomalies.reset_index(drop=True)
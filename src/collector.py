@@ -1,44 +1,431 @@
+import numpy as np
 import pandas as pd
+import csv
 import glob
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src.anomaly import clear_anomalies, load_detector, save_anomalies, save_detector
+from src.formats import assign_device, detect_format, normalize_frame
+from src.geo import clear_geo, compute_cells, update_cells
+from src.leaderboard import clear_leaderboard, compute_histograms, update_histograms
+from src.manifest import check_file, load_manifest, save_manifest
+from src.metrics import count, instrument, timed
+from src.rollups import clear_rollups, compute_rollups, merge_rollups, update_rollups
+from src.sessions import clear_sessions, load_tracker, save_sessions, save_tracker
+from src.sketches import clear_sketches, compute_sketches, merge_sketches, update_sketches
+from src.store import (
+    STORE_DIR, clear_readings, clear_retention, manifest_path, readings_path, store_lock, write_readings
+)
 
-def collect_data(data_folder="data", output_file="data/network_data_output.csv"):
+# Exports are parsed in chunks sized so a chunk and its derived copies
+# (normalized frame, dedup keys, rollup temporaries) stay under the limit.
+# The estimate is deliberately generous for the string-heavy raw CSV rows.
+DEFAULT_MEMORY_LIMIT_MB = 512
+BYTES_PER_ROW_ESTIMATE = 1024
+MIN_CHUNK_ROWS = 1000
+
+# A reading is identified by the device that took it, when, on which network
+# and what it measured; exports often carry several neighbour cells per
+# timestamp, so the signal value is part of the key
+DEDUP_KEYS = ["Device_ID", "Timestamp", "Network_Type", "Signal_dBm"]
+
+
+def normalize_readings(df):
+    """Maps a parsed export or upload to the store schema per its detected format."""
+    return normalize_frame(df)
+
+
+def _chunk_rows(memory_limit_mb):
+    return max(MIN_CHUNK_ROWS, int(memory_limit_mb * 1024 * 1024) // BYTES_PER_ROW_ESTIMATE)
+
+
+def _iter_export(path, offset=0, chunk_rows=None):
+    """
+    Parses an export in chunks of at most chunk_rows rows, yielding each one
+    normalized, with readings that don't name their device attributed to the
+    export (see _device_name). The format is detected once from the header
+    line, and only the columns it maps are parsed. With a non-zero offset only
+    the rows appended after that byte position are parsed.
+    """
+    device = _device_name(path)
+    with open(path, "rb") as f:
+        names = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        plan = detect_format(names)
+        options = {"chunksize": chunk_rows or _chunk_rows(DEFAULT_MEMORY_LIMIT_MB)}
+        if offset:
+            options["header"] = None
+            options["names"] = names
+            f.seek(offset)
+        else:
+            f.seek(0)
+        count("collect.bytes_read", os.fstat(f.fileno()).st_size - offset)
+
+        try:
+            with plan.read_csv(f, **options) as reader:
+                while True:
+                    with timed("collect.parse"):
+                        chunk = next(reader, None)
+                    if chunk is None:
+                        return
+                    with timed("collect.normalize"):
+                        df = assign_device(plan.apply(chunk), device)
+                    yield df
+        except pd.errors.EmptyDataError:
+            return
+
+
+def _prepare_chunk(df):
+    """
+    Does the per-chunk work that doesn't depend on the store: drops readings
+    repeated within the chunk, hashes the dedup keys and computes rollups.
+    Returns (df, keys, rollups, parsed_rows).
     """
-    Collects all CSVs from a folder, normalizes columns, fills missing data,
-    and saves a combined CSV.
+    parsed_rows = len(df)
+    with timed("collect.hash_keys"):
+        keys = _row_keys(df)
+    unique = ~pd.Series(keys).duplicated().to_numpy()
+    if not unique.all():
+        df, keys = df[unique], keys[unique]
+    with timed("collect.rollups"):
+        rollups = compute_rollups(df)
+    return df, keys, rollups, parsed_rows
+
+
+def _prepare_export(path, offset, chunk_rows):
+    # Runs in a worker process; returns every prepared chunk of one export
+    return [_prepare_chunk(df) for df in _iter_export(path, offset, chunk_rows)]
+
+
+def _prepared_exports(jobs, chunk_rows, workers):
     """
-    csv_files = glob.glob(os.path.join(data_folder, "*.csv"))
+    Yields (file, prepared chunks) for every (file, offset) job in job order.
+    With several workers, up to `workers` exports are prepared in parallel
+    processes while the caller consumes results strictly in order, so the
+    output is identical to a serial run.
+    """
+    if workers <= 1:
+        for file, offset in jobs:
+            yield file, (_prepare_chunk(df) for df in _iter_export(file, offset, chunk_rows))
+        return
+
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for file, offset in jobs:
+            in_flight.append((file, pool.submit(_prepare_export, file, offset, chunk_rows)))
+            if len(in_flight) == workers:
+                break
+
+        while in_flight:
+            file, future = in_flight.popleft()
+            next_job = next(jobs, None)
+            if next_job is not None:
+                in_flight.append((next_job[0], pool.submit(_prepare_export, *next_job, chunk_rows)))
+            yield file, future.result()
+
+
+def _row_keys(df):
+    # Key columns are already typed, so "-100" and "-100.0" hash the same
+    keys = df[DEDUP_KEYS].astype({"Device_ID": "object", "Network_Type": "object"})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _load_keys(keys_file):
+    # Kept sorted so membership checks are binary searches
+    if os.path.exists(keys_file):
+        return np.sort(np.load(keys_file), kind="stable")
+    return np.empty(0, dtype=np.uint64)
+
+
+def _contains(sorted_keys, keys):
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    # Searching in key order keeps the binary searches cache-friendly
+    order = np.argsort(keys)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys[order]), len(sorted_keys) - 1)
+    found = np.empty(len(keys), dtype=bool)
+    found[order] = sorted_keys[positions] == keys[order]
+    return found
+
+
+def _add_keys(sorted_keys, keys):
+    # Both inputs are sorted, so the stable sort (timsort) is a linear merge
+    return np.sort(np.concatenate([sorted_keys, np.sort(keys)]), kind="stable")
+
+
+def _keys_file(store_dir):
+    return os.path.join(store_dir, "row_keys.npy")
+
+
+@instrument("collect.dedup")
+def _drop_seen(df, keys, rollups, seen_keys):
+    """
+    Drops readings already in the store (or in an earlier chunk) and adds the
+    rest to the key index. Returns (df, rollups, seen_keys).
+    """
+    fresh = ~_contains(seen_keys, keys)
+    if not fresh.all():
+        df, keys = df[fresh], keys[fresh]
+        rollups = compute_rollups(df)
+    return df, rollups, _add_keys(seen_keys, keys)
+
+
+def _reset_store(store_dir, keys_file):
+    clear_readings(store_dir)
+    clear_rollups(store_dir)
+    clear_anomalies(store_dir)
+    clear_geo(store_dir)
+    clear_leaderboard(store_dir)
+    clear_sketches(store_dir)
+    clear_sessions(store_dir)
+    clear_retention(store_dir)
+    if os.path.exists(keys_file):
+        os.remove(keys_file)
+
+
+@instrument("collect.aggregate")
+def _aggregate(df, rollups):
+    # Everything maintained incrementally from the stored readings
+    return {
+        "rollups": rollups,
+        "cells": compute_cells(df),
+        "histograms": compute_histograms(df),
+        "sketches": compute_sketches(df)
+    }
+
+
+def _aggregate_rows(delta):
+    frames = [*delta["rollups"].values(), *delta["cells"].values(), delta["histograms"],
+              *delta["sketches"].values()]
+    return sum(len(frame) for frame in frames)
+
+
+@instrument("collect.flush")
+def _flush_aggregates(store_dir, deltas):
+    if not deltas:
+        return
+    update_rollups(store_dir, {
+        name: merge_rollups([delta["rollups"][name] for delta in deltas])
+        for name in deltas[0]["rollups"]
+    })
+    update_cells(store_dir, [delta["cells"] for delta in deltas])
+    update_histograms(store_dir, [delta["histograms"] for delta in deltas])
+    update_sketches(store_dir, {
+        name: merge_sketches([delta["sketches"][name] for delta in deltas])
+        for name in deltas[0]["sketches"]
+    })
+
+
+def _device_name(path):
+    # Each export comes from one device, named after the file
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _is_derived(path, store_dir):
+    path = os.path.abspath(path)
+    return os.path.commonpath([path, store_dir]) == store_dir
+
+
+def input_files(sources, store_dir=STORE_DIR):
+    """
+    The CSV exports named by sources: a folder (its *.csv files), a glob
+    pattern, a file, or a list of those. Files under store_dir are skipped.
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    store_path = os.path.abspath(store_dir)
+    files = set()
+    for source in map(os.fspath, sources):
+        if os.path.isdir(source):
+            files.update(glob.glob(os.path.join(source, "*.csv")))
+        elif any(char in source for char in "*?["):
+            files.update(glob.glob(source))
+        elif os.path.isfile(source):
+            files.add(source)
+    return sorted(os.path.normpath(file) for file in files if not _is_derived(file, store_path))
+
+
+def _describe(sources):
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    return ", ".join(map(os.fspath, sources))
+
+
+@instrument("collect")
+def collect_data(data_folder="data", store_dir=STORE_DIR, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 workers=1):
+    """
+    Collects all CSVs from a folder (or the exports named by a glob pattern,
+    file path or list of them, see input_files), normalizes columns, fills
+    missing data, drops readings that were already ingested and appends the
+    rest to the columnar readings store, partitioned by device and day. An
+    export's readings belong to the device its Device_ID column names, or
+    else to the export itself (its file name without extension). The
+    1m/1h/1d rollups are updated incrementally from the same batches, as are
+    the geohash coverage cells of readings with GPS coordinates, the
+    per-location signal histograms behind the leaderboards and the per-hour
+    quantile sketches, and the new readings are fed to the anomaly detector
+    and sessionized (sessions, dwell time per network and quality,
+    handovers; see src.sessions), whose state and findings are kept in the
+    store too.
+
+    Everything derived (the store, its manifest and the row-key index) is
+    written under store_dir, and files under that directory are never treated
+    as input. The manifest (size, mtime, content hash and row count per
+    export) lets unchanged exports be skipped and exports that only grew have
+    just their new rows parsed.
+
+    Exports are streamed in bounded chunks, each normalized, de-duplicated and
+    written before the next is read, so peak memory follows memory_limit_mb
+    rather than the size of the exports.
+
+    With workers > 1, exports are parsed, normalized and rolled up in a pool
+    of worker processes while this process de-duplicates against the store
+    and writes in file order, giving the same store as a serial run. Each
+    in-flight export is held in memory whole, so parallel mode needs about
+    `workers` times the largest export on top of the memory limit.
+    """
+    with store_lock(store_dir):
+        _collect(data_folder, store_dir, memory_limit_mb, workers)
+
+
+def _collect(data_folder, store_dir, memory_limit_mb, workers):
+    manifest_file = manifest_path(store_dir)
+    keys_file = _keys_file(store_dir)
+
+    os.makedirs(store_dir, exist_ok=True)
+
+    csv_files = input_files(data_folder, store_dir)
     if not csv_files:
-        print(f"No CSV files found in {data_folder}/")
+        print(f"No CSV files found in {_describe(data_folder)}")
         return
 
-    data_frames = []
+    manifest = load_manifest(manifest_file)
+    if not os.path.isdir(readings_path(store_dir)) or not manifest["files"]:
+        # Without both the readings and their manifest we can't tell what has
+        # already been ingested, so start over
+        manifest["files"] = {}
+        _reset_store(store_dir, keys_file)
+
+    pending = []
+    skipped = 0
+    touched = False
     for file in csv_files:
-        df = pd.read_csv(file)
-
-        # Rename columns if needed
-        df = df.rename(columns={
-            "dBm": "Signal_dBm",
-            "NetworkType": "Network_Type"
-        })
-
-        # Fill missing columns with defaults
-        for col, default in {
-            "Location": "Unknown",
-            "Download_Mbps": 0,
-            "Upload_Mbps": 0,
-            "Latency_ms": 0,
-            "Signal_dBm": -100,
-            "Network_Type": "Unknown"
-        }.items():
-            if col not in df.columns:
-                df[col] = default
-
-        data_frames.append(df)
-
-    # Combine all CSVs into one DataFrame
-    combined = pd.concat(data_frames, ignore_index=True)
-
-    # Save combined CSV
-    combined.to_csv(output_file, index=False)
-    print(f"Data collected and saved to {output_file}")
+        entry = manifest["files"].get(file)
+        status, fingerprint = check_file(file, entry)
+
+        if status == "changed":
+            # A rewritten export invalidates the rows already merged from it
+            print(f"{file} was rewritten, rebuilding {store_dir}/")
+            _reset_store(store_dir, keys_file)
+            return _collect(data_folder, store_dir, memory_limit_mb, workers)
+
+        if status == "unchanged":
+            touched = touched or fingerprint is not entry
+            manifest["files"][file] = fingerprint
+            skipped += 1
+        else:
+            pending.append((file, status, fingerprint))
+
+    seen_keys = _load_keys(keys_file)
+    detector = load_detector(store_dir)
+    tracker = load_tracker(store_dir)
+    chunk_rows = _chunk_rows(memory_limit_mb)
+    # Aggregate deltas (rollups, geo cells, histograms, quantile sketches) are
+    # buffered and merged into the stored ones once they reach a chunk's worth
+    # of rows, so their files aren't rewritten per chunk and the buffer stays
+    # within the memory limit
+    deltas = []
+    buffered_rows = 0
+    new_rows = 0
+    duplicates = 0
+    jobs = []
+    for file, status, fingerprint in pending:
+        entry = manifest["files"].get(file)
+        jobs.append((file, entry["size"] if status == "appended" else 0))
+
+    for (file, status, fingerprint), (_, chunks) in zip(pending, _prepared_exports(jobs, chunk_rows, workers)):
+        parsed_rows = 0
+        anomalies = []
+        sessions = []
+
+        for df, keys, rollups, chunk_rows_parsed in chunks:
+            parsed_rows += chunk_rows_parsed
+
+            df, rollups, seen_keys = _drop_seen(df, keys, rollups, seen_keys)
+            write_readings(df, store_dir)
+            with timed("collect.anomalies"):
+                anomalies.append(detector.update(df, device=_device_name(file)))
+            with timed("collect.sessions"):
+                sessions.append(tracker.update(df, device=_device_name(file)))
+            deltas.append(_aggregate(df, rollups))
+            buffered_rows += _aggregate_rows(deltas[-1])
+            if buffered_rows >= chunk_rows:
+                _flush_aggregates(store_dir, deltas)
+                deltas, buffered_rows = [], 0
+
+            new_rows += len(df)
+            duplicates += chunk_rows_parsed - len(df)
+
+        if anomalies:
+            save_anomalies(pd.concat(anomalies, ignore_index=True), store_dir)
+        save_sessions(sessions, store_dir)
+
+        entry = manifest["files"].get(file)
+        previous_rows = entry["rows"] if status == "appended" else 0
+        manifest["files"][file] = dict(fingerprint, rows=previous_rows + parsed_rows)
+
+    # The manifest's mtime doubles as the store version readers cache on, so
+    # only rewrite it when something actually changed
+    if pending:
+        _flush_aggregates(store_dir, deltas)
+        np.save(keys_file, seen_keys)
+        save_detector(detector, store_dir)
+        save_tracker(tracker, store_dir)
+    if pending or touched:
+        save_manifest(manifest, manifest_file)
+
+    count("collect.files_read", len(pending))
+    count("collect.files_skipped", skipped)
+    count("collect.rows_in", new_rows + duplicates)
+    count("collect.rows_out", new_rows)
+    count("collect.duplicates", duplicates)
+    if pending:
+        print(f"Data collected and saved to {store_dir}/ "
+              f"({new_rows} new rows from {len(pending)} file(s), "
+              f"{duplicates} duplicates dropped, {skipped} unchanged)")
+    else:
+        print(f"No new data in {_describe(data_folder)}, {store_dir}/ is up to date")
+
+
+def ingest_readings(df, store_dir=STORE_DIR, seen_keys=None, device="uploads"):
+    """
+    Adds normalized readings that don't come from an export scan (e.g. device
+    uploads to the ingestion server) to the store: readings without a
+    Device_ID are attributed to `device`, duplicates are dropped, the rest
+    are written, scored for anomalies and sessionized, and the rollups, geo
+    cells, leaderboard histograms, quantile sketches and row-key index
+    updated.
+
+    Returns (seen_keys, new_rows); callers committing repeatedly can pass the
+    returned key index back in instead of having it reloaded from disk.
+    """
+    keys_file = _keys_file(store_dir)
+    if seen_keys is None:
+        seen_keys = _load_keys(keys_file)
+
+    df, keys, rollups, _ = _prepare_chunk(assign_device(df, device))
+    df, rollups, seen_keys = _drop_seen(df, keys, rollups, seen_keys)
+    write_readings(df, store_dir)
+    _flush_aggregates(store_dir, [_aggregate(df, rollups)])
+    np.save(keys_file, seen_keys)
+
+    detector = load_detector(store_dir)
+    save_anomalies(detector.update(df, device=device), store_dir)
+    save_detector(detector, store_dir)
+
+    tracker = load_tracker(store_dir)
+    save_sessions([tracker.update(df, device=device)], store_dir)
+    save_tracker(tracker, store_dir)
+    return seen_keys, len(df)
@@ -0,0 +1,221 @@
+import glob
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.anomaly import anomalies_path
+from src.metrics import count, instrument
+from src.rollups import rollups_path
+from src.sessions import sessions_path
+from src.store import (
+    PARTITION_COLS, STORE_DIR, load_retention, manifest_path, readings_path, retention_path, store_lock
+)
+
+# Lifecycle of the store. Every ingest batch adds a file to each partition it
+# touches, so a store fed by the ingestion server (a commit every half
+# second) collects thousands of small files a day and every query pays for
+# opening them. Compaction rewrites each partition of the append-only tables
+# that holds more than one file as a single file sorted by time: few large
+# files with tight row-group statistics. It takes the store lock one
+# partition at a time, so ingestion keeps going while it runs.
+#
+# Retention bounds the growth: raw readings are kept for RAW_RETENTION_DAYS
+# and 1-minute rollups for MINUTE_RETENTION_DAYS; hourly and daily rollups,
+# quantile sketches, leaderboards, coverage cells, sessions and anomalies are
+# kept for good. Windows count back from the newest day in the store rather
+# than from the clock, so replaying old exports doesn't expire them on
+# arrival. The first day kept at each tier is recorded in retention.json
+# (store.load_retention) and only ever moves forward; readers answer ranges
+# reaching past it from the next tier (rollups.load_tiered_rollups and
+# rollup_timeline). The row-key index keeps the keys of expired readings, so
+# re-sent old readings are still dropped as duplicates, while late readings
+# for expired days update the rollups and are expired again on the next run.
+RAW_RETENTION_DAYS = 30
+MINUTE_RETENTION_DAYS = 180
+
+# Name of the merged file in a compacted partition. Its Parquet metadata
+# lists the files merged into it, so sources left behind by an interrupted
+# compaction are recognized and removed rather than read twice.
+COMPACTED_FILE = "compacted.parquet"
+SOURCES_KEY = b"netpulse.compacted_from"
+
+
+def _table_partitions(store_dir):
+    """(partition directory, column to sort by) of every append-only table."""
+    tables = [
+        (os.path.join(glob.escape(readings_path(store_dir)), "*", "*"), "Timestamp"),
+        (os.path.join(glob.escape(anomalies_path(store_dir)), "events", "*"), "Timestamp"),
+        (os.path.join(glob.escape(sessions_path(store_dir)), "spans", "*"), "start"),
+        (os.path.join(glob.escape(sessions_path(store_dir)), "dwell", "*"), "hour"),
+        (os.path.join(glob.escape(sessions_path(store_dir)), "handovers", "*"), "Timestamp")
+    ]
+    for pattern, sort_by in tables:
+        for directory in sorted(glob.glob(pattern)):
+            yield directory, sort_by
+
+
+def _parquet_files(directory):
+    return sorted(glob.glob(os.path.join(glob.escape(directory), "*.parquet")))
+
+
+def _merged_sources(path):
+    metadata = pq.read_schema(path).metadata or {}
+    return set(json.loads(metadata.get(SOURCES_KEY, b"[]")))
+
+
+def compact_partition(directory, sort_by="Timestamp"):
+    """
+    Rewrites the Parquet files of one partition directory as a single file
+    sorted by `sort_by`. The new file replaces the old one atomically before
+    its sources are removed. Returns (files, bytes) before and after, or
+    None when the partition already was a single file.
+    """
+    files = _parquet_files(directory)
+    target = os.path.join(directory, COMPACTED_FILE)
+    if target in files:
+        merged = _merged_sources(target)
+        leftovers = [file for file in files if os.path.basename(file) in merged]
+        for file in leftovers:
+            os.remove(file)
+        files = [file for file in files if file not in leftovers]
+    if len(files) < 2:
+        return None
+
+    size_before = sum(os.path.getsize(file) for file in files)
+    # Partition values live in the directory names, not in the files
+    tables = [pq.read_table(file, partitioning=None) for file in files]
+    table = pa.concat_tables(tables, promote_options="permissive").sort_by(sort_by)
+    sources = [os.path.basename(file) for file in files if file != target]
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCES_KEY: json.dumps(sources)})
+
+    tmp_path = os.path.join(directory, "." + COMPACTED_FILE + ".tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, target)
+    for file in files:
+        if file != target:
+            os.remove(file)
+    return (len(files), size_before), (1, os.path.getsize(target))
+
+
+@instrument("compaction.compact")
+def compact_store(store_dir=STORE_DIR):
+    """
+    Compacts every partition of the readings, anomaly and session tables
+    that holds more than one file. Returns files and bytes before and after,
+    over the partitions that were rewritten.
+    """
+    stats = {"partitions": 0, "files_before": 0, "files_after": 0, "bytes_before": 0, "bytes_after": 0}
+    for directory, sort_by in _table_partitions(store_dir):
+        # Listing without the lock is cheap and skips partitions already compacted
+        if len(_parquet_files(directory)) < 2:
+            continue
+        with store_lock(store_dir):
+            result = compact_partition(directory, sort_by)
+        if result is None:
+            continue
+        (files_before, bytes_before), (files_after, bytes_after) = result
+        stats["partitions"] += 1
+        stats["files_before"] += files_before
+        stats["files_after"] += files_after
+        stats["bytes_before"] += bytes_before
+        stats["bytes_after"] += bytes_after
+
+    count("compaction.partitions", stats["partitions"])
+    count("compaction.files_removed", stats["files_before"] - stats["files_after"])
+    return stats
+
+
+def _partition_days(path):
+    """{day: directory} of the day=YYYY-MM-DD partitions under path."""
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return {}
+    # Readings without a timestamp are in day=unknown and never expire
+    return {
+        name[4:]: os.path.join(path, name) for name in names
+        if name.startswith("day=") and name[4:] != "unknown"
+    }
+
+
+def _device_dirs(store_dir):
+    return glob.glob(os.path.join(glob.escape(readings_path(store_dir)), f"{PARTITION_COLS[0]}=*"))
+
+
+def _tree_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def _save_retention(retention, store_dir):
+    path = retention_path(store_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({tier: day.strftime("%Y-%m-%d") for tier, day in retention.items()}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@instrument("compaction.expire")
+def expire_store(store_dir=STORE_DIR, raw_days=RAW_RETENTION_DAYS, minute_days=MINUTE_RETENTION_DAYS):
+    """
+    Drops the day partitions of raw readings older than raw_days and of
+    1-minute rollups older than minute_days, counting back from the newest
+    day in the store (None keeps a tier for good). Returns the first day
+    kept per tier and the partitions and bytes dropped.
+    """
+    for window in (raw_days, minute_days):
+        if window is not None and window < 1:
+            raise ValueError("Retention windows must be at least one day")
+
+    with store_lock(store_dir):
+        days = sorted(_partition_days(rollups_path(store_dir, "1d")))
+        if not days:
+            return {"retention": {}, "partitions_dropped": 0, "bytes_dropped": 0}
+        oldest, newest = pd.Timestamp(days[0]), pd.Timestamp(days[-1])
+
+        retention = load_retention(store_dir)
+        for tier, window in (("raw_from", raw_days), ("minute_from", minute_days)):
+            # A tier is only recorded once the store reaches back past its window
+            # (the daily rollups go back to the first day ever ingested)
+            cutoff = None if window is None else newest - pd.Timedelta(days=window - 1)
+            if cutoff is not None and cutoff > oldest:
+                retention[tier] = max(cutoff, retention.get(tier, cutoff))
+
+        expired = []
+        if "raw_from" in retention:
+            cutoff = retention["raw_from"].strftime("%Y-%m-%d")
+            for device_dir in _device_dirs(store_dir):
+                expired += [path for day, path in _partition_days(device_dir).items() if day < cutoff]
+        if "minute_from" in retention:
+            cutoff = retention["minute_from"].strftime("%Y-%m-%d")
+            expired += [path for day, path in _partition_days(rollups_path(store_dir, "1m")).items() if day < cutoff]
+
+        dropped = 0
+        for path in expired:
+            dropped += _tree_size(path)
+            shutil.rmtree(path)
+        # Devices whose readings have all expired leave the device list
+        for device_dir in _device_dirs(store_dir):
+            if not os.listdir(device_dir):
+                os.rmdir(device_dir)
+
+        if retention != load_retention(store_dir) or expired:
+            _save_retention(retention, store_dir)
+            # Readers cache on the manifest's mtime (store_version)
+            if os.path.exists(manifest_path(store_dir)):
+                os.utime(manifest_path(store_dir))
+
+    count("compaction.partitions_expired", len(expired))
+    return {"retention": retention, "partitions_dropped": len(expired), "bytes_dropped": dropped}
+
+
+def maintain_store(store_dir=STORE_DIR, raw_days=RAW_RETENTION_DAYS, minute_days=MINUTE_RETENTION_DAYS):
+    """
+    Expires data past the retention windows, then compacts what is left (so
+    partitions about to be dropped aren't rewritten first). Returns the
+    stats of both steps in one dict.
+    """
+    return {**expire_store(store_dir, raw_days, minute_days), **compact_store(store_dir)}
@@ -1,8 +1,32 @@
+import functools
+import json
+import sys
+import time
+from dataclasses import replace
+from datetime import timedelta
 import streamlit as st
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from collector import collect_data
-from analyzer import analyze_data
+
+# `streamlit run src/dashboard.py` only puts src/ on the path; add the project
+# root so the dashboard imports the `src` package the same way main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.collector import collect_data
+from src.analyzer import percentile_dict, prepare_readings, summarize, summarize_rollups
+from src.anomaly import load_anomalies
+from src.downsample import downsample_frame
+from src.geo import compute_cells, coverage_bounds, coverage_cells
+from src.leaderboard import compute_histograms, network_leaderboard, top_locations
+from src.live import LogTailer
+from src.metrics import Registry, count, enable, enabled, record, reset, snapshot, timed, use
+from src.rollups import load_rollups, rollup_timeline
+from src.schema import select_positions, take_rows
+from src.sessions import handover_rates, load_dwell, load_sessions
+from src.sketches import load_sketches, sketch_quantiles
+from src.sql import EXAMPLE_QUERY, connect, run_query, table_sources
+from src.store import list_devices, load_readings, load_retention, store_version
 
 # NetPulse - Network QoS Analysis Dashboard
 # Created by: RaoVrn
@@ -58,44 +82,222 @@ st.markdown(f"""
 
 # --- Data Collection ---
 data_dir = Path(__file__).parent.parent / 'data'
-output_file = str(data_dir / 'network_data_output.csv')
-collect_data(str(data_dir), output_file)
-df = pd.read_csv(output_file)
-
-# --- Normalize & Prepare Data ---
-# Standardize column names that may vary between CSVs
-df = df.rename(columns={
-    "dBm": "Signal_dBm",
-    "Signal": "Signal_dBm",
-    "NetworkType": "Network_Type",
-    "Download": "Download_Mbps",
-    "Upload": "Upload_Mbps",
-    "Latency": "Latency_ms"
-})
-
-# Ensure required columns exist with safe defaults
-for col, default in {
-    "Signal_dBm": -120,
-    "Network_Type": "Unknown",
-    "Location": "Unknown",
-    "Download_Mbps": 0.0,
-    "Upload_Mbps": 0.0,
-    "Latency_ms": 0.0
-}.items():
-    if col not in df.columns:
-        df[col] = default
-
-# Parse timestamps if available
-if "Timestamp" in df.columns:
+store_dir = str(data_dir / 'store')
+
+# Stage timings and counters are recorded per browser session, while its
+# diagnostics toggle (or NETPULSE_METRICS) is on; the toggle is read before
+# anything runs. Cached results are shared, so a session only counts the
+# misses it computed itself.
+use(st.session_state.setdefault("metrics", Registry()))
+enable(st.session_state.get("diagnostics", enabled()))
+run_started = time.perf_counter()
+
+# Only stats the exports unless something new arrived
+collect_data(str(data_dir), store_dir)
+data_version = store_version(store_dir)
+
+
+# --- Cached Data Layer ---
+# Everything below is keyed on the store version and the selected devices, so
+# reruns triggered by widgets reuse the loaded dataset and only recompute what
+# the filter changes. Selecting devices loads only their partitions.
+# cache_resource hands back the same object instead of a pickled copy, and
+# max_entries bounds how many datasets/filters stay in memory. Filters are row
+# positions into the one loaded frame, never filtered copies of it.
+def tracked(cache, **options):
+    """
+    cache(**options) that also times every call and counts calls and misses
+    (the function body only runs on a miss) for the diagnostics panel.
+    """
+    def decorate(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def compute(*args):
+            count(f"dashboard.cache_misses.{name}")
+            return func(*args)
+        cached = cache(**options)(compute)
+
+        @functools.wraps(func)
+        def call(*args):
+            count(f"dashboard.cache_calls.{name}")
+            with timed(f"dashboard.{name}"):
+                return cached(*args)
+        return call
+    return decorate
+
+
+@tracked(st.cache_resource, max_entries=1, show_spinner="Loading readings...")
+def load_dataset(store_dir, version, devices):
+    # Classify and sort once per dataset version rather than on every rerun
+    return prepare_readings(load_readings(store_dir, devices=list(devices) or None))
+
+
+@tracked(st.cache_resource, max_entries=16)
+def filter_rows(store_dir, version, devices, network_types):
+    """Positions of the rows of the selected network types (None: every row)."""
+    return select_positions(load_dataset(store_dir, version, devices), "Network_Type", network_types)
+
+
+def filter_view(store_dir, version, devices, network_types, columns=None, last=None):
+    """The filtered rows, materializing only the requested columns and rows."""
+    positions = filter_rows(store_dir, version, devices, network_types)
+    return take_rows(load_dataset(store_dir, version, devices), positions, columns, last)
+
+
+@tracked(st.cache_data, max_entries=64)
+def filter_aggregates(store_dir, version, devices, network_types):
+    """
+    Small per-filter results, cached for many more filters than the views.
+    KPIs come from the daily rollups and their percentiles from the daily
+    quantile sketches, so raw rows are only touched for the time range
+    (first/last of the time-sorted view). Rollups and sketches cover the
+    whole fleet, so a device selection is summarized from its loaded rows.
+    """
+    time_range = None
+    if "Timestamp" in load_dataset(store_dir, version, devices).columns:
+        timestamps = filter_view(store_dir, version, devices, network_types, ["Timestamp"])["Timestamp"].dropna()
+        if len(timestamps):
+            time_range = (timestamps.iloc[0], timestamps.iloc[-1])
+
+    rollup = None if devices else load_rollups(store_dir, "1d", network_types=network_types)
+    if time_range is not None and rollup is not None and len(rollup) and "raw_from" in load_retention(store_dir):
+        # The timeline reaches back into the days only the rollups still cover
+        time_range = (min(time_range[0], rollup["bucket"].min()), time_range[1])
+    if rollup is None:
+        view = filter_view(store_dir, version, devices, network_types)
+        summary = summarize(view)
+        by_network = view.groupby("Network_Type", observed=True)["Signal_dBm"].agg([
+            ("mean", "mean"),
+            ("count", "count")
+        ]).reset_index()
+    else:
+        summary = summarize_rollups(rollup)
+        totals = rollup.groupby("Network_Type", observed=True)[["Signal_dBm_sum", "Signal_dBm_count"]].sum()
+        by_network = pd.DataFrame({
+            "Network_Type": totals.index.astype(str),
+            "mean": totals["Signal_dBm_sum"] / totals["Signal_dBm_count"],
+            "count": totals["Signal_dBm_count"]
+        }).reset_index(drop=True)
+
+    sketch = None if devices else load_sketches(store_dir, network_types=network_types, name="1d")
+    if sketch is not None:
+        summary = replace(summary, percentiles=percentile_dict(sketch_quantiles(sketch)))
+
+    return {
+        "summary": summary,
+        "time_range": time_range,
+        "by_network": by_network
+    }
+
+
+# Points per network type sent to the browser for the timeline
+TIMELINE_POINT_BUDGET = 2000
+
+
+@tracked(st.cache_data, max_entries=64)
+def timeline_points(store_dir, version, devices, network_types, window):
+    """
+    Min/max-bucket downsampled timeline for one filter and zoom window. The
+    part of the window before the raw readings still kept is drawn from the
+    lowest and highest signal of the rollups (fleet-wide, so not for a
+    device selection).
+    """
+    start, end = window
+    view = filter_view(store_dir, version, devices, network_types, ["Timestamp", "Signal_dBm", "Network_Type"])
+    raw_from = load_retention(store_dir).get("raw_from")
+    if not devices and raw_from is not None and pd.Timestamp(start) < raw_from:
+        # Late readings of expired days may linger until the next compaction; the rollups have them too
+        view = view.iloc[view["Timestamp"].searchsorted(raw_from):]
+        history = rollup_timeline(store_dir, start, min(pd.Timestamp(end), raw_from), network_types)
+        view = pd.concat([history, view], ignore_index=True)
+    return downsample_frame(view, point_budget=TIMELINE_POINT_BUDGET, start=start, end=end)
+
+
+# Anomalies listed on the dashboard, newest first
+RECENT_ANOMALY_ROWS = 50
+
+
+@tracked(st.cache_data, max_entries=16)
+def recent_anomalies(store_dir, version, devices, network_types):
+    """Latest anomalies flagged at ingest for the selected devices and network types."""
+    return load_anomalies(store_dir, network_types=list(network_types) or None, limit=RECENT_ANOMALY_ROWS,
+                          devices=list(devices) or None)
+
+
+# Locations listed by handover rate
+HANDOVER_LOCATION_ROWS = 10
+
+
+@tracked(st.cache_data, max_entries=4)
+def session_overview(store_dir, version, devices):
+    """Sessions, overall handover rate, dwell per network and quality, busiest handover locations."""
+    devices = list(devices) or None
+    return (
+        load_sessions(store_dir, devices=devices),
+        handover_rates(store_dir, by=(), devices=devices),
+        load_dwell(store_dir, by=["Network_Type", "Signal_Quality"], devices=devices),
+        handover_rates(store_dir, by=["Location"], devices=devices).head(HANDOVER_LOCATION_ROWS)
+    )
+
+
+@tracked(st.cache_resource, max_entries=4)
+def device_aggregates(store_dir, version, devices):
+    """
+    Map cells and location histograms of the selected devices' readings; the
+    ones kept at ingest cover the whole fleet. None without a selection.
+    """
+    if not devices:
+        return None, None
+    df = load_dataset(store_dir, version, devices)
+    return compute_cells(df), compute_histograms(df)
+
+
+@tracked(st.cache_data, max_entries=4)
+def map_bounds(store_dir, version):
+    # The whole fleet's, so the viewport sliders keep their range across device selections
+    return coverage_bounds(store_dir)
+
+
+@tracked(st.cache_data, max_entries=32)
+def map_cells(store_dir, version, devices, network_types, bbox):
+    """Geohash cells in the viewport, at the finest precision the map can take."""
+    computed = device_aggregates(store_dir, version, devices)[0]
+    return coverage_cells(store_dir, bbox, list(network_types) or None, computed=computed)
+
+
+@tracked(st.cache_data, max_entries=32)
+def location_leaderboard(store_dir, version, devices, network_types, k, metric, ascending):
+    """Top or bottom k locations from the leaderboard index built at ingest (or the selected devices' readings)."""
+    histogram = device_aggregates(store_dir, version, devices)[1]
+    return top_locations(store_dir, k, metric, ascending, list(network_types) or None, histogram=histogram)
+
+
+@tracked(st.cache_data, max_entries=8)
+def network_ranking(store_dir, version, devices, metric):
+    return network_leaderboard(store_dir, metric, histogram=device_aggregates(store_dir, version, devices)[1])
+
+
+@tracked(st.cache_resource, max_entries=2)
+def sql_connection(store_dir, version):
+    """One DuckDB connection per store version, so file footers stay cached between queries."""
+    return connect(store_dir)
+
+
+@tracked(st.cache_data, max_entries=16)
+def sql_result(store_dir, version, sql):
+    """Result of an ad-hoc query; (frame, None) or (None, error message)."""
     try:
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
-    except Exception:
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+        return run_query(sql, store_dir, con=sql_connection(store_dir, version)), None
+    except (ImportError, ValueError) as error:
+        return None, str(error)
+
+
+def show_chart(fig):
+    # Serializing the figure for the browser is often the slowest part of a rerun
+    with timed("dashboard.plotly"):
+        st.plotly_chart(fig, use_container_width=True)
 
-# Compute signal quality classification on the full dataframe so sidebar can use it
-df["Signal_Quality"] = df["Signal_dBm"].apply(
-    lambda x: "Excellent" if x > -85 else ("Good" if x > -95 else "Poor")
-)
 
 
 # --- Sidebar ---
@@ -143,6 +345,17 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
+    selected_devices = st.multiselect(
+        "Select Devices",
+        list_devices(store_dir),
+        key="device_filter",
+        placeholder="All devices",
+        help="Only the selected devices' readings are loaded"
+    )
+    # Empty means every device; sorted so the cache key doesn't depend on selection order
+    device_key = tuple(sorted(selected_devices))
+    df = load_dataset(store_dir, data_version, device_key)
+
     network_types = df["Network_Type"].unique().tolist() if "Network_Type" in df.columns else []
     selected_network = st.multiselect(
         "Select Network Types",
@@ -151,16 +364,18 @@ with st.sidebar:
         key="network_filter"
     )
     
-    filtered_df = df.copy()  # Create a copy to avoid SettingWithCopyWarning
-    if selected_network:
-        filtered_df = filtered_df[filtered_df["Network_Type"].isin(selected_network)]
-    
+    # Sorted so the cache key doesn't depend on selection order
+    filter_key = tuple(sorted(selected_network))
+    filtered_positions = filter_rows(store_dir, data_version, device_key, filter_key)
+    filtered_rows = len(df) if filtered_positions is None else len(filtered_positions)
+    aggregates = filter_aggregates(store_dir, data_version, device_key, filter_key)
+    filtered_summary = aggregates["summary"]
+
     # Data Statistics
-    total_points = len(filtered_df)
+    total_points = filtered_summary.rows
     time_range = ""
-    if "Timestamp" in filtered_df.columns and not filtered_df.empty:
-        start_date = pd.to_datetime(filtered_df["Timestamp"]).min()
-        end_date = pd.to_datetime(filtered_df["Timestamp"]).max()
+    if aggregates["time_range"] is not None:
+        start_date, end_date = aggregates["time_range"]
         time_range = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
     
     st.markdown(f"""
@@ -173,19 +388,7 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     # Network Health Score
-    # Ensure Signal_Quality exists in the filtered dataframe
-    if "Signal_Quality" not in filtered_df.columns:
-        filtered_df = filtered_df.copy()
-        filtered_df.loc[:, "Signal_Quality"] = filtered_df["Signal_dBm"].apply(
-            lambda x: "Excellent" if x > -85 else ("Good" if x > -95 else "Poor")
-        )
-
-    signal_quality = filtered_df["Signal_Quality"].value_counts(normalize=True)
-    health_score = (
-        (signal_quality.get("Excellent", 0) * 100) +
-        (signal_quality.get("Good", 0) * 60) +
-        (signal_quality.get("Poor", 0) * 20)
-    )
+    health_score = filtered_summary.health_score
     
     st.markdown(f"""
         <div style='background-color:{THEME["bg_medium"]};padding:1rem;border-radius:8px;margin-top:1rem;'>
@@ -195,44 +398,88 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
+    # Live mode follows the exports as the device appends to them
+    live_mode = st.toggle("🔴 Live mode", value=False, key="live_mode",
+                          help="Tail growing exports in the data folder and refresh live readings automatically")
+
     st.markdown("""---""")
     st.markdown("<b>About NetPulse:</b> NetPulse helps you monitor and improve your network experience by providing actionable insights into signal quality, speed, and latency across different locations and network types.", unsafe_allow_html=True)
 
 
 # --- Data Analysis ---
-summary = analyze_data(output_file)
-filtered_summary = analyze_data(output_file)
-avg_signal = filtered_df["Signal_dBm"].mean()
-avg_download = filtered_df["Download_Mbps"].mean()
-avg_upload = filtered_df["Upload_Mbps"].mean()
-avg_latency = filtered_df["Latency_ms"].mean()
+avg_signal = filtered_summary.avg_signal
+avg_download = filtered_summary.avg_download
+avg_upload = filtered_summary.avg_upload
+avg_latency = filtered_summary.avg_latency
 
 # Signal Quality Distribution
-filtered_df["Signal_Quality"] = filtered_df["Signal_dBm"].apply(
-    lambda x: "Excellent" if x > -85 else ("Good" if x > -95 else "Poor")
-)
-signal_quality_dist = filtered_df["Signal_Quality"].value_counts().sort_index()
-
-# Best & Worst Location
-# Ensure Signal_Quality column exists and handle missing values
-if "Signal_dBm" in filtered_df.columns:
-    filtered_df["Signal_Quality"] = pd.cut(
-        filtered_df["Signal_dBm"],
-        bins=[-120, -95, -85, 0],
-        labels=["Poor", "Good", "Excellent"],
-        include_lowest=True
+signal_quality_dist = pd.Series(filtered_summary.quality_counts).loc[lambda s: s > 0].sort_index()
+
+# Best & Worst Location ("No Data" when every reading is missing)
+best_location = filtered_summary.best_location
+worst_location = filtered_summary.worst_location
+
+
+
+# --- Live Readings ---
+LIVE_REFRESH_SECONDS = 0.5
+LIVE_POINT_BUDGET = 1000
+
+
+@st.cache_resource
+def live_tailer(data_dir):
+    # One tailer per data folder, kept across reruns so byte offsets persist
+    return LogTailer(data_dir)
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_panel(tailer):
+    """Polls the tailer and redraws only this section on every tick."""
+    tailer.poll()
+    live_df = tailer.buffer.to_frame()
+
+    st.markdown(f"""
+        <h3 style='color:{THEME["text"]};font-size:1.3rem;margin-top:1rem;'>
+            🔴 Live Readings
+        </h3>
+    """, unsafe_allow_html=True)
+
+    if live_df.empty:
+        st.info("Waiting for new lines to be appended to the exports in the data folder...")
+        return
+
+    latest = live_df.iloc[-1]
+
+    live_cols = st.columns(4)
+    live_cols[0].metric("Latest Signal", f"{latest['Signal_dBm']:.0f} dBm", latest["Network_Type"])
+    live_cols[1].metric("Live Average", f"{live_df['Signal_dBm'].mean():.1f} dBm")
+    live_cols[2].metric("Buffered Readings", f"{len(live_df):,}")
+    # Filled in once the chart is drawn
+    latency_slot = live_cols[3].empty()
+
+    points = downsample_frame(live_df, point_budget=LIVE_POINT_BUDGET)
+    fig_live = px.line(
+        points,
+        x="Timestamp",
+        y="Signal_dBm",
+        color="Network_Type",
+        color_discrete_sequence=[THEME["primary"], THEME["secondary"], THEME["success"], THEME["error"]],
+        labels={"Signal_dBm": "Signal Strength (dBm)", "Timestamp": "Time", "Network_Type": "Network Type"},
+        template="plotly_dark"
     )
-else:
-    filtered_df["Signal_Quality"] = "Unknown"
+    fig_live.update_layout(plot_bgcolor=THEME['bg_dark'], paper_bgcolor=THEME['bg_dark'], font_color=THEME['text'],
+                           margin=dict(t=20, l=0, r=0, b=0), height=300)
+    show_chart(fig_live)
+
+    # From the tailer reading the newest lines to the chart showing them
+    latency = time.time() - latest["Received"]
+    latency_slot.metric("Update Latency", f"{latency * 1000:.0f} ms",
+                        help="Time from the newest readings being read from the export to this chart being drawn")
 
-# Best & Worst Location with fallback for NaN values
-if "Signal_dBm" in filtered_df.columns and "Location" in filtered_df.columns:
-    best_location = filtered_df.loc[filtered_df["Signal_dBm"].idxmax(skipna=True), "Location"] if not filtered_df["Signal_dBm"].isna().all() else "No Data"
-    worst_location = filtered_df.loc[filtered_df["Signal_dBm"].idxmin(skipna=True), "Location"] if not filtered_df["Signal_dBm"].isna().all() else "No Data"
-else:
-    best_location = "No Data"
-    worst_location = "No Data"
 
+if live_mode:
+    live_panel(live_tailer(str(data_dir)))
+    st.markdown('---')
 
 
 # --- Summary Metrics ---
@@ -252,11 +499,28 @@ metric_styles = [
     {"icon": "⚡", "color": THEME["error"]}
 ]
 
-for col, (metric, value, style) in zip(metrics_cols, [
-    ("Signal Strength", f"{avg_signal:.1f} dBm", metric_styles[0]),
-    ("Download Speed", f"{avg_download:.1f} Mbps", metric_styles[1]),
-    ("Upload Speed", f"{avg_upload:.1f} Mbps", metric_styles[2]),
-    ("Latency", f"{avg_latency:.1f} ms", metric_styles[3])
+# Percentiles shown under each average: the bad tail is the low end for signal
+# and throughput and the high end for latency
+KPI_PERCENTILES = {
+    "Signal_dBm": ["p5", "p50", "p95"],
+    "Download_Mbps": ["p5", "p50", "p95"],
+    "Upload_Mbps": ["p5", "p50", "p95"],
+    "Latency_ms": ["p50", "p95", "p99"]
+}
+
+
+def percentile_line(metric):
+    values = filtered_summary.percentiles.get(metric)
+    if not values:
+        return ""
+    return " · ".join(f"{label} {values[label]:.1f}" for label in KPI_PERCENTILES[metric])
+
+
+for col, (metric, value, column, style) in zip(metrics_cols, [
+    ("Signal Strength", f"{avg_signal:.1f} dBm", "Signal_dBm", metric_styles[0]),
+    ("Download Speed", f"{avg_download:.1f} Mbps", "Download_Mbps", metric_styles[1]),
+    ("Upload Speed", f"{avg_upload:.1f} Mbps", "Upload_Mbps", metric_styles[2]),
+    ("Latency", f"{avg_latency:.1f} ms", "Latency_ms", metric_styles[3])
 ]):
     with col:
         st.markdown(f"""
@@ -264,6 +528,7 @@ for col, (metric, value, style) in zip(metrics_cols, [
                 <div style='font-size:2rem;margin-bottom:0.5rem;'>{style["icon"]}</div>
                 <h3 style='color:{THEME["text"]};font-size:1.1rem;margin:0;'>{metric}</h3>
                 <p style='color:{style["color"]};font-size:1.5rem;font-weight:bold;margin:0.5rem 0;'>{value}</p>
+                <p style='color:{THEME["subtext"]};font-size:0.85rem;margin:0;'>{percentile_line(column)}</p>
             </div>
         """, unsafe_allow_html=True)
 st.markdown('---')
@@ -302,7 +567,7 @@ fig_quality.update_layout(
     xaxis=dict(showgrid=False),
     yaxis=dict(showgrid=True, gridcolor=THEME["bg_medium"])
 )
-st.plotly_chart(fig_quality, use_container_width=True)
+show_chart(fig_quality)
 
 
 # --- Best & Worst Location ---
@@ -330,6 +595,94 @@ with col_loc2:
         </div>
     """, unsafe_allow_html=True)
 
+# Leaderboards, answered from per-location signal histograms kept at ingest (or,
+# for a device selection, computed from its readings)
+LEADERBOARD_METRICS = {"Mean": "mean", "Median": "median", "5th percentile": "p5", "95th percentile": "p95"}
+lb_col1, lb_col2 = st.columns(2)
+with lb_col1:
+    leaderboard_k = st.slider("Locations to rank", 3, 50, 10, key="leaderboard_k")
+with lb_col2:
+    leaderboard_metric = LEADERBOARD_METRICS[st.selectbox("Rank by signal", list(LEADERBOARD_METRICS), key="leaderboard_metric")]
+
+# Every network type selected is the same as no filter, which the index answers directly
+leaderboard_key = () if set(filter_key) == set(network_types) else filter_key
+top_k = location_leaderboard(store_dir, data_version, device_key, leaderboard_key, leaderboard_k, leaderboard_metric,
+                             False)
+bottom_k = location_leaderboard(store_dir, data_version, device_key, leaderboard_key, leaderboard_k, leaderboard_metric,
+                                True)
+if top_k is None or top_k.empty:
+    st.info("Not enough readings per location for a leaderboard yet.")
+else:
+    stat_columns = {"count": "Readings", "mean": "Mean (dBm)", "median": "Median (dBm)",
+                    "p5": "P5 (dBm)", "p95": "P95 (dBm)"}
+
+    def leaderboard_table(ranked, key):
+        columns = {key: key.replace("_", " "), **stat_columns}
+        st.dataframe(ranked[list(columns)].rename(columns=columns).round(1), hide_index=True,
+                     use_container_width=True)
+
+    lb_col1, lb_col2 = st.columns(2)
+    with lb_col1:
+        st.markdown("**🏆 Strongest locations**")
+        leaderboard_table(top_k, "Location")
+    with lb_col2:
+        st.markdown("**📉 Weakest locations**")
+        leaderboard_table(bottom_k, "Location")
+
+    networks_ranked = network_ranking(store_dir, data_version, device_key, leaderboard_metric)
+    if networks_ranked is not None and not networks_ranked.empty:
+        st.markdown("**📶 Network types**")
+        leaderboard_table(networks_ranked, "Network_Type")
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+
+# --- Coverage Map ---
+st.markdown(f"""
+    <h3 style='color:{THEME["text"]};font-size:1.3rem;'>
+        🗺️ Coverage Map
+    </h3>
+    <p style='color:{THEME["subtext"]};'>Average signal per map cell {"for the selected devices" if selected_devices else "across all devices, aggregated at ingest"}. Narrow the viewport to see finer cells.</p>
+""", unsafe_allow_html=True)
+
+bounds = map_bounds(store_dir, data_version)
+if bounds is None:
+    st.info("No GPS coordinates in the collected data. Exports with Latitude/Longitude columns are mapped here.")
+else:
+    lat_range, lon_range = bounds[:2], bounds[2:]
+    map_col1, map_col2 = st.columns(2)
+    with map_col1:
+        lat_range = st.slider("Latitude", bounds[0], bounds[1], (bounds[0], bounds[1]), key="map_lat")
+    with map_col2:
+        lon_range = st.slider("Longitude", bounds[2], bounds[3], (bounds[2], bounds[3]), key="map_lon")
+
+    cells, precision = map_cells(store_dir, data_version, device_key, filter_key, (*lat_range, *lon_range))
+    if cells is None or cells.empty:
+        st.info("No readings with coordinates in this viewport.")
+    else:
+        # Zoom so the viewport's wider side fills the map
+        span = max(lat_range[1] - lat_range[0], (lon_range[1] - lon_range[0]) / 2, 1e-4)
+        fig_map = px.scatter_map(
+            cells,
+            lat="Latitude",
+            lon="Longitude",
+            color="Signal_dBm",
+            size="rows",
+            size_max=18,
+            hover_name="geohash",
+            hover_data={"rows": True, "Signal_dBm": ":.1f", "Excellent_share": ":.0%", "Poor_share": ":.0%",
+                        "Latitude": False, "Longitude": False},
+            color_continuous_scale=[THEME["error"], THEME["secondary"], THEME["success"]],
+            labels={"Signal_dBm": "Avg Signal (dBm)", "rows": "Readings"},
+            center={"lat": sum(lat_range) / 2, "lon": sum(lon_range) / 2},
+            zoom=max(0.0, min(18.0, float(np.log2(180 / span)))),
+            map_style="carto-darkmatter",
+            height=500
+        )
+        fig_map.update_layout(paper_bgcolor=THEME['bg_dark'], font_color=THEME['text'], margin=dict(t=0, l=0, r=0, b=0))
+        show_chart(fig_map)
+        st.caption(f"{len(cells):,} cells at geohash precision {precision}")
+
 st.markdown("<br>", unsafe_allow_html=True)
 
 
@@ -341,10 +694,7 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # Prepare data
-avg_signal_by_net = filtered_df.groupby("Network_Type")["Signal_dBm"].agg([
-    ("mean", "mean"),
-    ("count", "count")
-]).reset_index()
+avg_signal_by_net = aggregates["by_network"]
 
 # Create enhanced bar chart
 fig_avg_signal = px.bar(
@@ -378,7 +728,7 @@ fig_avg_signal.update_layout(
         bgcolor=THEME['bg_medium']
     )
 )
-st.plotly_chart(fig_avg_signal, use_container_width=True)
+show_chart(fig_avg_signal)
 
 st.markdown(f"""
     <h3 style='color:{THEME["text"]};font-size:1.3rem;margin-top:2rem;'>
@@ -387,8 +737,9 @@ st.markdown(f"""
     <p style='color:{THEME["subtext"]};'>Distribution of signal strength quality categories across collected data points.</p>
 """, unsafe_allow_html=True)
 
-signal_strength_dist = filtered_df["Signal_Quality"].value_counts().reset_index()
-signal_strength_dist.columns = ["Quality", "Count"]
+signal_strength_dist = pd.DataFrame(
+    list(filtered_summary.quality_counts.items()), columns=["Quality", "Count"]
+).sort_values("Count", ascending=False)
 
 # Add percentage calculation
 total_count = signal_strength_dist["Count"].sum()
@@ -429,7 +780,7 @@ fig_strength.update_traces(
     textposition='outside'
 )
 
-st.plotly_chart(fig_strength, use_container_width=True)
+show_chart(fig_strength)
 
 # Time analysis section
 st.markdown(f"""
@@ -441,10 +792,22 @@ st.markdown(f"""
     </div>
 """, unsafe_allow_html=True)
 
-if "Timestamp" in filtered_df.columns:
-    # Process time data
-    filtered_df["Timestamp"] = pd.to_datetime(filtered_df["Timestamp"])
-    time_df = filtered_df.sort_values("Timestamp")
+if "Timestamp" in df.columns and aggregates["time_range"] is not None:
+    # Zooming re-resolves the downsampling inside the selected window, so
+    # detail reappears instead of the browser stretching the overview points
+    start_date, end_date = (ts.to_pydatetime() for ts in aggregates["time_range"])
+    window = (start_date, end_date)
+    if start_date < end_date:
+        window = st.slider(
+            "Timeline window",
+            min_value=start_date,
+            max_value=end_date,
+            value=(start_date, end_date),
+            step=timedelta(minutes=1),
+            format="YYYY-MM-DD HH:mm",
+            key="timeline_window"
+        )
+    time_df = timeline_points(store_dir, data_version, device_key, filter_key, window)
     
     # Create enhanced time series plot with network type coloring
     fig_time = px.line(
@@ -477,15 +840,168 @@ if "Timestamp" in filtered_df.columns:
         )
     )
     fig_time.update_layout(xaxis_title="Time", yaxis_title="Signal (dBm)", plot_bgcolor=THEME['bg_dark'], paper_bgcolor=THEME['bg_dark'], font_color=THEME['text'])
-    st.plotly_chart(fig_time, use_container_width=True)
+    show_chart(fig_time)
+    raw_from = load_retention(store_dir).get("raw_from")
+    if raw_from is not None:
+        st.caption(f"Raw readings are kept from {raw_from:%Y-%m-%d}; " + (
+            "earlier days are left out for a device selection" if selected_devices
+            else "earlier days show the lowest and highest signal per rollup bucket"
+        ))
 else:
     st.info("No timestamp data available for time series plot.")
 st.markdown('---')
 
 
+# --- Recent Anomalies ---
+ANOMALY_LABELS = {
+    "signal_drop": "📉 Signal Drops",
+    "latency_spike": "⏱️ Latency Spikes",
+    "poor_stretch": "🔻 Poor Stretches",
+    "downgrade": "📶 Downgrades"
+}
+
+st.markdown(f"""
+    <h3 style='color:{THEME["text"]};font-size:1.3rem;'>
+        🚨 Recent Anomalies
+    </h3>
+    <p style='color:{THEME["subtext"]};'>Sudden signal drops, latency spikes, prolonged Poor-quality stretches and network downgrades flagged as readings are ingested.</p>
+""", unsafe_allow_html=True)
+
+anomalies = recent_anomalies(store_dir, data_version, device_key, filter_key)
+if anomalies.empty:
+    st.info("No anomalies detected for the selected network types.")
+else:
+    kind_counts = anomalies["kind"].value_counts()
+    anomaly_cols = st.columns(len(ANOMALY_LABELS))
+    for col, (kind, label) in zip(anomaly_cols, ANOMALY_LABELS.items()):
+        col.metric(label, int(kind_counts.get(kind, 0)))
+    st.caption(f"Latest {len(anomalies)} anomalies")
+    st.dataframe(
+        anomalies[["Timestamp", "Device_ID", "Network_Type", "kind", "detail"]],
+        use_container_width=True,
+        hide_index=True
+    )
+st.markdown('---')
+
+
+# --- Sessions & Handovers ---
+st.markdown(f"""
+    <h3 style='color:{THEME["text"]};font-size:1.3rem;'>
+        🔁 Sessions & Handovers
+    </h3>
+    <p style='color:{THEME["subtext"]};'>Logging sessions, time spent per network and signal quality, and network handovers derived as readings are ingested.</p>
+""", unsafe_allow_html=True)
+
+sessions, fleet_handovers, dwell, handover_locations = session_overview(store_dir, data_version, device_key)
+if sessions.empty:
+    st.info("No sessions recorded yet.")
+else:
+    fleet = fleet_handovers.iloc[0]
+    session_cols = st.columns(4)
+    session_cols[0].metric("🧭 Sessions", f"{len(sessions):,}")
+    session_cols[1].metric("⏳ Avg Session", f"{sessions['seconds'].mean() / 60:.1f} min")
+    session_cols[2].metric("🔀 Handovers / h", f"{fleet['per_hour']:.2f}" if fleet["hours"] else "n/a")
+    session_cols[3].metric("📶 LTE ↔ NR", f"{int(fleet['lte_nr']):,}")
+
+    dwell_col, location_col = st.columns(2)
+    with dwell_col:
+        fig_dwell = px.bar(
+            dwell.assign(hours=dwell["seconds"] / 3600),
+            x="Network_Type",
+            y="hours",
+            color="Signal_Quality",
+            color_discrete_map={
+                "Excellent": THEME["success"],
+                "Good": THEME["primary"],
+                "Poor": THEME["error"]
+            },
+            labels={"Network_Type": "Network Type", "hours": "Hours", "Signal_Quality": "Quality"},
+            template="plotly_dark"
+        )
+        fig_dwell.update_layout(
+            plot_bgcolor=THEME["bg_dark"],
+            paper_bgcolor=THEME["bg_dark"],
+            font_color=THEME["text"],
+            margin=dict(t=0, l=0, r=0, b=0),
+            xaxis=dict(showgrid=False),
+            yaxis=dict(showgrid=True, gridcolor=THEME["bg_medium"])
+        )
+        show_chart(fig_dwell)
+    with location_col:
+        st.caption("Locations with the most handovers")
+        st.dataframe(
+            handover_locations.rename(columns={"lte_nr": "LTE ↔ NR", "per_hour": "per hour"}).round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+st.markdown('---')
+
+
+# --- SQL Query ---
+with st.expander('🧮 SQL Query'):
+    st.caption(f"Tables: {', '.join(table_sources(store_dir)) or 'none yet'}. Filters on Timestamp, day and "
+               "Network_Type only read the matching files and row groups. Results are capped at 1,000 rows.")
+    with st.form("sql_form"):
+        sql = st.text_area("Query", value=EXAMPLE_QUERY, height=160)
+        submitted = st.form_submit_button("Run query")
+    if submitted:
+        st.session_state["sql"] = sql
+    if "sql" in st.session_state:
+        query_started = time.perf_counter()
+        result, error = sql_result(store_dir, data_version, st.session_state["sql"])
+        if error is not None:
+            st.error(error)
+        else:
+            st.caption(f"{len(result):,} rows in {(time.perf_counter() - query_started) * 1000:.0f} ms")
+            st.dataframe(result, use_container_width=True, hide_index=True)
+st.markdown('---')
+
+
 # --- Raw Data Expander ---
+RAW_DATA_ROWS = 1000
 with st.expander('Show Raw Data'):
-    st.dataframe(filtered_df, use_container_width=True)
+    # Rendering millions of rows would dominate every rerun; show the latest ones
+    st.caption(f"Most recent {min(RAW_DATA_ROWS, filtered_rows):,} of {filtered_rows:,} readings")
+    st.dataframe(filter_view(store_dir, data_version, device_key, filter_key, last=RAW_DATA_ROWS), use_container_width=True)
+
+# --- Diagnostics ---
+with st.expander('🩺 Diagnostics'):
+    st.toggle("Record stage timings and counters for this session", key="diagnostics", value=enabled())
+    if not enabled():
+        st.caption("Recording is off. Turn it on and interact with the dashboard to see where reruns spend time.")
+    else:
+        # Everything above this panel is part of the run
+        record("dashboard.run", (time.perf_counter() - run_started) * 1000)
+        stats = snapshot()
+        st.caption(f"This session since recording started or was last reset, over "
+                   f"{stats['stages']['dashboard.run']['count']} reruns")
+
+        st.dataframe(pd.DataFrame([
+            {"Stage": stage, "Calls": entry["count"], "Total (ms)": entry["total_ms"], "Mean (ms)": entry["mean_ms"],
+             "Max (ms)": entry["max_ms"],
+             "Latency histogram": ", ".join(f"{bucket}: {n}" for bucket, n in entry["histogram"].items())}
+            for stage, entry in stats["stages"].items()
+        ]), use_container_width=True, hide_index=True)
+
+        counters = stats["counters"]
+        cache_names = [name.rsplit(".", 1)[1] for name in counters if name.startswith("dashboard.cache_calls.")]
+        caches = pd.DataFrame([
+            {"Cache": name, "Calls": counters[f"dashboard.cache_calls.{name}"],
+             "Misses": counters.get(f"dashboard.cache_misses.{name}", 0)}
+            for name in cache_names
+        ])
+        if not caches.empty:
+            caches["Hit rate"] = (1 - caches["Misses"] / caches["Calls"]).map("{:.0%}".format)
+            st.dataframe(caches, use_container_width=True, hide_index=True)
+        st.dataframe(pd.DataFrame([
+            {"Counter": name, "Value": value} for name, value in counters.items() if not name.startswith("dashboard.cache_")
+        ]), use_container_width=True, hide_index=True)
+
+        diag_col1, diag_col2 = st.columns(2)
+        diag_col1.download_button("Download JSON", json.dumps(stats, indent=2), file_name="netpulse-metrics.json",
+                                  mime="application/json")
+        # Callbacks run before the script body has switched to this session's registry
+        diag_col2.button("Reset", on_click=reset, args=(st.session_state["metrics"],))
 
 # --- Custom Styling ---
 st.markdown(f"""
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Roughly two points per horizontal pixel of a full-width chart
+DEFAULT_POINT_BUDGET = 2000
+
+
+def minmax_indices(x, y, point_budget=DEFAULT_POINT_BUDGET):
+    """
+    Picks the positions to plot from a series sorted by x.
+
+    The x range is split into point_budget // 2 equal-width buckets and the
+    minimum and maximum reading of every bucket are kept, so spikes and drops
+    survive no matter how far the series is reduced. Points with a missing x
+    (NaT sorts last) or y are skipped. Returns sorted positions into the
+    original arrays.
+    """
+    x = np.asarray(x)
+    missing = pd.isna(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view("int64")
+    y = np.asarray(y, dtype="float64")
+
+    valid = np.flatnonzero(~missing & ~np.isnan(y))
+    n_buckets = max(point_budget // 2, 1)
+    if len(valid) <= 2 * n_buckets:
+        return valid
+
+    xv = x[valid]
+    yv = y[valid]
+    span = float(xv[-1] - xv[0]) or 1.0
+    buckets = np.minimum(((xv - xv[0]) / span * n_buckets).astype("int64"), n_buckets - 1)
+
+    # x is sorted, so every bucket is one contiguous run
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(yv)])
+
+    def first_match(extremes):
+        hits = np.flatnonzero(yv == np.repeat(extremes, counts))
+        hit_buckets = buckets[hits]
+        return hits[np.r_[True, hit_buckets[1:] != hit_buckets[:-1]]]
+
+    keep = np.union1d(
+        first_match(np.minimum.reduceat(yv, starts)),
+        first_match(np.maximum.reduceat(yv, starts))
+    )
+    return valid[keep]
+
+
+def downsample_frame(df, x="Timestamp", y="Signal_dBm", by="Network_Type",
+                     point_budget=DEFAULT_POINT_BUDGET, start=None, end=None):
+    """
+    Reduces every `by` series of a frame sorted by x to at most point_budget
+    points inside the [start, end] window, ready to hand to a plotting library.
+    """
+    if start is not None or end is not None:
+        x_values = df[x]
+        window = np.ones(len(df), dtype=bool)
+        if start is not None:
+            window &= (x_values >= start).to_numpy()
+        if end is not None:
+            window &= (x_values <= end).to_numpy()
+        df = df[window]
+
+    if by is None or by not in df.columns:
+        return df.iloc[minmax_indices(df[x].to_numpy(), df[y].to_numpy(), point_budget)]
+
+    parts = []
+    for _, group in df.groupby(by, observed=True, sort=False):
+        parts.append(group.iloc[minmax_indices(group[x].to_numpy(), group[y].to_numpy(), point_budget)])
+    if not parts:
+        return df.iloc[:0]
+    return pd.concat(parts)
@@ -0,0 +1,179 @@
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from src.metrics import timed
+from src.store import READING_DTYPES
+
+# Export formats are data: formats.json lists the known header layouts
+# ("formats", each mapping its source columns to ours, optionally with a
+# "scale" factor per column for unit conversions and the "timestamp_format"
+# its loggers write), case-insensitive aliases for columns any export may
+# carry, and defaults for columns an export lacks.
+# Supporting a new app version means adding an entry there, not code here.
+FORMATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "formats.json")
+
+OUTPUT_COLUMNS = [
+    "Timestamp",
+    "Device_ID",
+    "Network_Type",
+    "Signal_dBm",
+    "Location",
+    "Download_Mbps",
+    "Upload_Mbps",
+    "Latency_ms",
+    "Latitude",
+    "Longitude"
+]
+
+# Format name of headers no listed format matches; columns are still mapped
+# through the aliases
+GENERIC_FORMAT = "generic"
+
+
+@dataclass(frozen=True)
+class FormatPlan:
+    """
+    Compiled handling of one header layout: which source column feeds each
+    output column and how it is parsed, scaled or defaulted.
+    """
+    name: str
+    # output column -> source column, for the output columns the export has
+    sources: dict
+    # source column -> parser dtype of the categorical columns; numeric ones
+    # are inferred, so one malformed cell ("N/A", "--") doesn't fail the parse
+    dtypes: dict
+    scale: dict
+    defaults: dict
+    # None lets pandas infer it per batch
+    timestamp_format: str = None
+
+    def read_csv(self, source, **options):
+        """Parses CSV in this format; columns nothing maps are never materialized."""
+        usecols = list(self.sources.values())
+        return pd.read_csv(source, usecols=lambda column: column in usecols, dtype=self.dtypes, **options)
+
+    def apply(self, df):
+        """
+        Builds OUTPUT_COLUMNS in the store schema (see store.to_store_types)
+        from a frame in this format, column by column, without renaming,
+        reindexing or casting the whole frame.
+        """
+        rows = len(df)
+        columns = {}
+        for target in OUTPUT_COLUMNS:
+            source = self.sources.get(target)
+            default = self.defaults.get(target)
+            if target == "Timestamp":
+                if source is None:
+                    columns[target] = np.full(rows, np.datetime64("NaT"), dtype="datetime64[us]")
+                else:
+                    with timed("formats.timestamps"):
+                        columns[target] = pd.to_datetime(df[source], errors="coerce", format=self.timestamp_format)
+            elif READING_DTYPES[target] == "category":
+                if source is not None:
+                    columns[target] = df[source].astype("category")
+                elif default is None:
+                    columns[target] = pd.Categorical.from_codes(np.full(rows, -1, dtype="int8"), categories=[])
+                else:
+                    columns[target] = pd.Categorical.from_codes(np.zeros(rows, dtype="int8"), categories=[default])
+            else:
+                if source is not None:
+                    values = df[source]
+                    if not pd.api.types.is_numeric_dtype(values):
+                        # Malformed cells left the column unparsed; they become missing values
+                        values = pd.to_numeric(values, errors="coerce")
+                    values = values.to_numpy(dtype="float64", na_value=np.nan)
+                    columns[target] = values * self.scale[target] if target in self.scale else values
+                else:
+                    columns[target] = np.full(rows, np.nan if default is None else default, dtype="float64")
+        return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+@lru_cache(maxsize=None)
+def load_registry(path=FORMATS_FILE):
+    """Loads and checks the format registry; every mapping must target an output column."""
+    with open(path) as f:
+        registry = json.load(f)
+    targets = [
+        *registry["aliases"],
+        *registry["defaults"],
+        *(column for entry in registry["formats"] for column in entry["columns"].values()),
+        *(column for entry in registry["formats"] for column in entry.get("scale", {}))
+    ]
+    unknown = sorted(set(targets) - set(OUTPUT_COLUMNS))
+    if unknown:
+        raise ValueError(f"{path} maps to unknown columns: {', '.join(unknown)}")
+    return registry
+
+
+@lru_cache(maxsize=256)
+def compile_format(header, path=FORMATS_FILE):
+    """
+    Detects the format of an export from its header (a tuple of column names)
+    and compiles its FormatPlan. The most specific listed format whose columns
+    are all present wins; aliases map everything else. Cached per header, so
+    exports sharing a layout pay for detection once.
+    """
+    registry = load_registry(path)
+    present = set(header)
+    matches = [entry for entry in registry["formats"] if set(entry["columns"]) <= present]
+    entry = max(matches, key=lambda candidate: len(candidate["columns"]), default=None)
+
+    # First header column spelled like each alias, ignoring case
+    by_lower = {}
+    for column in header:
+        by_lower.setdefault(column.lower(), column)
+    sources = {}
+    for target, aliases in registry["aliases"].items():
+        for alias in aliases:
+            if alias.lower() in by_lower:
+                sources[target] = by_lower[alias.lower()]
+                break
+    if entry is not None:
+        # The format's own mapping takes precedence over aliases
+        sources.update({target: source for source, target in entry["columns"].items()})
+
+    return FormatPlan(
+        name=entry["name"] if entry is not None else GENERIC_FORMAT,
+        sources=sources,
+        dtypes={
+            source: READING_DTYPES[target] for target, source in sources.items()
+            if READING_DTYPES.get(target) == "category"
+        },
+        scale=dict(entry.get("scale", {})) if entry is not None else {},
+        defaults={target: value for target, value in registry["defaults"].items() if target not in sources},
+        timestamp_format=entry.get("timestamp_format") if entry is not None else None
+    )
+
+
+def detect_format(columns):
+    """FormatPlan for a header or a frame's columns."""
+    return compile_format(tuple(str(column) for column in columns))
+
+
+def normalize_frame(df):
+    """Normalizes an already parsed frame (e.g. a JSON upload) by its columns' format."""
+    return detect_format(df.columns).apply(df)
+
+
+def assign_device(df, device):
+    """
+    Fills in the Device_ID of normalized readings that don't carry one with
+    `device` (the export's or upload's source), and makes every ID a string
+    so partition paths and filters agree on the type.
+    """
+    ids = df["Device_ID"]
+    if ids.dtype != "category":
+        ids = ids.astype("category")
+    if len(ids.cat.categories) and not pd.api.types.is_string_dtype(ids.cat.categories):
+        ids = ids.cat.rename_categories(ids.cat.categories.astype(str))
+    if ids.isna().all():
+        ids = pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=[device])
+    elif ids.isna().any():
+        if device not in ids.cat.categories:
+            ids = ids.cat.add_categories([device])
+        ids = ids.fillna(device)
+    return df.assign(Device_ID=ids)
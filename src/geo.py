@@ -0,0 +1,311 @@
+import os
+import shutil
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.store import STORE_DIR
+
+# Geohash cells are kept at these precisions (characters). Cell sizes at the
+# equator: 3 ~ 156 km, 4 ~ 39 km, 5 ~ 4.9 km, 6 ~ 1.2 km, 7 ~ 153 m.
+GEO_PRECISIONS = [3, 4, 5, 6, 7]
+MAX_PRECISION = max(GEO_PRECISIONS)
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Coordinates are quantized to this many bits per axis, enough for geohashes
+# of up to 8 characters; shorter ones are right shifts of the 40-bit code
+AXIS_BITS = 20
+
+CELL_KEYS = ["cell", "Network_Type"]
+CELL_AGGS = {
+    "rows": "sum",
+    "Signal_dBm_count": "sum",
+    "Signal_dBm_sum": "sum",
+    "Signal_dBm_min": "min",
+    "Signal_dBm_max": "max",
+    "quality_Poor": "sum",
+    "quality_Good": "sum",
+    "quality_Excellent": "sum"
+}
+
+# Cells sent to the map per render; the precision is picked to stay under it
+MAP_CELL_BUDGET = 5000
+# Viewport queries look up at most this many coarse index ranges
+MAX_INDEX_RANGES = 64
+
+# Every precision is split into this many files (p7/part-NN.parquet) by a
+# hash of the cell's ancestor at PARTITION_PRECISION (coarser cells by their
+# own code), so an ingest batch only rewrites the partitions of the areas it
+# covers, not every cell ever seen. Cells of one area share a partition at
+# every precision from PARTITION_PRECISION down.
+PARTITIONS = 32
+PARTITION_PRECISION = 5
+
+
+def geo_path(store_dir=STORE_DIR, precision=None):
+    path = os.path.join(store_dir, "geo")
+    return os.path.join(path, f"p{precision}") if precision else path
+
+
+def _partition_file(store_dir, precision, partition):
+    return os.path.join(geo_path(store_dir, precision), f"part-{partition:02d}.parquet")
+
+
+def cell_partitions(codes, precision):
+    """The partition of every cell code; stable across processes, unlike hash()."""
+    areas = np.asarray(codes, dtype="int64") >> (5 * max(precision - PARTITION_PRECISION, 0))
+    unique, inverse = np.unique(areas, return_inverse=True)
+    partitions = np.array([zlib.crc32(int(area).to_bytes(8, "little")) % PARTITIONS for area in unique],
+                          dtype="int64")
+    return partitions[inverse.ravel()]
+
+
+def clear_geo(store_dir=STORE_DIR):
+    shutil.rmtree(geo_path(store_dir), ignore_errors=True)
+
+
+def _spread_bits(x):
+    # Moves bit i of a 32-bit value to bit 2i
+    x = x & 0xFFFFFFFF
+    x = (x | (x << 16)) & 0x0000FFFF0000FFFF
+    x = (x | (x << 8)) & 0x00FF00FF00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x << 2)) & 0x3333333333333333
+    return (x | (x << 1)) & 0x5555555555555555
+
+
+def _compact_bits(x):
+    # Inverse of _spread_bits: gathers every even bit
+    x = x & 0x5555555555555555
+    x = (x | (x >> 1)) & 0x3333333333333333
+    x = (x | (x >> 2)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x >> 4)) & 0x00FF00FF00FF00FF
+    x = (x | (x >> 8)) & 0x0000FFFF0000FFFF
+    return (x | (x >> 16)) & 0xFFFFFFFF
+
+
+def valid_coordinates(lat, lon):
+    """Readings with usable GPS fixes; 0, 0 is what many loggers write without one."""
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    return ((np.abs(lat) <= 90) & (np.abs(lon) <= 180) & ~((lat == 0) & (lon == 0)))
+
+
+def encode_geohash(lat, lon, precision=MAX_PRECISION):
+    """
+    Vectorized geohash encoding returning integer cell codes: the 5 *
+    precision geohash bits (longitude first, interleaved with latitude). A
+    coarser cell is a right shift of a finer one, and sorting codes sorts the
+    cells in geohash string order, so sorted codes double as a spatial index.
+    """
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    scale = 1 << AXIS_BITS
+    lon_q = np.clip(((lon + 180) / 360 * scale).astype("int64"), 0, scale - 1).astype("uint64")
+    lat_q = np.clip(((lat + 90) / 180 * scale).astype("int64"), 0, scale - 1).astype("uint64")
+    codes = (_spread_bits(lon_q) << np.uint64(1)) | _spread_bits(lat_q)
+    return (codes >> np.uint64(2 * AXIS_BITS - 5 * precision)).astype("int64")
+
+
+def geohash_strings(codes, precision):
+    """Geohash strings (e.g. "u4pruyd") for integer cell codes."""
+    codes = np.asarray(codes, dtype="int64")
+    alphabet = np.array(list(BASE32))
+    chars = [alphabet[(codes >> (5 * (precision - 1 - i))) & 31] for i in range(precision)]
+    return np.array(["".join(cell) for cell in zip(*chars)], dtype=object)
+
+
+def cell_bounds(codes, precision):
+    """Returns (lat_min, lat_max, lon_min, lon_max) arrays for integer cell codes."""
+    codes = np.asarray(codes, dtype="int64").astype("uint64") << np.uint64(2 * AXIS_BITS - 5 * precision)
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    lon_min = _compact_bits(codes >> np.uint64(1)).astype("float64") / (1 << AXIS_BITS) * 360 - 180
+    lat_min = _compact_bits(codes).astype("float64") / (1 << AXIS_BITS) * 180 - 90
+    return lat_min, lat_min + 180 / (1 << lat_bits), lon_min, lon_min + 360 / (1 << lon_bits)
+
+
+def compute_cells(df):
+    """
+    Aggregates readings with coordinates into geohash cells x network type at
+    every precision in GEO_PRECISIONS. Returns {precision: cells}, empty when
+    no reading has a usable GPS fix.
+    """
+    if "Latitude" not in df.columns or "Longitude" not in df.columns:
+        return {}
+    located = valid_coordinates(df["Latitude"], df["Longitude"])
+    if not located.any():
+        return {}
+
+    # Imported here because the analyzer reads from the store modules
+    from src.analyzer import quality_codes
+
+    df = df[located]
+    signal = df["Signal_dBm"].to_numpy(dtype="float64", na_value=np.nan)
+    has_signal = ~np.isnan(signal)
+    codes = quality_codes(signal)
+    base = pd.DataFrame({
+        "Network_Type": df["Network_Type"].to_numpy(),
+        "rows": np.ones(len(df), dtype="int64"),
+        "Signal_dBm_count": has_signal.astype("int64"),
+        "Signal_dBm_sum": np.where(has_signal, signal, 0.0),
+        "Signal_dBm_min": signal,
+        "Signal_dBm_max": signal,
+        "quality_Poor": (codes == 0).astype("int64"),
+        "quality_Good": (codes == 1).astype("int64"),
+        "quality_Excellent": (codes == 2).astype("int64")
+    })
+
+    cells = {MAX_PRECISION: _group(base.assign(cell=encode_geohash(df["Latitude"], df["Longitude"])))}
+    finer = MAX_PRECISION
+    for precision in sorted(GEO_PRECISIONS, reverse=True)[1:]:
+        # Coarser levels re-bucket the next finer one instead of the readings
+        shift = 5 * (finer - precision)
+        cells[precision] = _group(cells[finer].assign(cell=cells[finer]["cell"].to_numpy() >> shift))
+        finer = precision
+    return cells
+
+
+def _group(frame):
+    cells = frame.groupby(CELL_KEYS, observed=True, sort=True).agg(CELL_AGGS).reset_index()
+    return cells.astype({"Network_Type": "category"})
+
+
+def update_cells(store_dir, deltas):
+    """
+    Merges freshly computed cell aggregates ({precision: cells} from
+    compute_cells, possibly several) into the stored ones, only in the
+    partitions the deltas touch. Every partition file is sorted by cell code.
+    """
+    deltas = [delta for delta in deltas if delta]
+    if not deltas:
+        return
+    for precision in GEO_PRECISIONS:
+        os.makedirs(geo_path(store_dir, precision), exist_ok=True)
+        delta = pd.concat([batch[precision] for batch in deltas], ignore_index=True)
+        paths = [_partition_file(store_dir, precision, partition)
+                 for partition in np.unique(cell_partitions(delta["cell"], precision))]
+        stored = [pq.ParquetFile(path).read() for path in paths if os.path.exists(path)]
+        # The touched partitions are merged in one pass (grouping network types
+        # as categories), then split up again
+        table = pa.concat_tables(stored + [_to_table(delta)], promote_options="permissive")
+        table = _set_networks(table, table["Network_Type"].dictionary_encode())
+        cells = _group(table.to_pandas())
+        partitions = cell_partitions(cells["cell"], precision)
+        order = np.argsort(partitions, kind="stable")
+        table = _to_table(cells.iloc[order])
+        partitions, starts, counts = np.unique(partitions[order], return_index=True, return_counts=True)
+        for partition, start, rows in zip(partitions, starts, counts):
+            _write(table.slice(start, rows), _partition_file(store_dir, precision, partition))
+
+
+def _set_networks(table, networks):
+    return table.set_column(table.schema.get_field_index("Network_Type"), "Network_Type", networks)
+
+
+def _to_table(cells):
+    # Network types are plain strings on disk: every partition has its own
+    # categories, which wouldn't read back as one column
+    table = pa.Table.from_pandas(cells, preserve_index=False)
+    return _set_networks(table, table["Network_Type"].cast(pa.string()))
+
+
+def _write(table, path):
+    # Dot files are left out when the partitions are read as one table
+    tmp_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def load_cells(store_dir=STORE_DIR, precision=MAX_PRECISION):
+    """All stored cells of one precision, sorted by cell code; None without GPS data."""
+    path = geo_path(store_dir, precision)
+    if not os.path.isdir(path) or not os.listdir(path):
+        return None
+    cells = pd.read_parquet(path, engine="pyarrow")
+    cells = cells.sort_values(CELL_KEYS, ignore_index=True, kind="stable")
+    return cells.astype({"Network_Type": "category"})
+
+
+def _covering_cells(bbox, precision):
+    """Codes of the cells at `precision` that intersect bbox, or None if too many."""
+    lat_min, lat_max, lon_min, lon_max = bbox
+    lat_step = 180 / (1 << (5 * precision // 2))
+    lon_step = 360 / (1 << ((5 * precision + 1) // 2))
+    lats = np.arange(np.floor((lat_min + 90) / lat_step), np.floor((lat_max + 90) / lat_step) + 1)
+    lons = np.arange(np.floor((lon_min + 180) / lon_step), np.floor((lon_max + 180) / lon_step) + 1)
+    if len(lats) * len(lons) > MAX_INDEX_RANGES:
+        return None
+    grid_lat, grid_lon = np.meshgrid((lats + 0.5) * lat_step - 90, (lons + 0.5) * lon_step - 180)
+    return np.unique(encode_geohash(grid_lat.ravel(), grid_lon.ravel(), precision))
+
+
+def query_cells(cells, bbox, precision, network_types=None):
+    """
+    Viewport query over cells sorted by code. The bbox (lat_min, lat_max,
+    lon_min, lon_max) is covered by the finest coarser cells that stay under
+    MAX_INDEX_RANGES; each is a contiguous code range located by binary
+    search, and only cells in those ranges are checked against the bbox.
+    """
+    codes = cells["cell"].to_numpy()
+    for coarse in range(precision, 0, -1):
+        covering = _covering_cells(bbox, coarse)
+        if covering is not None:
+            break
+    else:
+        covering, coarse = np.arange(32), 1
+
+    shift = 5 * (precision - coarse)
+    starts = np.searchsorted(codes, covering << shift, side="left")
+    ends = np.searchsorted(codes, (covering + 1) << shift, side="left")
+    positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)] or [np.empty(0, "int64")])
+    hits = cells.iloc[positions]
+
+    lat_min, lat_max, lon_min, lon_max = cell_bounds(hits["cell"].to_numpy(), precision)
+    inside = ((lat_max >= bbox[0]) & (lat_min <= bbox[1]) & (lon_max >= bbox[2]) & (lon_min <= bbox[3]))
+    hits = hits[inside]
+    if network_types:
+        hits = hits[hits["Network_Type"].isin(network_types)]
+    return hits
+
+
+def coverage_cells(store_dir=STORE_DIR, bbox=None, network_types=None, cell_budget=MAP_CELL_BUDGET, computed=None):
+    """
+    Map-ready cells for a viewport: the finest precision whose cells in view
+    fit the budget, with network types merged into one row per cell and the
+    cell centre, mean signal and share of readings per quality class added.
+    Given computed cells ({precision: cells} from compute_cells of some
+    readings, e.g. a few devices'), maps those instead of the store.
+    Returns (cells, precision), or (None, None) when there is no GPS data.
+    """
+    for precision in sorted(GEO_PRECISIONS, reverse=True):
+        cells = load_cells(store_dir, precision) if computed is None else computed.get(precision)
+        if cells is None:
+            return None, None
+        if bbox is not None:
+            cells = query_cells(cells, bbox, precision, network_types)
+        elif network_types:
+            cells = cells[cells["Network_Type"].isin(network_types)]
+        merged = cells.groupby("cell", sort=True).agg(CELL_AGGS)
+        if len(merged) <= cell_budget or precision == min(GEO_PRECISIONS):
+            break
+
+    merged = merged[merged["Signal_dBm_count"] > 0].reset_index()
+    lat_min, lat_max, lon_min, lon_max = cell_bounds(merged["cell"].to_numpy(), precision)
+    merged["geohash"] = geohash_strings(merged["cell"].to_numpy(), precision)
+    merged["Latitude"] = (lat_min + lat_max) / 2
+    merged["Longitude"] = (lon_min + lon_max) / 2
+    merged["Signal_dBm"] = merged["Signal_dBm_sum"] / merged["Signal_dBm_count"]
+    for label in ["Poor", "Good", "Excellent"]:
+        merged[f"{label}_share"] = merged[f"quality_{label}"] / merged["rows"]
+    return merged, precision
+
+
+def coverage_bounds(store_dir=STORE_DIR):
+    """(lat_min, lat_max, lon_min, lon_max) of all stored readings with coordinates."""
+    cells = load_cells(store_dir, MAX_PRECISION)
+    if cells is None or cells.empty:
+        return None
+    lat_min, lat_max, lon_min, lon_max = cell_bounds(cells["cell"].to_numpy(), MAX_PRECISION)
+    return float(lat_min.min()), float(lat_max.max()), float(lon_min.min()), float(lon_max.max())
@@ -0,0 +1,235 @@
+import os
+import shutil
+import zlib
+import numpy as np
+import pandas as pd
+from src.store import STORE_DIR
+
+# Signal is histogrammed in 1 dB bins over this range (values outside are
+# clamped), so medians and percentiles are exact to the dB for integer
+# readings while means stay exact through per-bin sums
+MIN_DBM = -140
+MAX_DBM = -20
+
+# Locations with fewer readings than this are left out of rankings, so a
+# single lucky reading can't top the leaderboard
+MIN_SAMPLES = 30
+
+HISTOGRAM_KEYS = ["Location", "Network_Type"]
+STAT_COLUMNS = ["count", "mean", "median", "p5", "p95"]
+QUANTILES = {"median": 0.5, "p5": 0.05, "p95": 0.95}
+
+# Network_Type of the per-location rows that cover every network type
+ALL_NETWORKS = "All"
+
+# The histograms and the index are split by a hash of the location into this
+# many files (part-NN.parquet), so an ingest batch only rewrites and re-ranks
+# the partitions of the locations it touched, not every location ever seen
+PARTITIONS = 32
+
+
+def leaderboard_path(store_dir=STORE_DIR, name=None):
+    path = os.path.join(store_dir, "leaderboard")
+    return os.path.join(path, name) if name else path
+
+
+def _partition_file(store_dir, name, partition):
+    return os.path.join(leaderboard_path(store_dir, name), f"part-{partition:02d}.parquet")
+
+
+def location_partitions(locations):
+    """The partition of every location; stable across processes, unlike hash()."""
+    locations = pd.Categorical(locations)
+    partitions = np.array([zlib.crc32(str(name).encode()) % PARTITIONS for name in locations.categories], dtype="int64")
+    return partitions[locations.codes]
+
+
+def clear_leaderboard(store_dir=STORE_DIR):
+    shutil.rmtree(leaderboard_path(store_dir), ignore_errors=True)
+
+
+def compute_histograms(df):
+    """
+    Per location x network type signal histograms in long form: one row per
+    non-empty 1 dB bin holding the reading count and the sum of the readings.
+    """
+    locations = pd.Categorical(df["Location"])
+    networks = pd.Categorical(df["Network_Type"])
+    signal = df["Signal_dBm"].to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~np.isnan(signal) & (locations.codes >= 0) & (networks.codes >= 0)
+    signal = signal[valid]
+
+    # One integer key per (location, network type, bin) so the grouping is a
+    # single np.unique instead of a three-column groupby
+    n_networks = len(networks.categories)
+    n_bins = MAX_DBM - MIN_DBM + 1
+    bins = np.clip(np.floor(signal), MIN_DBM, MAX_DBM).astype("int64") - MIN_DBM
+    keys = (locations.codes[valid].astype("int64") * n_networks + networks.codes[valid]) * n_bins + bins
+    unique, inverse = np.unique(keys, return_inverse=True)
+
+    return pd.DataFrame({
+        "Location": pd.Categorical.from_codes(unique // (n_networks * n_bins), locations.categories),
+        "Network_Type": pd.Categorical.from_codes(unique // n_bins % n_networks, networks.categories),
+        "bin": (unique % n_bins + MIN_DBM).astype("int16"),
+        "count": np.bincount(inverse, minlength=len(unique)).astype("int64"),
+        "sum": np.bincount(inverse, weights=signal, minlength=len(unique))
+    })
+
+
+def _merge(frame):
+    histogram = frame.groupby(HISTOGRAM_KEYS + ["bin"], observed=True, sort=True)[["count", "sum"]].sum()
+    histogram = histogram.reset_index()
+    return histogram.astype({"Location": "category", "Network_Type": "category"})
+
+
+def histogram_stats(histogram, keys):
+    """
+    Count, mean, median, p5 and p95 per group of `keys` from a long-form
+    histogram. Quantiles are the lower edge of the first bin whose cumulative
+    count reaches the quantile, all groups at once.
+    """
+    histogram = histogram.groupby(keys + ["bin"], observed=True, sort=True)[["count", "sum"]].sum().reset_index()
+    if histogram.empty:
+        return pd.DataFrame(columns=keys + STAT_COLUMNS)
+    group_ids = histogram.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    counts = histogram["count"].to_numpy()
+    bins = histogram["bin"].to_numpy()
+
+    totals = np.bincount(group_ids, weights=counts)
+    sums = np.bincount(group_ids, weights=histogram["sum"].to_numpy())
+    cumulative = np.cumsum(counts)
+    group_starts = np.r_[0, np.flatnonzero(np.diff(group_ids)) + 1]
+    # Readings in all groups before each group
+    offsets = np.r_[0, cumulative[group_starts[1:] - 1]]
+
+    stats = histogram.iloc[group_starts][keys].reset_index(drop=True)
+    stats["count"] = totals.astype("int64")
+    stats["mean"] = sums / totals
+    for name, q in QUANTILES.items():
+        # First row of each group reaching q of its total; rows are grouped
+        # and ordered by bin, so searching the global cumulative sum works
+        targets = offsets + np.maximum(np.ceil(q * totals), 1)
+        stats[name] = bins[np.searchsorted(cumulative, targets, side="left")].astype("float64")
+    return stats
+
+
+def update_histograms(store_dir, deltas):
+    """
+    Merges freshly computed histograms into the stored ones and refreshes
+    the ranking index (stats per location x network type and per location
+    over all network types), both only in the partitions of the locations
+    the deltas touch.
+    """
+    deltas = [delta for delta in deltas if delta is not None and not delta.empty]
+    if not deltas:
+        return
+    for name in ("histograms", "index"):
+        os.makedirs(leaderboard_path(store_dir, name), exist_ok=True)
+
+    # The touched partitions are merged and ranked in one pass, then split up again
+    delta = pd.concat(deltas, ignore_index=True)
+    paths = [_partition_file(store_dir, "histograms", partition)
+             for partition in np.unique(location_partitions(delta["Location"]))]
+    stored = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+    histogram = _merge(pd.concat(stored + [delta], ignore_index=True))
+
+    per_network = histogram_stats(histogram, HISTOGRAM_KEYS)
+    overall = histogram_stats(histogram, ["Location"]).assign(Network_Type=ALL_NETWORKS)
+    index = pd.concat([per_network.astype({"Network_Type": str}), overall], ignore_index=True)
+    for name, frame in (("histograms", histogram), ("index", index)):
+        for partition, part in frame.groupby(location_partitions(frame["Location"]), sort=False):
+            _write(part, _partition_file(store_dir, name, partition))
+
+
+def _write(frame, path):
+    # Keys are plain strings on disk: every partition has its own categories,
+    # which wouldn't read back as one column
+    frame = frame.astype({key: str for key in HISTOGRAM_KEYS})
+    # Dot files are left out when the partitions are read as one table
+    tmp_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".tmp")
+    frame.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+    os.replace(tmp_path, path)
+
+
+def load_leaderboard(store_dir=STORE_DIR, name="index", filters=None):
+    """
+    The stored histograms or index over all partitions, with categorical
+    keys. Returns None when nothing has been indexed.
+    """
+    path = leaderboard_path(store_dir, name)
+    if not os.path.isdir(path) or not os.listdir(path):
+        return None
+    frame = pd.read_parquet(path, engine="pyarrow", filters=filters)
+    return frame.astype({key: "category" for key in HISTOGRAM_KEYS})
+
+
+def _rank(stats, metric, k, ascending, min_samples):
+    stats = stats[stats["count"] >= min_samples]
+    if ascending:
+        return stats.nsmallest(k, metric, keep="first").reset_index(drop=True)
+    return stats.nlargest(k, metric, keep="first").reset_index(drop=True)
+
+
+def top_locations(store_dir=STORE_DIR, k=10, metric="mean", ascending=False, network_types=None,
+                  min_samples=MIN_SAMPLES, histogram=None):
+    """
+    Top-k (or with ascending=True bottom-k) locations by a signal statistic
+    (count, mean, median, p5 or p95), counting only locations with at least
+    min_samples readings. All network types, or exactly one, are answered
+    from the index; other selections merge the stored histograms of the
+    selected network types. Given a histogram (compute_histograms of some
+    readings, e.g. a few devices'), ranks that instead of the store.
+    Returns None when nothing has been indexed.
+    """
+    network_types = list(network_types or [])
+    if histogram is not None:
+        if network_types:
+            histogram = histogram[histogram["Network_Type"].isin(network_types)]
+        stats = histogram_stats(histogram, ["Location"])
+        if len(network_types) <= 1:
+            # As the index rows
+            stats.insert(1, "Network_Type", network_types[0] if network_types else ALL_NETWORKS)
+        return _rank(stats, metric, k, ascending, min_samples)
+    if len(network_types) <= 1:
+        network = network_types[0] if network_types else ALL_NETWORKS
+        index = load_leaderboard(store_dir, "index", filters=[("Network_Type", "==", network)])
+        if index is None:
+            return None
+        return _rank(index, metric, k, ascending, min_samples)
+
+    histogram = load_leaderboard(store_dir, "histograms", filters=[("Network_Type", "in", network_types)])
+    if histogram is None:
+        return None
+    stats = histogram_stats(histogram, ["Location"])
+    return _rank(stats, metric, k, ascending, min_samples)
+
+
+def network_leaderboard(store_dir=STORE_DIR, metric="mean", ascending=False, min_samples=MIN_SAMPLES,
+                        histogram=None):
+    """
+    Network types ranked by a signal statistic over all locations, from the
+    store or from the given histogram (see top_locations).
+    """
+    if histogram is None:
+        histogram = load_leaderboard(store_dir, "histograms")
+    if histogram is None:
+        return None
+    stats = histogram_stats(histogram, ["Network_Type"])
+    return _rank(stats, metric, len(stats), ascending, min_samples)
+
+
+def best_and_worst(locations, sums, counts, min_samples=MIN_SAMPLES):
+    """
+    Locations with the highest and lowest mean signal among those with at
+    least min_samples readings, or among all of them when none has enough.
+    """
+    locations = np.asarray(locations)
+    counts = np.asarray(counts, dtype="float64")
+    means = np.divide(np.asarray(sums, dtype="float64"), counts, out=np.full(len(counts), np.nan), where=counts > 0)
+    eligible = counts >= min_samples
+    if not eligible.any():
+        eligible = counts > 0
+    if not eligible.any():
+        return "No Data", "No Data"
+    means = np.where(eligible, means, np.nan)
+    return locations[np.nanargmax(means)], locations[np.nanargmin(means)]
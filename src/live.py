@@ -0,0 +1,137 @@
+import csv
+import glob
+import io
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from src.formats import detect_format
+
+DEFAULT_CAPACITY = 100_000
+
+
+class RingBuffer:
+    """
+    Fixed-capacity, column-wise buffer of the most recent readings. Appending
+    overwrites the oldest rows, so memory stays constant however long the
+    dashboard runs.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._columns = {
+            "Timestamp": np.empty(capacity, dtype="datetime64[ns]"),
+            "Network_Type": np.empty(capacity, dtype=object),
+            "Signal_dBm": np.empty(capacity, dtype="float64"),
+            "Location": np.empty(capacity, dtype=object),
+            "Download_Mbps": np.empty(capacity, dtype="float64"),
+            "Upload_Mbps": np.empty(capacity, dtype="float64"),
+            "Latency_ms": np.empty(capacity, dtype="float64"),
+            # Wall-clock time the reading reached the buffer
+            "Received": np.empty(capacity, dtype="float64")
+        }
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, df, received=None):
+        """Appends normalized readings, keeping only the newest `capacity`."""
+        if df.empty:
+            return
+        received = time.time() if received is None else received
+        df = df.iloc[-self.capacity:]
+        n = len(df)
+        positions = (self._next + np.arange(n)) % self.capacity
+
+        with self._lock:
+            for name, column in self._columns.items():
+                if name == "Received":
+                    column[positions] = received
+                elif name == "Timestamp":
+                    column[positions] = df[name].to_numpy(dtype="datetime64[ns]")
+                else:
+                    column[positions] = df[name].to_numpy()
+            self._next = (self._next + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
+
+    def to_frame(self):
+        """Returns the buffered readings, oldest first, as a new DataFrame."""
+        with self._lock:
+            start = (self._next - self._size) % self.capacity
+            order = (start + np.arange(self._size)) % self.capacity
+            return pd.DataFrame({name: column[order] for name, column in self._columns.items()})
+
+
+class LogTailer:
+    """
+    Follows growing CSV exports (e.g. signal_log.csv) in a folder. Each poll
+    parses only the complete lines appended since the last byte offset seen
+    for that file and pushes them into a RingBuffer. Polls are serialized, so
+    one tailer can be shared by several threads (every dashboard session).
+    """
+
+    def __init__(self, data_folder="data", pattern="*.csv", buffer=None, from_start=False):
+        self.data_folder = data_folder
+        self.pattern = pattern
+        self.buffer = buffer if buffer is not None else RingBuffer()
+        self.from_start = from_start
+        # path -> [byte offset, column names, format plan]
+        self._files = {}
+        # mtime of the newest file that produced readings, for latency checks
+        self.last_write_time = None
+        self.last_poll_time = None
+        self._lock = threading.Lock()
+
+    def _follow(self, path, size):
+        with open(path, "rb") as f:
+            header = f.readline()
+        names = next(csv.reader([header.decode("utf-8-sig")]), [])
+        offset = len(header) if self.from_start else size
+        self._files[path] = [offset, names, detect_format(names)]
+
+    def poll(self):
+        """Reads newly appended lines from every matching file. Returns the row count."""
+        # Offsets are read and advanced together, or concurrent polls read lines twice
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        new_rows = 0
+        for path in sorted(glob.glob(os.path.join(self.data_folder, self.pattern))):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            state = self._files.get(path)
+            if state is None or stat.st_size < state[0]:
+                # New file, or the export was truncated/replaced: start over
+                if stat.st_size == 0:
+                    continue
+                self._follow(path, stat.st_size)
+                state = self._files[path]
+            if stat.st_size == state[0]:
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(state[0])
+                data = f.read(stat.st_size - state[0])
+
+            # Leave a partially written last line for the next poll
+            complete = data.rfind(b"\n") + 1
+            if not complete:
+                continue
+            state[0] += complete
+
+            plan = state[2]
+            df = plan.apply(plan.read_csv(io.BytesIO(data[:complete]), header=None, names=state[1]))
+            self.buffer.extend(df)
+            self.last_write_time = stat.st_mtime
+            new_rows += len(df)
+
+        self.last_poll_time = time.time()
+        return new_rows
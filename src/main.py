@@ -1,35 +1,277 @@
-import glob
-import os
-from src.collector import collect_data
-from src.analyzer import analyze_data
-from src.visualizer import visualize_data
+import argparse
+import sys
+from src import metrics
 
-def main():
-    print("=== NetPulse: QoS Analysis ===")
+# Subcommands import what they need (pandas, pyarrow, matplotlib, ...) when
+# they run, so `--help` and the light subcommands don't pay for the heavy
+# dependencies of the others at startup.
+DATA_DIR = "data"
+STORE_DIR = "data/store"
 
-    # Automatically pick the latest CSV from data folder
-    csv_files = glob.glob("data/*.csv")
-    if not csv_files:
-        print("No CSV files found in 'data/' folder.")
-        return
+# Columns the charts need from the readings
+CHART_COLUMNS = ["Timestamp", "Network_Type", "Signal_dBm"]
 
-    # Pick the newest file based on modified time
-    latest_csv = max(csv_files, key=os.path.getmtime)
-    print(f"Using latest CSV: {latest_csv}")
 
-    output_file = "data/network_data_output.csv"
+def ingest(args):
+    from src.collector import collect_data
+    collect_data(args.sources, args.store, args.memory_limit, args.workers)
 
-    # Step 1: Collect data
-    collect_data(latest_csv, output_file)
 
-    # Step 2: Analyze data
-    analysis_results = analyze_data(output_file)
+def print_summary(summary):
     print("\nAnalysis Summary:")
-    for key, value in analysis_results.items():
+    for key, value in summary.items():
         print(f"{key}: {value}")
 
-    # Step 3: Visualize data
-    visualize_data(output_file)
+
+def print_anomalies(args, limit=10):
+    from src.anomaly import load_anomalies
+    anomalies = load_anomalies(args.store, args.start, args.end, network_types=args.network_type, limit=limit,
+                               devices=args.device)
+    print("\nRecent Anomalies:")
+    if anomalies.empty:
+        print("None detected")
+    for anomaly in anomalies.itertuples():
+        print(f"{anomaly.Timestamp} [{anomaly.kind}] {anomaly.Device_ID} {anomaly.Network_Type}: {anomaly.detail}")
+
+
+def print_sessions(args):
+    from src.sessions import handover_rates, load_dwell, load_sessions
+    sessions = load_sessions(args.store, args.start, args.end, args.device)
+    print("\nSessions:")
+    if sessions.empty:
+        print("None recorded")
+        return
+    fleet = handover_rates(args.store, args.start, args.end, by=(), devices=args.device)
+    print(f"{len(sessions)} sessions, {sessions['seconds'].mean() / 60:.1f} min on average")
+    for rates in fleet.itertuples():
+        per_hour = f"{rates.per_hour:.2f}/h" if rates.hours else "n/a"
+        print(f"Handovers: {rates.handovers} ({per_hour}), {rates.lte_nr} between LTE and NR")
+    dwell = load_dwell(args.store, args.start, args.end, by=["Network_Type"], devices=args.device)
+    print("Time on network: " + ", ".join(
+        f"{row.Network_Type} {row.share:.0%}" for row in dwell.itertuples() if row.share >= 0.005
+    ))
+
+
+def print_expiry_note(args, what):
+    """Says so when [start, end) reaches back before the raw readings still kept."""
+    import pandas as pd
+    from src.store import load_retention
+    raw_from = load_retention(args.store).get("raw_from")
+    if raw_from is not None and (args.start is None or pd.Timestamp(args.start) < raw_from):
+        print(f"\nNote: raw readings before {raw_from:%Y-%m-%d} have expired, so {what} start there.")
+
+
+def run_analysis(source, args, devices):
+    """analyze_data with the command line's filters, exiting with the reason when the range can't be answered."""
+    from src.analyzer import analyze_data
+    try:
+        return analyze_data(source, args.start, args.end, args.network_type, devices)
+    except ValueError as error:
+        sys.exit(f"Analysis failed: {error}")
+
+
+def analyze(args):
+    print_summary(run_analysis(args.source or args.store, args, None if args.source else args.device))
+    if args.source is None:
+        if args.device:
+            print_expiry_note(args, "device summaries")
+        print_anomalies(args)
+        print_sessions(args)
+
+
+def retention_options(args):
+    """Retention windows given on the command line; 0 keeps a tier for good."""
+    options = {}
+    for name in ("raw_days", "minute_days"):
+        value = getattr(args, name)
+        if value is not None:
+            options[name] = value or None
+    return options
+
+
+def compact(args):
+    from src.compaction import maintain_store
+    stats = maintain_store(args.store, **retention_options(args))
+    print(f"Expired {stats['partitions_dropped']} partition(s), {stats['bytes_dropped'] / 2**20:.1f} MiB")
+    for tier, label in (("raw_from", "Raw readings"), ("minute_from", "1-minute rollups")):
+        if tier in stats["retention"]:
+            print(f"{label} kept from {stats['retention'][tier]:%Y-%m-%d}")
+    print(f"Compacted {stats['partitions']} partition(s): {stats['files_before']} files "
+          f"({stats['bytes_before'] / 2**20:.1f} MiB) into {stats['files_after']} "
+          f"({stats['bytes_after'] / 2**20:.1f} MiB)")
+
+
+def devices(args):
+    from src.store import list_devices
+    for device in list_devices(args.store):
+        print(device)
+
+
+def report(args):
+    from src.report import render_reports
+    render_reports(args.store, args.output, args.start, args.end, args.by, args.format, args.workers)
+
+
+def query(args):
+    from src.sql import run_query, table_columns
+    if args.schema:
+        for table, columns in table_columns(args.store).items():
+            print(f"{table}: {', '.join(f'{name} {kind}' for name, kind in columns)}")
+        return
+    if args.sql is None:
+        sys.exit("Give a query, or - to read it from stdin")
+
+    sql = sys.stdin.read() if args.sql == "-" else args.sql
+    try:
+        df = run_query(sql, args.store, limit=args.limit or None)
+    except (ImportError, ValueError) as error:
+        sys.exit(f"Query failed: {error}")
+    if args.format == "csv":
+        df.to_csv(sys.stdout, index=False)
+    elif args.format == "json":
+        print(df.to_json(orient="records", date_format="iso"))
+    else:
+        print(df.to_string(index=False))
+
+
+def serve(args):
+    from src.server import serve as run_server
+    options = {
+        name: getattr(args, name) for name in ("host", "port", "compact_interval")
+        if getattr(args, name) is not None
+    }
+    run_server(args.data, args.store, **options, **retention_options(args))
+
+
+def run(args):
+    """
+    Ingest, analyze and chart in one go. The summary comes from the rollups
+    maintained at ingest, so the readings are read once, for the charts.
+    """
+    from src.store import load_readings
+    from src.visualizer import visualize_data
+
+    print("=== NetPulse: QoS Analysis ===")
+    ingest(args)
+    print_summary(run_analysis(args.store, args, args.device))
+    print_anomalies(args)
+    print_sessions(args)
+    print_expiry_note(args, "the charts")
+
+    df = load_readings(args.store, CHART_COLUMNS, args.network_type, args.start, args.end, args.device)
+    if df.empty:
+        print("\nNo readings to chart.")
+        return
+    visualize_data(df, save_figures=args.save_figures is not None, output_dir=args.save_figures or "graphs",
+                   show=not args.no_show)
+
+
+def add_store_arguments(parser):
+    parser.add_argument("--store", default=STORE_DIR, help=f"readings store directory (default: {STORE_DIR})")
+
+
+def add_range_arguments(parser):
+    parser.add_argument("--start", help="first timestamp to include, e.g. 2025-01-01 or '2025-01-01 06:00'")
+    parser.add_argument("--end", help="timestamp to stop before")
+    parser.add_argument("--network-type", action="append", metavar="TYPE",
+                        help="only this network type; repeat for several")
+    parser.add_argument("--device", action="append", metavar="ID",
+                        help="only this device (see the devices command); repeat for several")
+
+
+def add_retention_arguments(parser):
+    parser.add_argument("--raw-days", type=int, metavar="DAYS",
+                        help="keep raw readings of this many days, 0 for all (default: 30)")
+    parser.add_argument("--minute-days", type=int, metavar="DAYS",
+                        help="keep 1-minute rollups of this many days, 0 for all (default: 180)")
+
+
+def add_ingest_arguments(parser):
+    parser.add_argument("sources", nargs="*", default=[DATA_DIR],
+                        help=f"export folders, CSV files or glob patterns (default: {DATA_DIR})")
+    parser.add_argument("--memory-limit", type=int, default=512, metavar="MB", help="parse exports in chunks of this size")
+    parser.add_argument("--workers", type=int, default=1, help="parse exports in this many processes")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="netpulse", description="NetPulse QoS analysis")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record stage timings and counters and write them as JSON to PATH (- for stdout)")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    command = commands.add_parser("run", help="ingest, analyze and chart (the default)")
+    add_ingest_arguments(command)
+    add_store_arguments(command)
+    add_range_arguments(command)
+    command.add_argument("--save-figures", metavar="DIR", nargs="?", const="graphs", help="save charts to DIR")
+    command.add_argument("--no-show", action="store_true", help="don't open chart windows")
+    command.set_defaults(handler=run)
+
+    command = commands.add_parser("ingest", help="add new readings from exports to the store")
+    add_ingest_arguments(command)
+    add_store_arguments(command)
+    command.set_defaults(handler=ingest)
+
+    command = commands.add_parser("analyze", help="summarize the store, or a merged CSV")
+    add_store_arguments(command)
+    add_range_arguments(command)
+    command.add_argument("--source", help="a merged CSV to summarize instead of the store")
+    command.set_defaults(handler=analyze)
+
+    command = commands.add_parser("devices", help="list the devices the store has readings of")
+    add_store_arguments(command)
+    command.set_defaults(handler=devices)
+
+    command = commands.add_parser("compact", help="expire old readings and merge small files in the store")
+    add_store_arguments(command)
+    add_retention_arguments(command)
+    command.set_defaults(handler=compact)
+
+    command = commands.add_parser("report", help="render PDF/PNG reports per network type and location")
+    add_store_arguments(command)
+    command.add_argument("--start", help="first timestamp to include")
+    command.add_argument("--end", help="timestamp to stop before")
+    command.add_argument("--output", default="reports", help="report directory (default: reports)")
+    command.add_argument("--by", nargs="+", default=["Network_Type", "Location"],
+                         choices=["Network_Type", "Location"], help="segments to report on besides the fleet")
+    command.add_argument("--format", nargs="+", default=["pdf"], choices=["pdf", "png", "svg"])
+    command.add_argument("--workers", type=int, default=1, help="render in this many processes")
+    command.set_defaults(handler=report)
+
+    command = commands.add_parser("query", help="run SQL against the readings and derived tables (needs duckdb)")
+    add_store_arguments(command)
+    command.add_argument("sql", nargs="?", help="a SELECT statement, or - to read it from stdin")
+    command.add_argument("--limit", type=int, default=1000, help="rows to print, 0 for all (default: 1000)")
+    command.add_argument("--format", default="table", choices=["table", "csv", "json"])
+    command.add_argument("--schema", action="store_true", help="list the tables and their columns")
+    command.set_defaults(handler=query)
+
+    command = commands.add_parser("serve", help="accept device uploads over HTTP")
+    add_store_arguments(command)
+    command.add_argument("--data", default=DATA_DIR, help=f"folder for the upload journal (default: {DATA_DIR})")
+    command.add_argument("--host")
+    command.add_argument("--port", type=int)
+    command.add_argument("--compact-interval", type=float, metavar="SECONDS",
+                         help="expire and compact the store this often in the background, 0 never (default: 600)")
+    add_retention_arguments(command)
+    command.set_defaults(handler=serve)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args([*argv, "run"])
+    if args.metrics:
+        metrics.enable()
+
+    args.handler(args)
+
+    if args.metrics:
+        metrics.dump(args.metrics)
+
 
 if __name__ == "__main__":
     main()
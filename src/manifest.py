@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 9
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def empty_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def load_manifest(manifest_file):
+    """
+    Loads the ingestion manifest. A missing, unreadable or outdated manifest
+    yields an empty one, which makes the collector re-ingest everything.
+    """
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest()
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(manifest, manifest_file):
+    # Write to a temporary file first so an interrupted run never leaves a
+    # truncated manifest behind
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+
+def hash_file(path, prefix_size=None):
+    """
+    Returns the SHA-256 of the whole file and, when prefix_size is given, the
+    SHA-256 of its first prefix_size bytes. Both are computed in one read.
+    """
+    full = hashlib.sha256()
+    prefix = hashlib.sha256() if prefix_size is not None else None
+    remaining = prefix_size or 0
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            full.update(block)
+            if prefix is not None and remaining > 0:
+                prefix.update(block[:remaining])
+                remaining -= len(block[:remaining])
+
+    return full.hexdigest(), prefix.hexdigest() if prefix is not None else None
+
+
+def _ends_with_newline(path, size):
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def check_file(path, entry):
+    """
+    Compares a file against its manifest entry.
+
+    Returns (status, fingerprint) where status is one of:
+      "new"       - the file has never been ingested
+      "unchanged" - same content as last time (only stat'ed when size and
+                    mtime still match, hashed when it was merely touched)
+      "appended"  - old content is an exact prefix of the file, so only the
+                    bytes after entry["size"] need to be parsed
+      "changed"   - the file was rewritten
+    """
+    stat = os.stat(path)
+    if entry and stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+        return "unchanged", entry
+
+    grew = entry is not None and stat.st_size > entry["size"] > 0
+    digest, prefix_digest = hash_file(path, entry["size"] if grew else None)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+
+    if entry is None:
+        return "new", fingerprint
+    if digest == entry["sha256"]:
+        return "unchanged", dict(entry, **fingerprint)
+    if grew and prefix_digest == entry["sha256"] and _ends_with_newline(path, entry["size"]):
+        return "appended", fingerprint
+    return "changed", fingerprint
@@ -0,0 +1,152 @@
+import bisect
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+# Stage timings and counters for finding where time goes (parsing, dedup,
+# rollups, chart serialization, ...). Off unless NETPULSE_METRICS is set or
+# enable() is called; while off, timed() hands back one shared no-op context
+# and count() returns straight away, so instrumented code pays a function
+# call per stage and nothing else.
+#
+# Everything is recorded into the current Registry: the process-wide one,
+# unless use() switched the current thread or context to another (the
+# dashboard gives every browser session its own, so one user's toggle and
+# reset don't change what other sessions record). Threads started from a
+# context don't inherit its registry and record process-wide. Stages run in
+# collector worker processes (workers > 1) are recorded in those processes
+# and don't show up here.
+ENV_VAR = "NETPULSE_METRICS"
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_NOOP = nullcontext()
+
+
+class Registry:
+    """Stage timings and counters of one recorder, on when NETPULSE_METRICS is set unless told otherwise."""
+
+    def __init__(self, enabled=None):
+        self.enabled = os.environ.get(ENV_VAR, "") not in ("", "0") if enabled is None else bool(enabled)
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+
+_process = Registry()
+_current = contextvars.ContextVar("netpulse_metrics", default=_process)
+
+
+def use(registry=None):
+    """Records into `registry` (None: the process-wide one) in the current thread or context from now on."""
+    _current.set(registry or _process)
+
+
+def enabled():
+    return _current.get().enabled
+
+
+def enable(on=True):
+    _current.get().enabled = bool(on)
+
+
+def reset(registry=None):
+    """Clears what `registry` (None: the current one) recorded."""
+    registry = registry or _current.get()
+    with registry.lock:
+        registry.stages.clear()
+        registry.counters.clear()
+
+
+def record(stage, milliseconds):
+    """Adds one timing of a stage."""
+    registry = _current.get()
+    with registry.lock:
+        entry = registry.stages.get(stage)
+        if entry is None:
+            entry = registry.stages[stage] = {
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(LATENCY_BOUNDS_MS) + 1)
+            }
+        entry["count"] += 1
+        entry["total_ms"] += milliseconds
+        entry["max_ms"] = max(entry["max_ms"], milliseconds)
+        entry["buckets"][bisect.bisect_left(LATENCY_BOUNDS_MS, milliseconds)] += 1
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def timed(stage):
+    """Context manager recording how long its block takes as `stage`."""
+    if not _current.get().enabled:
+        return _NOOP
+    return _Timer(stage)
+
+
+def instrument(stage):
+    """Decorator recording every call of the function as `stage`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _current.get().enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Adds value to a counter (rows in/out, bytes read, cache misses, ...)."""
+    registry = _current.get()
+    if not registry.enabled:
+        return
+    with registry.lock:
+        registry.counters[name] = registry.counters.get(name, 0) + value
+
+
+def snapshot():
+    """Everything recorded so far as plain data, stages sorted by total time."""
+    labels = [f"<={bound}ms" for bound in LATENCY_BOUNDS_MS] + [f">{LATENCY_BOUNDS_MS[-1]}ms"]
+    registry = _current.get()
+    with registry.lock:
+        stages = {
+            stage: {
+                "count": entry["count"],
+                "total_ms": round(entry["total_ms"], 3),
+                "mean_ms": round(entry["total_ms"] / entry["count"], 3),
+                "max_ms": round(entry["max_ms"], 3),
+                "histogram": {label: n for label, n in zip(labels, entry["buckets"]) if n}
+            }
+            for stage, entry in sorted(registry.stages.items(), key=lambda item: -item[1]["total_ms"])
+        }
+        counters = dict(sorted(registry.counters.items()))
+    return {"stages": stages, "counters": counters}
+
+
+def dump(path="-"):
+    """Writes the snapshot as JSON to a file, or to stdout for "-"."""
+    text = json.dumps(snapshot(), indent=2)
+    if path == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
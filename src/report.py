@@ -0,0 +1,240 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+# Figures are built without pyplot, so rendering never touches a GUI backend
+# and doesn't change the backend of whatever process imports this module
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from src.analyzer import QUALITY_LABELS, summarize_rollups
+from src.leaderboard import load_leaderboard
+from src.rollups import QUALITY_COLUMNS, load_rollups
+
+REPORT_DIR = "reports"
+SEGMENT_COLUMNS = ["Network_Type", "Location"]
+# Segment name of the report covering every reading
+FLEET = "fleet"
+
+# Locations listed on a network type's breakdown page
+BREAKDOWN_ROWS = 20
+# Segments rendered per worker task, so tasks outweigh their scheduling cost
+SEGMENTS_PER_TASK = 16
+
+QUALITY_COLORS = ["#d62728", "#ff7f0e", "#2ca02c"]
+
+
+def segment_file(segment):
+    """File name stem for a segment ("fleet" or (column, value))."""
+    if segment == FLEET:
+        return FLEET
+    column, value = segment
+    name = "network" if column == "Network_Type" else "location"
+    return f"{name}={re.sub(r'[^A-Za-z0-9._-]+', '_', str(value))}"
+
+
+class ReportRenderer:
+    """
+    Draws report pages onto a fixed set of figures. The figures and axes are
+    created once and cleared between segments, so rendering hundreds of
+    segments doesn't build hundreds of figures.
+    """
+
+    def __init__(self):
+        # A4 landscape pages with fixed margins; measuring a tight layout per
+        # segment would cost more than drawing the charts
+        self.overview = Figure(figsize=(11.69, 8.27))
+        self.overview.subplots_adjust(left=0.07, right=0.93, bottom=0.1, top=0.9, wspace=0.35, hspace=0.45)
+        self.axes = self.overview.subplots(2, 2)
+        self.latency_axis = self.axes[1, 1].twinx()
+        self.breakdown = Figure(figsize=(11.69, 8.27))
+        self.breakdown.subplots_adjust(left=0.15, right=0.97, bottom=0.08, top=0.9, wspace=0.1)
+        self.breakdown_axis, self.table_axis = self.breakdown.subplots(
+            1, 2, gridspec_kw={"width_ratios": [3, 2]}
+        )
+
+    def render(self, title, rollup, histogram, breakdown_by, paths):
+        """
+        Draws the segment's pages and saves them to every path: a .pdf gets
+        both pages, other formats one file per page. Returns the files written.
+        """
+        self._draw_overview(title, rollup, histogram)
+        self._draw_breakdown(title, rollup, breakdown_by)
+        written = []
+        for path in paths:
+            if path.endswith(".pdf"):
+                with PdfPages(path, metadata={"Title": f"NetPulse report: {title}"}) as pdf:
+                    pdf.savefig(self.overview)
+                    pdf.savefig(self.breakdown)
+                written.append(path)
+            else:
+                stem, extension = os.path.splitext(path)
+                self.overview.savefig(path)
+                self.breakdown.savefig(f"{stem}-breakdown{extension}")
+                written.extend([path, f"{stem}-breakdown{extension}"])
+        return written
+
+    def _draw_overview(self, title, rollup, histogram):
+        for ax in [*self.axes.ravel(), self.latency_axis]:
+            ax.clear()
+        summary = summarize_rollups(rollup)
+        self.overview.suptitle(
+            f"{title}: {summary.rows:,} readings, avg signal {summary.avg_signal} dBm, "
+            f"health {summary.health_score:.0f}/100"
+        )
+
+        hourly = rollup.groupby("bucket", sort=True).agg({
+            "Signal_dBm_sum": "sum", "Signal_dBm_count": "sum", "Signal_dBm_min": "min", "Signal_dBm_max": "max",
+            "Download_Mbps_sum": "sum", "Download_Mbps_count": "sum", "Upload_Mbps_sum": "sum",
+            "Upload_Mbps_count": "sum", "Latency_ms_sum": "sum", "Latency_ms_count": "sum"
+        })
+
+        def mean(metric):
+            return hourly[f"{metric}_sum"] / hourly[f"{metric}_count"].replace(0, np.nan)
+
+        ax = self.axes[0, 0]
+        ax.fill_between(hourly.index, hourly["Signal_dBm_min"], hourly["Signal_dBm_max"], color="green", alpha=0.2,
+                        label="min-max")
+        ax.plot(hourly.index, mean("Signal_dBm"), color="green", label="mean")
+        ax.set_title("Hourly Signal Strength")
+        ax.set_ylabel("Signal (dBm)")
+        ax.legend(loc="lower left")
+        ax.grid(True)
+
+        ax = self.axes[0, 1]
+        if histogram is not None and not histogram.empty:
+            bins = histogram.groupby("bin")["count"].sum()
+            ax.bar(bins.index, bins.to_numpy(), width=1.0, color="salmon", edgecolor="black")
+        ax.set_title("Signal Strength Distribution (all time)")
+        ax.set_xlabel("Signal Strength (dBm)")
+        ax.set_ylabel("Readings")
+        ax.grid(axis="y")
+
+        ax = self.axes[1, 0]
+        ax.bar(QUALITY_LABELS, [summary.quality_counts[label] for label in QUALITY_LABELS], color=QUALITY_COLORS)
+        ax.set_title("Signal Quality")
+        ax.set_ylabel("Readings")
+        ax.grid(axis="y")
+
+        ax = self.axes[1, 1]
+        ax.plot(hourly.index, mean("Download_Mbps"), color="tab:blue", label="download")
+        ax.plot(hourly.index, mean("Upload_Mbps"), color="tab:cyan", label="upload")
+        self.latency_axis.plot(hourly.index, mean("Latency_ms"), color="tab:red", label="latency")
+        ax.set_title("Hourly Throughput and Latency")
+        ax.set_ylabel("Mbps")
+        self.latency_axis.set_ylabel("Latency (ms)")
+        ax.legend(loc="upper left")
+        self.latency_axis.legend(loc="upper right")
+        ax.grid(True)
+
+        for ax in self.axes.ravel():
+            ax.tick_params(axis="x", labelrotation=30)
+
+    def _draw_breakdown(self, title, rollup, breakdown_by):
+        self.breakdown_axis.clear()
+        self.table_axis.clear()
+        self.table_axis.axis("off")
+        self.breakdown.suptitle(f"{title}: signal by {breakdown_by.replace('_', ' ').lower()}")
+
+        totals = rollup.groupby(breakdown_by, observed=True)[
+            ["rows", "Signal_dBm_sum", "Signal_dBm_count", *QUALITY_COLUMNS]
+        ].sum()
+        totals = totals[totals["Signal_dBm_count"] > 0]
+        totals["mean"] = totals["Signal_dBm_sum"] / totals["Signal_dBm_count"]
+        # Most readings first, so the page shows the segments that matter most
+        totals = totals.nlargest(BREAKDOWN_ROWS, "rows").sort_values("mean")
+
+        labels = totals.index.astype(str)
+        self.breakdown_axis.barh(labels, totals["mean"], color="skyblue")
+        self.breakdown_axis.set_xlabel("Average Signal (dBm)")
+        self.breakdown_axis.grid(axis="x")
+
+        if len(totals):
+            cells = [[label, f"{row.rows:,}", f"{row.mean:.1f}", f"{row.quality_Poor / row.rows:.0%}"]
+                     for label, row in zip(labels[::-1], totals.iloc[::-1].itertuples())]
+            table = self.table_axis.table(cellText=cells, colLabels=[breakdown_by, "Readings", "Avg dBm", "Poor"],
+                                          loc="upper center")
+            table.auto_set_font_size(False)
+            table.set_fontsize(8)
+
+
+# Per-process state of report workers: the loaded aggregates and a renderer
+_worker = {}
+
+
+def _init_worker(store_dir, start, end):
+    rollup = load_rollups(store_dir, "1h", start, end)
+    histogram = load_leaderboard(store_dir, "histograms")
+    _worker.update({
+        "rollup": rollup,
+        "histogram": histogram,
+        # Row positions per segment, computed once instead of filtering per segment
+        "groups": {column: rollup.groupby(column, observed=True).indices for column in SEGMENT_COLUMNS},
+        "histogram_groups": (
+            {column: histogram.groupby(column, observed=True).indices for column in SEGMENT_COLUMNS}
+            if histogram is not None else None
+        ),
+        "renderer": ReportRenderer()
+    })
+
+
+def _render_segments(segments, output_dir, formats):
+    # Runs in a worker process (or inline); returns the written paths
+    rollup, histogram = _worker["rollup"], _worker["histogram"]
+    written = []
+    for segment in segments:
+        if segment == FLEET:
+            title, segment_rollup, segment_histogram, breakdown_by = "Fleet", rollup, histogram, "Network_Type"
+        else:
+            column, value = segment
+            segment_rollup = rollup.iloc[_worker["groups"][column][value]]
+            segment_histogram = None
+            if histogram is not None and value in _worker["histogram_groups"][column]:
+                segment_histogram = histogram.iloc[_worker["histogram_groups"][column][value]]
+            title = f"{column.replace('_', ' ')} {value}"
+            breakdown_by = "Location" if column == "Network_Type" else "Network_Type"
+
+        paths = [os.path.join(output_dir, f"{segment_file(segment)}.{extension}") for extension in formats]
+        written.extend(_worker["renderer"].render(title, segment_rollup, segment_histogram, breakdown_by, paths))
+    return written
+
+
+def report_segments(store_dir, start=None, end=None, by=SEGMENT_COLUMNS):
+    """The fleet plus every network type and/or location with readings in [start, end)."""
+    rollup = load_rollups(store_dir, "1h", start, end)
+    if rollup is None or rollup.empty:
+        return []
+    segments = [FLEET]
+    for column in by:
+        segments.extend((column, value) for value in sorted(rollup[column].dropna().unique().astype(str)))
+    return segments
+
+
+def render_reports(store_dir, output_dir=REPORT_DIR, start=None, end=None, by=SEGMENT_COLUMNS, formats=("pdf",),
+                   workers=1):
+    """
+    Renders a report for the fleet and for each network type and location
+    (`by`) from the hourly rollups and signal histograms, headless. Every
+    segment gets a two-page PDF (and/or PNG pages, per `formats`) in
+    output_dir. With workers > 1, segments are split into batches rendered
+    by a process pool, each process loading the aggregates and building its
+    figures once. Returns the paths written.
+    """
+    segments = report_segments(store_dir, start, end, by)
+    if not segments:
+        print("No rollups in the store yet, nothing to report.")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    batches = [segments[i:i + SEGMENTS_PER_TASK] for i in range(0, len(segments), SEGMENTS_PER_TASK)]
+    if workers <= 1:
+        _init_worker(store_dir, start, end)
+        written = [path for batch in batches for path in _render_segments(batch, output_dir, formats)]
+        _worker.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(store_dir, start, end)) as pool:
+            results = pool.map(_render_segments, batches, [output_dir] * len(batches), [formats] * len(batches))
+            written = [path for paths in results for path in paths]
+
+    print(f"Wrote {len(segments)} reports to {output_dir}")
+    return written
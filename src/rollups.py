@@ -0,0 +1,277 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.store import load_readings, load_retention
+
+# Rollup name -> time bucket width, finest first; each level is derived from
+# the one before it
+ROLLUP_FREQS = {
+    "1m": "1min",
+    "1h": "1h",
+    "1d": "1D"
+}
+
+ROLLUP_KEYS = ["bucket", "Network_Type", "Location"]
+ROLLUP_METRICS = ["Signal_dBm", "Download_Mbps", "Upload_Mbps", "Latency_ms"]
+QUALITY_COLUMNS = ["quality_Poor", "quality_Good", "quality_Excellent"]
+
+# How each stored column combines when two rollups for the same key merge
+MERGE_AGGS = {"rows": "sum"}
+for _metric in ROLLUP_METRICS:
+    MERGE_AGGS.update({
+        f"{_metric}_count": "sum",
+        f"{_metric}_sum": "sum",
+        f"{_metric}_sumsq": "sum",
+        f"{_metric}_min": "min",
+        f"{_metric}_max": "max"
+    })
+for _column in QUALITY_COLUMNS:
+    MERGE_AGGS[_column] = "sum"
+
+
+def rollups_path(store_dir, name=None):
+    path = os.path.join(store_dir, "rollups")
+    return os.path.join(path, name) if name else path
+
+
+def clear_rollups(store_dir):
+    shutil.rmtree(rollups_path(store_dir), ignore_errors=True)
+
+
+def compute_rollup(df, freq):
+    """
+    Aggregates readings into one row per time bucket x network type x
+    location, holding count, sum, sum of squares, min and max of every metric
+    plus the number of readings in each signal quality class.
+    """
+    # Imported here because the analyzer itself reads rollups
+    from src.analyzer import quality_codes
+
+    columns = {
+        "bucket": df["Timestamp"].dt.floor(freq).to_numpy(),
+        "Network_Type": df["Network_Type"].to_numpy(),
+        "Location": df["Location"].to_numpy(),
+        "rows": np.ones(len(df), dtype="int64")
+    }
+    for metric in ROLLUP_METRICS:
+        values = df[metric].to_numpy(dtype="float64", na_value=np.nan)
+        columns[f"{metric}_count"] = (~np.isnan(values)).astype("int64")
+        columns[f"{metric}_sum"] = values
+        columns[f"{metric}_sumsq"] = values * values
+        columns[f"{metric}_min"] = values
+        columns[f"{metric}_max"] = values
+
+    codes = quality_codes(df["Signal_dBm"])
+    for code, column in enumerate(QUALITY_COLUMNS):
+        columns[column] = (codes == code).astype("int64")
+
+    return _group(pd.DataFrame(columns, copy=False))
+
+
+def merge_rollups(frames):
+    """Combines rollups (e.g. from different batches or partitions) into one."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    return _group(pd.concat(frames, ignore_index=True))
+
+
+def _group(work):
+    # Keep missing timestamps as their own bucket instead of dropping readings
+    rollup = work.groupby(ROLLUP_KEYS, observed=True, dropna=False, sort=True).agg(MERGE_AGGS)
+    rollup = rollup.reset_index()
+    return rollup.astype({"Network_Type": "category", "Location": "category"})
+
+
+def coarsen_rollup(rollup, freq):
+    """Re-buckets a rollup into wider time buckets."""
+    return _group(rollup.assign(bucket=rollup["bucket"].dt.floor(freq)))
+
+
+def compute_rollups(df):
+    """
+    Returns {name: rollup} for every configured bucket width. Only the finest
+    level is aggregated from the readings; coarser ones re-bucket it.
+    """
+    rollups = {}
+    previous = None
+    for name, freq in ROLLUP_FREQS.items():
+        previous = compute_rollup(df, freq) if previous is None else coarsen_rollup(previous, freq)
+        rollups[name] = previous
+    return rollups
+
+
+def _day_file(store_dir, name, day):
+    return os.path.join(rollups_path(store_dir, name), f"day={day}", "rollup.parquet")
+
+
+def update_rollups(store_dir, rollups):
+    """
+    Merges freshly computed rollups into the stored ones. Rollups are kept in
+    one file per day, so only the days touched by new readings are rewritten.
+    """
+    for name, rollup in rollups.items():
+        if rollup is None or rollup.empty:
+            continue
+
+        days = rollup["bucket"].dt.strftime("%Y-%m-%d").fillna("unknown")
+        for day, delta in rollup.groupby(days.to_numpy(), sort=False):
+            path = _day_file(store_dir, name, day)
+            if os.path.exists(path):
+                delta = merge_rollups([pd.read_parquet(path), delta])
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            delta.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+            os.replace(tmp_path, path)
+
+
+def load_rollups(store_dir, name="1d", start=None, end=None, network_types=None):
+    """
+    Loads one rollup level, pruned to the days overlapping [start, end) and
+    filtered to the selected network types. Returns None when the store has
+    no rollups yet.
+    """
+    path = rollups_path(store_dir, name)
+    if not os.path.isdir(path):
+        return None
+
+    filters = []
+    if start is not None:
+        filters.append(("day", ">=", pd.Timestamp(start).strftime("%Y-%m-%d")))
+    if end is not None:
+        filters.append(("day", "<=", pd.Timestamp(end).strftime("%Y-%m-%d")))
+    if network_types:
+        filters.append(("Network_Type", "in", list(network_types)))
+
+    rollup = pd.read_parquet(path, engine="pyarrow", filters=filters or None)
+    rollup = rollup.drop(columns="day")
+
+    if start is not None:
+        rollup = rollup[rollup["bucket"] >= pd.Timestamp(start)]
+    if end is not None:
+        rollup = rollup[rollup["bucket"] < pd.Timestamp(end)]
+    return rollup
+
+
+def pick_rollup(start=None, end=None):
+    """
+    Picks the coarsest rollup level whose buckets line up with the query
+    range, so results are exact while reading as few rows as possible.
+    """
+    bounds = [pd.Timestamp(t) for t in (start, end) if t is not None]
+    if all(t == t.floor("1D") for t in bounds):
+        return "1d"
+    if all(t == t.floor("1h") for t in bounds):
+        return "1h"
+    return "1m"
+
+
+def load_tiered_rollups(store_dir, start=None, end=None, network_types=None, name=None):
+    """
+    load_rollups() at level `name` (by default pick_rollup's choice) for a
+    range that may reach back before the 1-minute rollups still kept (see
+    src.compaction). The expired part is answered from the hourly rollups
+    instead, so bounds inside it must fall on the hour; ValueError otherwise.
+    """
+    name = name or pick_rollup(start, end)
+    minute_from = load_retention(store_dir).get("minute_from")
+    if name != "1m" or minute_from is None or (start is not None and pd.Timestamp(start) >= minute_from):
+        return load_rollups(store_dir, name, start, end, network_types)
+
+    coarse_end = minute_from if end is None else min(minute_from, pd.Timestamp(end))
+    for bound in (start, coarse_end):
+        if bound is not None and pd.Timestamp(bound) != pd.Timestamp(bound).floor("1h"):
+            raise ValueError(
+                f"1-minute rollups before {minute_from:%Y-%m-%d} have expired, "
+                f"so {pd.Timestamp(bound)} must be on the hour"
+            )
+    frames = [load_rollups(store_dir, "1h", start, coarse_end, network_types)]
+    if end is None or pd.Timestamp(end) > minute_from:
+        frames.append(load_rollups(store_dir, "1m", minute_from, end, network_types))
+    frames = [frame for frame in frames if frame is not None]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def split_range(start, end, freq):
+    """
+    Splits [start, end) into the whole `freq` buckets inside it and the
+    partial buckets at its unaligned bounds. Returns (inner_start, inner_end)
+    and the list of (start, end) edges; None bounds are open and need no edge.
+    """
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+    inner_start = None if start is None else start.ceil(freq)
+    inner_end = None if end is None else end.floor(freq)
+
+    edges = []
+    if start is not None and start != inner_start:
+        edges.append((start, inner_start if end is None else min(inner_start, end)))
+    if end is not None and end != inner_end and (start is None or inner_end >= max(start, inner_start)):
+        edges.append((inner_end, end))
+    return (inner_start, inner_end), edges
+
+
+def load_range_rollups(store_dir, start=None, end=None, network_types=None):
+    """
+    Rollups covering exactly [start, end), whatever its bounds: the whole
+    minutes inside it from load_tiered_rollups, the partial minutes at
+    unaligned bounds aggregated from the raw readings. Raises ValueError when
+    such a bound is older than the raw readings still kept.
+    """
+    (inner_start, inner_end), edges = split_range(start, end, ROLLUP_FREQS["1m"])
+    rollup = load_tiered_rollups(store_dir, inner_start, inner_end, network_types)
+    if rollup is None or not edges:
+        return rollup
+
+    raw_from = load_retention(store_dir).get("raw_from")
+    frames = [rollup]
+    for edge_start, edge_end in edges:
+        if raw_from is not None and edge_start < raw_from:
+            raise ValueError(
+                f"Raw readings before {raw_from:%Y-%m-%d} have expired, so {edge_start} must be on a minute"
+            )
+        columns = ["Timestamp", "Network_Type", "Location"] + ROLLUP_METRICS
+        df = load_readings(store_dir, columns, network_types, edge_start, edge_end)
+        if len(df):
+            frames.append(compute_rollup(df, ROLLUP_FREQS["1m"]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def rollup_timeline(store_dir, start=None, end=None, network_types=None, max_buckets=20_000):
+    """
+    Timestamp, Signal_dBm and Network_Type of the lowest and highest signal
+    per time bucket and network type, from the finest rollup level that
+    gives at most max_buckets buckets over [start, end), widened to whole
+    buckets: a timeline for ranges whose raw readings have expired, shaped
+    like the readings the dashboard downsamples.
+    """
+    name = "1d"
+    if start is not None and end is not None:
+        span = pd.Timestamp(end) - pd.Timestamp(start)
+        name = next((level for level, freq in ROLLUP_FREQS.items() if span / pd.Timedelta(freq) <= max_buckets), "1d")
+
+    # Widen the range to whole buckets; minutes whose rollups expired need whole hours
+    freq = ROLLUP_FREQS["1h" if name == "1m" else name]
+    start = None if start is None else pd.Timestamp(start).floor(freq)
+    end = None if end is None else pd.Timestamp(end).ceil(freq)
+    rollup = load_tiered_rollups(store_dir, start, end, network_types, name)
+    if rollup is None or rollup.empty:
+        return pd.DataFrame({
+            "Timestamp": pd.Series(dtype="datetime64[ns]"),
+            "Signal_dBm": pd.Series(dtype="float64"),
+            "Network_Type": pd.Series(dtype="category")
+        })
+
+    extremes = rollup.groupby(["bucket", "Network_Type"], observed=True, sort=True).agg(
+        low=("Signal_dBm_min", "min"), high=("Signal_dBm_max", "max")
+    ).dropna().reset_index()
+    points = pd.concat([
+        extremes[["bucket", "Network_Type", column]].rename(columns={column: "Signal_dBm"})
+        for column in ("low", "high")
+    ], ignore_index=True)
+    points = points.rename(columns={"bucket": "Timestamp"}).sort_values("Timestamp", kind="stable", ignore_index=True)
+    return points[["Timestamp", "Signal_dBm", "Network_Type"]]
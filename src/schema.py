@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# Canonical in-memory types of readings. Labels are categoricals (one small
+# code per row instead of a Python string), measurements float32 (exact for
+# integer dBm, ~7 significant digits for speeds, latency and coordinates,
+# and still able to hold missing values), timestamps int64-backed datetimes.
+MEMORY_DTYPES = {
+    "Device_ID": "category",
+    "Network_Type": "category",
+    "Location": "category",
+    "Signal_Quality": "category",
+    "Signal_dBm": "float32",
+    "Download_Mbps": "float32",
+    "Upload_Mbps": "float32",
+    "Latency_ms": "float32",
+    "Latitude": "float32",
+    "Longitude": "float32"
+}
+
+
+def compact_readings(df):
+    """
+    Casts readings to MEMORY_DTYPES (columns it doesn't know are left alone)
+    and parses string timestamps, so every loaded frame has the same compact
+    layout. Columns that already have the right type are not copied.
+    """
+    dtypes = {
+        column: dtype for column, dtype in MEMORY_DTYPES.items()
+        if column in df.columns and df[column].dtype != dtype
+    }
+    if dtypes:
+        df = df.astype(dtypes)
+    if "Timestamp" in df.columns and not pd.api.types.is_datetime64_dtype(df["Timestamp"]):
+        df = df.assign(Timestamp=pd.to_datetime(df["Timestamp"], errors="coerce"))
+    return df
+
+
+def bytes_per_reading(df):
+    """Memory held by the frame (strings included) divided by its rows."""
+    if not len(df):
+        return 0.0
+    return float(df.memory_usage(deep=True, index=True).sum()) / len(df)
+
+
+def select_positions(df, column, values):
+    """
+    Row positions whose `column` is one of `values`, for filtering without
+    materializing a filtered copy of every column. Returns None when the
+    filter keeps everything. Positions keep the frame's row order.
+    """
+    if not values:
+        return None
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Compare small integer codes instead of labels
+        wanted = np.flatnonzero(series.cat.categories.isin(list(values)))
+        mask = np.isin(series.cat.codes.to_numpy(), wanted)
+    else:
+        mask = series.isin(list(values)).to_numpy()
+    if mask.all():
+        return None
+    positions = np.flatnonzero(mask)
+    return positions.astype("int32") if len(mask) < 2**31 else positions
+
+
+def take_rows(df, positions, columns=None, last=None):
+    """
+    The rows at `positions` (every row when None), optionally only some
+    columns and only the `last` rows of them, copying nothing else.
+    """
+    if columns is not None:
+        df = df[columns]
+    if positions is None:
+        return df if last is None else df.iloc[len(df) - min(last, len(df)):]
+    if last is not None:
+        positions = positions[len(positions) - min(last, len(positions)):]
+    return df.take(positions)
+
+
+def runs(keys):
+    """Start positions and lengths of the runs of equal keys in a sorted array."""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype="int64")
+    return starts, np.diff(np.r_[starts, len(keys)])
@@ -0,0 +1,406 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+from http import HTTPStatus
+import pandas as pd
+from src.collector import collect_data, ingest_readings
+from src.compaction import MINUTE_RETENTION_DAYS, RAW_RETENTION_DAYS, maintain_store
+from src.formats import assign_device, detect_format, normalize_frame
+from src.manifest import HASH_BLOCK_SIZE, load_manifest, save_manifest
+from src.store import STORE_DIR, manifest_path, store_lock, store_version
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Uploads are acknowledged once they are committed. A commit happens when
+# COMMIT_ROWS readings are waiting or COMMIT_INTERVAL_SECONDS after the first
+# one arrived, whichever comes first, so many small uploads share one write.
+COMMIT_ROWS = 50_000
+COMMIT_INTERVAL_SECONDS = 0.5
+
+# Backpressure: beyond this many uncommitted readings uploads are turned away
+# with 503 and a Retry-After hint instead of growing memory without bound
+MAX_PENDING_ROWS = 500_000
+RETRY_AFTER_SECONDS = 1
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Group commits leave many small files per partition; every this many seconds
+# a background job expires data past the retention windows and compacts the
+# rest (see src.compaction). 0 turns it off.
+COMPACT_INTERVAL_SECONDS = 600
+
+# Uploaded readings are journaled to an export in the data folder before they
+# reach the store, so a store rebuild picks them up like any other export
+JOURNAL_FILE = "uploads.csv"
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_json(content_type):
+    return "json" in content_type
+
+
+def count_rows(body, content_type=""):
+    """Number of readings in an upload, from its line count."""
+    lines = body.count(b"\n") + (not body.endswith(b"\n"))
+    return lines if _is_json(content_type) else max(lines - 1, 0)
+
+
+def parse_upload(body, content_type=""):
+    """
+    Parses an upload body into normalized readings. JSON lines are expected
+    when the content type mentions json; anything else is read as CSV with
+    the same headers the Android exports use.
+    """
+    try:
+        if _is_json(content_type):
+            frame = pd.read_json(io.BytesIO(body), lines=True)
+            # Readings are flat: a nested object or list has no column to go to
+            nested = [
+                column for column in frame.columns
+                if pd.api.types.is_object_dtype(frame[column])
+                and frame[column].map(lambda value: isinstance(value, (dict, list))).any()
+            ]
+            if nested:
+                raise ValueError(f"Nested values in {', '.join(map(str, nested))}, readings take only scalars")
+            return normalize_frame(frame)
+        header = next(csv.reader([body.partition(b"\n")[0].decode("utf-8-sig")]), [])
+        plan = detect_format(header)
+        return plan.apply(plan.read_csv(io.BytesIO(body)))
+    except (ValueError, pd.errors.ParserError) as e:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Unreadable upload: {e}")
+
+
+def parse_uploads(uploads):
+    """
+    Parses a group of (body, content_type, device) uploads with as few parser
+    calls as possible: JSON lines bodies of one device are simply
+    concatenated, and CSV bodies of one device that share a header line are
+    joined under a single header. Readings without a Device_ID column are
+    attributed to the upload's device (None leaves that to the store). When
+    a joined parse fails, its uploads are parsed one by one so only the bad
+    ones are refused.
+
+    Returns (frames, errors) where errors maps upload positions to the
+    RequestError explaining why that upload was refused.
+    """
+    groups = {}
+    for position, (body, content_type, device) in enumerate(uploads):
+        if _is_json(content_type):
+            key, data = "json", body
+        else:
+            header, _, data = body.partition(b"\n")
+            key = header.rstrip(b"\r")
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+        groups.setdefault((device, key), []).append((position, data))
+
+    frames = []
+    errors = {}
+    for (device, key), members in groups.items():
+        content_type = "application/x-ndjson" if key == "json" else "text/csv"
+        header = b"" if key == "json" else key + b"\n"
+        parsed = []
+        try:
+            parsed.append(parse_upload(header + b"".join(data for _, data in members), content_type))
+        except RequestError:
+            for position, data in members:
+                try:
+                    parsed.append(parse_upload(header + data, content_type))
+                except RequestError as e:
+                    errors[position] = e
+        frames += [assign_device(frame, device) for frame in parsed] if device else parsed
+    return frames, errors
+
+
+async def _read_request(reader):
+    """Reads one HTTP/1.1 request. Returns None once the client has closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Uploads are limited to {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, target.split("?", 1)[0], headers, body
+
+
+def _write_response(writer, status, payload, headers=None, keep_alive=True):
+    body = json.dumps(payload).encode()
+    lines = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}"
+    ]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+class IngestServer:
+    """
+    Asyncio HTTP endpoint that accepts batched reading uploads from devices.
+
+        POST /readings   CSV (text/csv) or JSON lines (application/x-ndjson);
+                         an X-Device-ID header names the device of readings
+                         without a Device_ID column
+        GET  /health     queue depth, commit and compaction counters
+
+    Uploads are queued as received; a single writer parses everything queued
+    in one go, normalizes it exactly like exports picked up by collect_data,
+    group-commits it to the journal, the readings store and the rollups, then
+    acknowledges every upload in the group. Commits hold the store lock, so collect_data runs (e.g. from the
+    dashboard) can safely share the store with the server. Compaction and
+    retention run in the background every compact_interval seconds.
+    """
+
+    def __init__(self, data_folder="data", store_dir=STORE_DIR, commit_rows=COMMIT_ROWS,
+                 commit_interval=COMMIT_INTERVAL_SECONDS, max_pending_rows=MAX_PENDING_ROWS,
+                 compact_interval=COMPACT_INTERVAL_SECONDS, raw_days=RAW_RETENTION_DAYS,
+                 minute_days=MINUTE_RETENTION_DAYS):
+        self.data_folder = data_folder
+        self.store_dir = store_dir
+        self.commit_rows = commit_rows
+        self.commit_interval = commit_interval
+        self.max_pending_rows = max_pending_rows
+        self.compact_interval = compact_interval
+        self.raw_days = raw_days
+        self.minute_days = minute_days
+        self.journal = os.path.join(data_folder, JOURNAL_FILE)
+
+        self.pending_rows = 0
+        self.committed_rows = 0
+        self.commits = 0
+        self.compactions = 0
+        self.rejected = 0
+        self._batch = []
+        self._seen_keys = None
+        self._store_version = None
+        self._journal_hash = None
+        self._committing = None
+        self._wakeup = None
+        self._full = None
+
+    # --- Store side (runs in a worker thread) ---
+
+    def _open_store(self):
+        # Bring the store up to date with the exports (and earlier uploads)
+        # so the journal's manifest entry matches the file on disk
+        collect_data(self.data_folder, self.store_dir)
+
+        self._journal_hash = hashlib.sha256()
+        if os.path.exists(self.journal):
+            with open(self.journal, "rb") as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                    self._journal_hash.update(block)
+
+    def _commit(self, uploads):
+        frames, errors = parse_uploads(uploads)
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            with store_lock(self.store_dir):
+                self._commit_locked(df)
+        return errors
+
+    def _commit_locked(self, df):
+        # The in-memory key index is only current if nobody else wrote since
+        if store_version(self.store_dir) != self._store_version:
+            self._seen_keys = None
+
+        # Journal first: if the process dies before the store write, the next
+        # collect_data sees the journal as appended and ingests the rest
+        data = df.to_csv(index=False, header=not os.path.exists(self.journal)).encode()
+        with open(self.journal, "ab") as f:
+            f.write(data)
+        self._journal_hash.update(data)
+
+        # Readings of unnamed devices go under the journal's name, as a rebuild would
+        device = os.path.splitext(JOURNAL_FILE)[0]
+        self._seen_keys, new_rows = ingest_readings(df, self.store_dir, self._seen_keys, device)
+
+        manifest_file = manifest_path(self.store_dir)
+        manifest = load_manifest(manifest_file)
+        key = os.path.normpath(self.journal)
+        stat = os.stat(self.journal)
+        previous_rows = manifest["files"].get(key, {}).get("rows", 0)
+        manifest["files"][key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": self._journal_hash.hexdigest(),
+            "rows": previous_rows + len(df)
+        }
+        save_manifest(manifest, manifest_file)
+        self._store_version = store_version(self.store_dir)
+        return new_rows
+
+    # --- Event loop side ---
+
+    async def _compact_loop(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            # Takes the store lock per partition, so commits go on in between
+            try:
+                await asyncio.to_thread(maintain_store, self.store_dir, self.raw_days, self.minute_days)
+            except OSError as e:
+                print(f"Compaction failed, retrying in {self.compact_interval} s: {e}")
+            else:
+                self.compactions += 1
+
+    async def _commit_loop(self):
+        while True:
+            await self._wakeup.wait()
+            if self.pending_rows < self.commit_rows:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.commit_interval)
+                except asyncio.TimeoutError:
+                    pass
+            # Shielded so shutting down never abandons a commit halfway
+            self._committing = asyncio.create_task(self._commit_batch())
+            await asyncio.shield(self._committing)
+
+    async def _commit_batch(self):
+        batch, self._batch = self._batch, []
+        self._wakeup.clear()
+        self._full.clear()
+        if not batch:
+            return
+
+        rows = sum(upload_rows for _, _, _, upload_rows, _ in batch)
+        try:
+            errors = await asyncio.to_thread(self._commit, [
+                (body, kind, device) for body, kind, device, _, _ in batch
+            ])
+        except Exception as e:
+            for _, _, _, _, done in batch:
+                done.set_exception(e)
+        else:
+            self.commits += 1
+            for position, (_, _, _, upload_rows, done) in enumerate(batch):
+                if position in errors:
+                    done.set_exception(errors[position])
+                else:
+                    self.committed_rows += upload_rows
+                    done.set_result(None)
+        finally:
+            self.pending_rows -= rows
+
+    async def _accept_upload(self, headers, body):
+        if self.pending_rows >= self.max_pending_rows:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Ingestion queue is full, retry later"}, {
+                "Retry-After": RETRY_AFTER_SECONDS
+            }
+
+        # Parsing is left to the commit, which parses the whole group at once
+        content_type = headers.get("content-type", "")
+        device = headers.get("x-device-id") or None
+        rows = count_rows(body, content_type)
+        if not rows:
+            return HTTPStatus.OK, {"accepted": 0}, None
+
+        done = asyncio.get_running_loop().create_future()
+        self._batch.append((body, content_type, device, rows, done))
+        self.pending_rows += rows
+        self._wakeup.set()
+        if self.pending_rows >= self.commit_rows:
+            self._full.set()
+
+        try:
+            await done
+        except RequestError as e:
+            return e.status, {"error": str(e)}, None
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Commit failed: {e}"}, None
+        return HTTPStatus.OK, {"accepted": rows}, None
+
+    async def _route(self, method, path, headers, body):
+        if path == "/readings" and method == "POST":
+            return await self._accept_upload(headers, body)
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, {
+                "pending_rows": self.pending_rows,
+                "committed_rows": self.committed_rows,
+                "commits": self.commits,
+                "compactions": self.compactions,
+                "rejected": self.rejected
+            }, None
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}, None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    status, payload, extra = await self._route(method, path, headers, body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                except RequestError as e:
+                    # The rest of the stream can't be trusted after a bad request
+                    status, payload, extra, keep_alive = e.status, {"error": str(e)}, None, False
+
+                _write_response(writer, status, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cancelled connections are just closed when the server shuts down
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Serves until cancelled, then commits whatever is still queued."""
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        await asyncio.to_thread(self._open_store)
+
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        committer = asyncio.create_task(self._commit_loop())
+        compactor = asyncio.create_task(self._compact_loop()) if self.compact_interval else None
+        print(f"Accepting readings on http://{host}:{port}/readings")
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            committer.cancel()
+            if compactor is not None:
+                compactor.cancel()
+            if self._committing is not None:
+                await self._committing
+            await self._commit_batch()
+
+
+def serve(data_folder="data", store_dir=STORE_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    """Runs the ingestion server until interrupted."""
+    try:
+        asyncio.run(IngestServer(data_folder, store_dir, **options).run(host, port))
+    except KeyboardInterrupt:
+        print("Ingestion server stopped")
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,437 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.analyzer import QUALITY_LABELS, quality_codes
+from src.anomaly import DEFAULT_DEVICE, NETWORK_RANKS
+from src.schema import runs
+from src.store import STORE_DIR
+
+# Sessions, coverage dwell time and handovers per device, derived at ingest.
+#
+# A device's serving readings (one per timestamp: the best network, then the
+# strongest cell) are cut into sessions wherever two readings are more than
+# SESSION_GAP_SECONDS apart. Within a session the readings are run-length
+# encoded on (network type, quality class, location), and every reading
+# accounts for the time until the next one, so dwell per state is a sum and a
+# session lasts from its first reading to its last. A handover is a change of
+# network type between consecutive readings of a session, both on a known
+# network (see NETWORK_RANKS); dropping to "No Signal" ends a run, not a
+# handover.
+#
+# Each batch is one vectorized pass over its readings sorted by device and
+# time, seeded with the last reading of every device it has seen before, so
+# runs, sessions and dwell continue exactly across batches. Batches are
+# expected in time order per device; readings at or before a device's last
+# one are ignored.
+#
+# Tables appended per batch, partitioned by day:
+#   spans      Device_ID, session, start, end, readings, seconds
+#              (a session's slice of a batch; load_sessions merges them)
+#   dwell      hour, Device_ID, Network_Type, Signal_Quality, Location,
+#              seconds, readings, runs (run starts, so seconds / runs is the mean run)
+#   handovers  Timestamp, Device_ID, Location, session, from_network, to_network
+
+# Readings further apart than this belong to different sessions
+SESSION_GAP_SECONDS = 60
+
+SESSION_TABLES = ("spans", "dwell", "handovers")
+SPAN_COLUMNS = ["Device_ID", "session", "start", "end", "readings", "seconds"]
+DWELL_COLUMNS = ["hour", "Device_ID", "Network_Type", "Signal_Quality", "Location", "seconds", "readings", "runs"]
+HANDOVER_COLUMNS = ["Timestamp", "Device_ID", "Location", "session", "from_network", "to_network"]
+# Keys handover_rates can group by; both the handovers and the dwell have them
+RATE_KEYS = ["Device_ID", "Location"]
+
+_HOUR_NS = 3600 * 10**9
+
+
+def sessions_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "sessions")
+
+
+def clear_sessions(store_dir=STORE_DIR):
+    shutil.rmtree(sessions_path(store_dir), ignore_errors=True)
+
+
+def empty_tables():
+    return {
+        "spans": pd.DataFrame({
+            "Device_ID": pd.Series(dtype=object),
+            "session": pd.Series(dtype="int64"),
+            "start": pd.Series(dtype="datetime64[ns]"),
+            "end": pd.Series(dtype="datetime64[ns]"),
+            "readings": pd.Series(dtype="int64"),
+            "seconds": pd.Series(dtype="float64")
+        }),
+        "dwell": pd.DataFrame({
+            "hour": pd.Series(dtype="datetime64[ns]"),
+            **{column: pd.Series(dtype=object) for column in DWELL_COLUMNS[1:5]},
+            "seconds": pd.Series(dtype="float64"),
+            "readings": pd.Series(dtype="int64"),
+            "runs": pd.Series(dtype="int64")
+        }),
+        "handovers": pd.DataFrame({
+            "Timestamp": pd.Series(dtype="datetime64[ns]"),
+            "Device_ID": pd.Series(dtype=object),
+            "Location": pd.Series(dtype=object),
+            "session": pd.Series(dtype="int64"),
+            "from_network": pd.Series(dtype=object),
+            "to_network": pd.Series(dtype=object)
+        })
+    }
+
+
+def _categorical(values, rows):
+    if isinstance(values, str):
+        return pd.Categorical.from_codes(np.zeros(rows, dtype="int8"), categories=[values])
+    return pd.Categorical(values)
+
+
+def _device_categorical(df, device):
+    if "Device_ID" not in df.columns:
+        return _categorical(device, len(df))
+    # Device names are compared as strings, without converting every value
+    devices = pd.Categorical(df["Device_ID"])
+    return devices.rename_categories(devices.categories.astype(str))
+
+
+def _extended(categorical, extra):
+    """
+    Codes of a categorical and of extra values, over its categories plus the
+    extra values it lacks. Returns (codes, extra codes, names) where names[-1]
+    is None, so names[codes] maps missing values (-1) to None.
+    """
+    categories = categorical.categories
+    missing = pd.Index([value for value in extra if value is not None], dtype=object).difference(categories)
+    categories = categories.astype(object).append(missing)
+    extra_codes = categories.get_indexer(pd.Index(extra, dtype=object)) if len(extra) else np.empty(0, "int64")
+    names = np.append(categories.to_numpy(dtype=object), None)
+    return categorical.codes.astype("int32"), extra_codes.astype("int32"), names
+
+
+class SessionTracker:
+    """
+    Incremental sessionization: per device, the last reading seen (time,
+    network, quality, location) and the id of its session, so memory stays
+    constant per device and no batch looks back at earlier readings.
+    """
+
+    def __init__(self, state=None):
+        self.devices = (state or {}).get("devices", {})
+
+    def state(self):
+        """JSON-serializable tracker state, see load_tracker/save_tracker."""
+        return {"devices": self.devices}
+
+    def update(self, df, device=DEFAULT_DEVICE):
+        """
+        Sessionizes a batch of normalized readings (attributed to `device`
+        unless they have a Device_ID column). Returns a dict with the batch's
+        spans, dwell and handovers tables.
+        """
+        devices, times, networks, locations, quality = self._serving_readings(df, device)
+        if not len(times):
+            return empty_tables()
+
+        # Place the last reading of every known device before its readings
+        device_names = np.asarray(devices.categories, dtype=object)
+        device_codes = devices.codes
+        starts, lengths = runs(device_codes)
+        keys = device_names[device_codes[starts]]
+        seeds = [self.devices.get(key) for key in keys]
+        seeded = np.array([seed is not None for seed in seeds])
+        seeds = [seed for seed in seeds if seed is not None]
+
+        rows = np.arange(len(times)) + np.repeat(np.cumsum(seeded), lengths)
+        seed_rows = rows[starts[seeded]] - 1
+        size = len(times) + len(seeds)
+
+        network_codes, seed_networks, network_names = _extended(networks, [seed["network"] for seed in seeds])
+        location_codes, seed_locations, location_names = _extended(locations, [seed["location"] for seed in seeds])
+
+        device = np.empty(size, dtype=device_codes.dtype)
+        device[rows], device[seed_rows] = device_codes, device_codes[starts[seeded]]
+        t = np.empty(size, dtype="int64")
+        t[rows], t[seed_rows] = times, [seed["last"] for seed in seeds]
+        network = np.empty(size, dtype="int32")
+        network[rows], network[seed_rows] = network_codes, seed_networks
+        location = np.empty(size, dtype="int32")
+        location[rows], location[seed_rows] = location_codes, seed_locations
+        quality_code = np.empty(size, dtype="int8")
+        quality_code[rows], quality_code[seed_rows] = quality, [seed["quality"] for seed in seeds]
+        is_seed = np.zeros(size, dtype=bool)
+        is_seed[seed_rows] = True
+
+        # continues[i]: row i + 1 is in the same session as row i
+        gaps = np.diff(t)
+        continues = (device[1:] == device[:-1]) & (gaps <= SESSION_GAP_SECONDS * 10**9)
+        session_start = np.r_[True, ~continues]
+        dwell = np.r_[np.where(continues, gaps, 0), 0]
+
+        # Session ids count up per device from where its last batch stopped
+        device_starts, device_lengths = runs(device)
+        first_session = np.array([self.devices[name]["session"] if name in self.devices else 0
+                                  for name in device_names[device[device_starts]]], dtype="int64")
+        opened = np.cumsum(session_start)
+        session = opened + np.repeat(first_session - opened[device_starts], device_lengths)
+
+        changed = (network[1:] != network[:-1]) | (quality_code[1:] != quality_code[:-1]) | \
+            (location[1:] != location[:-1])
+        run_start = np.r_[True, ~continues | changed] & ~is_seed
+
+        ranked = np.append(
+            pd.Index(network_names[:-1]).map(lambda name: name in NETWORK_RANKS).to_numpy(dtype=bool), False
+        )
+        handover = np.r_[False, continues & (network[1:] != network[:-1]) & ranked[network[1:]] & ranked[network[:-1]]]
+
+        tables = {
+            "spans": self._spans(device_names, device, t, session, session_start, is_seed, dwell),
+            "dwell": self._dwell(device_names, network_names, location_names, device, t, network, quality_code,
+                                 location, run_start, is_seed, dwell),
+            "handovers": pd.DataFrame({
+                "Timestamp": pd.to_datetime(t[handover]),
+                "Device_ID": device_names[device[handover]],
+                "Location": location_names[location[handover]],
+                "session": session[handover],
+                "from_network": network_names[network[np.flatnonzero(handover) - 1]],
+                "to_network": network_names[network[handover]]
+            })
+        }
+
+        last_rows = device_starts + device_lengths - 1
+        for row in last_rows:
+            self.devices[device_names[device[row]]] = {
+                "last": int(t[row]),
+                "network": network_names[network[row]],
+                "quality": int(quality_code[row]),
+                "location": location_names[location[row]],
+                "session": int(session[row])
+            }
+        return tables
+
+    def _serving_readings(self, df, device):
+        """
+        The serving reading per device and timestamp, sorted by device and
+        time, without readings at or before a device's last one: (devices,
+        times in ns, networks, locations as categoricals filtered alike,
+        quality codes).
+        """
+        rows = len(df)
+        devices = _device_categorical(df, device)
+        networks = _categorical(df["Network_Type"], rows)
+        locations = _categorical(df["Location"], rows)
+        stamps = df["Timestamp"].to_numpy(dtype="datetime64[ns]")
+        times = stamps.view("int64")
+        signal = df["Signal_dBm"].to_numpy(dtype="float64", na_value=np.nan)
+
+        d, t = devices.codes, times
+        if rows and np.all((d[1:] > d[:-1]) | ((d[1:] == d[:-1]) & (t[1:] > t[:-1]))):
+            # Already in order with one reading per timestamp, as most exports are
+            order = np.arange(rows)
+        else:
+            names = np.asarray(networks.categories, dtype=object)
+            rank = np.append(np.array([NETWORK_RANKS.get(name, 0) for name in names], dtype="int8"), 0)
+            order = np.lexsort((np.nan_to_num(signal, nan=-np.inf), rank[networks.codes], times, devices.codes))
+
+        last = np.array([self.devices.get(name, {}).get("last", np.iinfo("int64").min)
+                         for name in np.asarray(devices.categories, dtype=object)], dtype="int64")
+        order = order[~np.isnat(stamps[order]) & (times[order] > last[devices.codes[order]])]
+        # The last row of every (device, timestamp) is its serving reading
+        d, t = devices.codes[order], times[order]
+        order = order[np.r_[(d[1:] != d[:-1]) | (t[1:] != t[:-1]), True]] if len(order) else order
+
+        return (devices[order], times[order], networks[order], locations[order],
+                quality_codes(signal[order]))
+
+    @staticmethod
+    def _spans(device_names, device, t, session, session_start, is_seed, dwell):
+        starts = np.flatnonzero(session_start)
+        ends = np.r_[starts[1:], len(t)] - 1
+        spans = pd.DataFrame({
+            "Device_ID": device_names[device[starts]],
+            "session": session[starts],
+            "start": pd.to_datetime(t[starts]),
+            "end": pd.to_datetime(t[ends]),
+            "readings": np.add.reduceat((~is_seed).astype("int64"), starts),
+            "seconds": np.add.reduceat(dwell, starts) / 1e9
+        })
+        # A seed followed by a gap only closes the previous batch's session
+        return spans[spans["readings"] > 0].reset_index(drop=True)
+
+    @staticmethod
+    def _dwell(device_names, network_names, location_names, device, t, network, quality_code, location, run_start,
+               is_seed, dwell):
+        # Rows are cut into segments of one state within one hour, which
+        # shrinks the table to group to a fraction of the readings
+        hour = t - t % _HOUR_NS
+        cut = np.r_[True, (device[1:] != device[:-1]) | (network[1:] != network[:-1]) |
+                    (quality_code[1:] != quality_code[:-1]) | (location[1:] != location[:-1]) |
+                    (hour[1:] != hour[:-1])] | run_start
+        starts = np.flatnonzero(cut)
+        segments = pd.DataFrame({
+            "hour": hour[starts],
+            "device": device[starts],
+            "network": network[starts],
+            "quality": quality_code[starts],
+            "location": location[starts],
+            "seconds": np.add.reduceat(dwell, starts) / 1e9,
+            "readings": np.add.reduceat((~is_seed).astype("int64"), starts),
+            "runs": np.add.reduceat(run_start.astype("int64"), starts)
+        })
+        segments = segments[(segments["seconds"] > 0) | (segments["readings"] > 0)]
+        grouped = segments.groupby(["hour", "device", "network", "quality", "location"], sort=True).sum()
+        keys = grouped.index
+        return pd.DataFrame({
+            "hour": pd.to_datetime(keys.get_level_values("hour").to_numpy()),
+            "Device_ID": device_names[keys.get_level_values("device").to_numpy()],
+            "Network_Type": network_names[keys.get_level_values("network").to_numpy()],
+            "Signal_Quality": np.asarray(QUALITY_LABELS, dtype=object)[keys.get_level_values("quality").to_numpy()],
+            "Location": location_names[keys.get_level_values("location").to_numpy()],
+            "seconds": grouped["seconds"].to_numpy(),
+            "readings": grouped["readings"].to_numpy(),
+            "runs": grouped["runs"].to_numpy()
+        })
+
+
+def load_tracker(store_dir=STORE_DIR):
+    """Restores the tracker state saved alongside a store, or starts fresh."""
+    try:
+        with open(os.path.join(sessions_path(store_dir), "state.json")) as f:
+            return SessionTracker(json.load(f))
+    except (OSError, ValueError):
+        return SessionTracker()
+
+
+def save_tracker(tracker, store_dir=STORE_DIR):
+    path = os.path.join(sessions_path(store_dir), "state.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(tracker.state(), f)
+    os.replace(tmp_path, path)
+
+
+def save_sessions(updates, store_dir=STORE_DIR):
+    """Appends the tables of one or more tracker updates to the store, partitioned by day."""
+    day_columns = {"spans": "start", "dwell": "hour", "handovers": "Timestamp"}
+    for name in SESSION_TABLES:
+        frames = [update[name] for update in updates if not update[name].empty]
+        if not frames:
+            continue
+        table = pd.concat(frames, ignore_index=True)
+        if name == "dwell":
+            # Chunks of one export share most of their hours and states
+            table = table.groupby(DWELL_COLUMNS[:5], sort=False, as_index=False, dropna=False).sum()
+        day = table[day_columns[name]].dt.strftime("%Y-%m-%d")
+        table.assign(day=day).to_parquet(
+            os.path.join(sessions_path(store_dir), name),
+            engine="pyarrow",
+            compression="zstd",
+            partition_cols=["day"],
+            index=False
+        )
+
+
+def _load_table(name, store_dir, start, end, time_column, filters=()):
+    path = os.path.join(sessions_path(store_dir), name)
+    if not os.path.isdir(path):
+        return empty_tables()[name]
+
+    filters = list(filters)
+    if start is not None:
+        filters.append(("day", ">=", pd.Timestamp(start).strftime("%Y-%m-%d")))
+    if end is not None:
+        filters.append(("day", "<=", pd.Timestamp(end).strftime("%Y-%m-%d")))
+    columns = {"spans": SPAN_COLUMNS, "dwell": DWELL_COLUMNS, "handovers": HANDOVER_COLUMNS}[name]
+    table = pd.read_parquet(path, engine="pyarrow", filters=filters or None)[columns]
+    if start is not None:
+        table = table[table[time_column] >= pd.Timestamp(start)]
+    if end is not None:
+        table = table[table[time_column] < pd.Timestamp(end)]
+    return table.reset_index(drop=True)
+
+
+def load_sessions(store_dir=STORE_DIR, start=None, end=None, devices=None):
+    """
+    Sessions that started inside [start, end), optionally of some devices:
+    Device_ID, session, start, end, readings and seconds (end - start).
+    """
+    filters = [("Device_ID", "in", list(devices))] if devices else ()
+    # A session's spans can start on earlier days than the range, so read from its start
+    spans = _load_table("spans", store_dir, None, end, "start", filters)
+    sessions = spans.groupby(["Device_ID", "session"], as_index=False).agg(
+        start=("start", "min"), end=("end", "max"), readings=("readings", "sum"), seconds=("seconds", "sum")
+    )
+    if start is not None:
+        sessions = sessions[sessions["start"] >= pd.Timestamp(start)]
+    return sessions.sort_values(["start", "Device_ID"], kind="stable").reset_index(drop=True)
+
+
+def load_dwell(store_dir=STORE_DIR, start=None, end=None, by=("Network_Type", "Signal_Quality"), devices=None):
+    """
+    Time spent per state in the hours inside [start, end), optionally of some
+    devices, summed over the `by` columns: seconds, share of the total,
+    readings, runs and the mean run length in seconds.
+    """
+    by = list(by)
+    unknown = sorted(set(by) - set(DWELL_COLUMNS[:5]))
+    if unknown:
+        raise ValueError(f"Can't group dwell time by {', '.join(unknown)}")
+    filters = [("Device_ID", "in", list(devices))] if devices else ()
+    dwell = _load_table("dwell", store_dir, start, end, "hour", filters)
+    columns = ["seconds", "readings", "runs"]
+    if by:
+        summary = dwell.groupby(by, as_index=False, dropna=False)[columns].sum()
+    else:
+        summary = pd.DataFrame({column: [dwell[column].sum()] for column in columns})
+    total = summary["seconds"].sum()
+    summary["share"] = summary["seconds"] / total if total else np.nan
+    summary["mean_run_seconds"] = summary["seconds"] / summary["runs"].where(summary["runs"] > 0)
+    return summary.sort_values("seconds", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def load_handovers(store_dir=STORE_DIR, start=None, end=None, devices=None):
+    """Handovers inside [start, end), optionally of some devices, in time order."""
+    filters = [("Device_ID", "in", list(devices))] if devices else ()
+    handovers = _load_table("handovers", store_dir, start, end, "Timestamp", filters)
+    return handovers.sort_values("Timestamp", kind="stable").reset_index(drop=True)
+
+
+def handover_rates(store_dir=STORE_DIR, start=None, end=None, by=("Device_ID",), devices=None):
+    """
+    Handovers per `by` key (Device_ID and/or Location) inside [start, end),
+    optionally of some devices: handovers, those between LTE and NR (either
+    way), hours of session time and handovers per hour. An empty `by` gives
+    the total.
+    """
+    by = list(by)
+    unknown = sorted(set(by) - set(RATE_KEYS))
+    if unknown:
+        raise ValueError(f"Handover rates can only be grouped by {', '.join(RATE_KEYS)}")
+
+    handovers = load_handovers(store_dir, start, end, devices)
+    from_rank = handovers["from_network"].map(NETWORK_RANKS)
+    to_rank = handovers["to_network"].map(NETWORK_RANKS)
+    lte_nr = ((from_rank == 3) & (to_rank == 4)) | ((from_rank == 4) & (to_rank == 3))
+    counts = handovers.assign(handovers=1, lte_nr=lte_nr.astype("int64"))
+    filters = [("Device_ID", "in", list(devices))] if devices else ()
+    dwell = _load_table("dwell", store_dir, start, end, "hour", filters)
+
+    if by:
+        counts = counts.groupby(by, dropna=False)[["handovers", "lte_nr"]].sum()
+        hours = dwell.groupby(by, dropna=False)["seconds"].sum() / 3600
+        rates = hours.rename("hours").to_frame().join(counts, how="outer")
+    else:
+        rates = pd.DataFrame({
+            "hours": [dwell["seconds"].sum() / 3600],
+            "handovers": [len(counts)],
+            "lte_nr": [int(counts["lte_nr"].sum())]
+        })
+    rates[["handovers", "lte_nr"]] = rates[["handovers", "lte_nr"]].fillna(0).astype("int64")
+    rates["hours"] = rates["hours"].fillna(0.0)
+    rates["per_hour"] = rates["handovers"] / rates["hours"].where(rates["hours"] > 0)
+    rates = rates.reset_index() if by else rates
+    return rates.sort_values("handovers", ascending=False, kind="stable").reset_index(drop=True)[
+        [*by, "handovers", "lte_nr", "hours", "per_hour"]
+    ]
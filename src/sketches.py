@@ -0,0 +1,222 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Quantile sketches are kept per time bucket x network type, finest first;
+# each level is derived from the one before it
+SKETCH_FREQS = {
+    "1h": "1h",
+    "1d": "1D"
+}
+SKETCH_KEYS = ["bucket", "Network_Type", "metric"]
+SKETCH_METRICS = ["Signal_dBm", "Download_Mbps", "Upload_Mbps", "Latency_ms"]
+SKETCH_QUANTILES = {"p5": 0.05, "p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+# Relative accuracy of the sketches (DDSketch-style logarithmic bins): every
+# quantile is within RELATIVE_ACCURACY of the exact one, e.g. +-0.5 dB at
+# -100 dBm or +-1 ms at 200 ms, whatever the data or the number of merges
+RELATIVE_ACCURACY = 0.005
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = np.log(GAMMA)
+
+# Values closer to zero than this share bin 0 and are reported as 0
+MIN_VALUE = 1e-3
+# Shifts bin indexes (log base GAMMA of the magnitude) so they are positive;
+# the sign of a bin key is the sign of its values
+KEY_OFFSET = 2048
+# Bound on |key| (magnitudes up to GAMMA ** (KEY_RANGE - KEY_OFFSET), ~5e26)
+KEY_RANGE = 1 << 13
+
+
+def sketches_path(store_dir, name=None):
+    path = os.path.join(store_dir, "sketches")
+    return os.path.join(path, name) if name else path
+
+
+def clear_sketches(store_dir):
+    shutil.rmtree(sketches_path(store_dir), ignore_errors=True)
+
+
+def sketch_keys(values):
+    """
+    Bin keys for values. A value v with |v| in (GAMMA**(i-1), GAMMA**i] goes
+    to key sign(v) * (i + KEY_OFFSET); keys are ordered like their values.
+    """
+    values = np.asarray(values, dtype="float64")
+    magnitude = np.abs(values)
+    indexable = magnitude >= MIN_VALUE
+    index = np.ceil(np.log(np.where(indexable, magnitude, 1.0)) / LOG_GAMMA) + KEY_OFFSET
+    index = np.minimum(index, KEY_RANGE)
+    return np.where(indexable, np.sign(values) * index, 0).astype("int32")
+
+
+def key_values(keys):
+    """Representative value of each bin, within RELATIVE_ACCURACY of all values in it."""
+    keys = np.asarray(keys, dtype="float64")
+    magnitude = 2 * np.power(GAMMA, np.abs(keys) - KEY_OFFSET) / (GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * magnitude)
+
+
+def compute_sketch(df, freq):
+    """
+    Sketches readings into one row per time bucket x network type x metric x
+    non-empty bin holding the number of values in that bin.
+    """
+    bucket_codes, buckets = pd.factorize(df["Timestamp"].dt.floor(freq), use_na_sentinel=False)
+    networks = pd.Categorical(df["Network_Type"])
+    n_networks = max(len(networks.categories), 1)
+    # Network codes are -1 for missing types; shift so every code is >= 0
+    group_codes = bucket_codes.astype("int64") * (n_networks + 1) + networks.codes + 1
+
+    # One integer per (bucket, network type, metric, bin) so grouping is a
+    # single np.unique rather than a four-column groupby
+    key_span = 2 * KEY_RANGE + 1
+    codes = []
+    for metric_code, metric in enumerate(SKETCH_METRICS):
+        values = df[metric].to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(values)
+        keys = sketch_keys(values[present]).astype("int64") + KEY_RANGE
+        codes.append((group_codes[present] * len(SKETCH_METRICS) + metric_code) * key_span + keys)
+    unique, counts = np.unique(np.concatenate(codes), return_counts=True)
+
+    groups = unique // key_span
+    network_codes = groups // len(SKETCH_METRICS) % (n_networks + 1) - 1
+    return pd.DataFrame({
+        "bucket": buckets.take(groups // len(SKETCH_METRICS) // (n_networks + 1)),
+        "Network_Type": pd.Categorical.from_codes(network_codes, networks.categories),
+        "metric": pd.Categorical.from_codes(groups % len(SKETCH_METRICS), SKETCH_METRICS),
+        "key": (unique % key_span - KEY_RANGE).astype("int32"),
+        "count": counts.astype("int64")
+    })
+
+
+def _group(work):
+    # Keep missing timestamps as their own bucket instead of dropping readings
+    sketch = work.groupby(SKETCH_KEYS + ["key"], observed=True, dropna=False, sort=True)["count"].sum()
+    sketch = sketch.reset_index()
+    return sketch.astype({"Network_Type": "category", "metric": "category"})
+
+
+def merge_sketches(frames):
+    """Combines sketches (e.g. from different batches or partitions) into one."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    return _group(pd.concat(frames, ignore_index=True))
+
+
+def compute_sketches(df):
+    """
+    Returns {name: sketch} for every configured bucket width. Only the finest
+    level is sketched from the readings; coarser ones re-bucket it, which is
+    lossless because bins don't depend on the bucket.
+    """
+    sketches = {}
+    previous = None
+    for name, freq in SKETCH_FREQS.items():
+        if previous is None:
+            previous = compute_sketch(df, freq)
+        else:
+            previous = _group(previous.assign(bucket=previous["bucket"].dt.floor(freq)))
+        sketches[name] = previous
+    return sketches
+
+
+def _day_file(store_dir, name, day):
+    return os.path.join(sketches_path(store_dir, name), f"day={day}", "sketch.parquet")
+
+
+def update_sketches(store_dir, sketches):
+    """
+    Merges freshly computed sketches into the stored ones, one file per day
+    so only the days touched by new readings are rewritten.
+    """
+    for name, sketch in sketches.items():
+        if sketch is None or sketch.empty:
+            continue
+
+        days = sketch["bucket"].dt.strftime("%Y-%m-%d").fillna("unknown")
+        for day, delta in sketch.groupby(days.to_numpy(), sort=False):
+            path = _day_file(store_dir, name, day)
+            if os.path.exists(path):
+                delta = merge_sketches([pd.read_parquet(path), delta])
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            delta.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+            os.replace(tmp_path, path)
+
+
+def load_sketches(store_dir, start=None, end=None, network_types=None, name=None):
+    """
+    Loads the sketches of buckets starting in [start, end), from the daily
+    level when both bounds fall on midnight and the hourly one otherwise, so
+    ranges are answered to the hour. Returns None when nothing is sketched.
+    """
+    bounds = [pd.Timestamp(t) for t in (start, end) if t is not None]
+    name = name or ("1d" if all(t == t.floor("1D") for t in bounds) else "1h")
+    path = sketches_path(store_dir, name)
+    if not os.path.isdir(path):
+        return None
+
+    filters = []
+    if start is not None:
+        filters.append(("day", ">=", pd.Timestamp(start).strftime("%Y-%m-%d")))
+    if end is not None:
+        filters.append(("day", "<=", pd.Timestamp(end).strftime("%Y-%m-%d")))
+    if network_types:
+        filters.append(("Network_Type", "in", list(network_types)))
+
+    sketch = pd.read_parquet(path, engine="pyarrow", filters=filters or None).drop(columns="day")
+    if start is not None:
+        sketch = sketch[sketch["bucket"] >= pd.Timestamp(start)]
+    if end is not None:
+        sketch = sketch[sketch["bucket"] < pd.Timestamp(end)]
+    return sketch
+
+
+def sketch_quantiles(sketch, by=("metric",), quantiles=SKETCH_QUANTILES):
+    """
+    Quantiles per group of `by` (default: per metric, over every bucket and
+    network type in the sketch). Each is the representative value of the bin
+    holding the inverted-CDF quantile, so it is within RELATIVE_ACCURACY of
+    np.quantile(values, q, method="inverted_cdf") on the raw readings.
+    """
+    by = list(by)
+    merged = sketch.groupby(by + ["key"], observed=True, sort=True)["count"].sum().reset_index()
+    merged = merged[merged["count"] > 0]
+    if merged.empty:
+        return pd.DataFrame(columns=by + ["count", *quantiles]).set_index(by)
+
+    group_ids = merged.groupby(by, observed=True, sort=False).ngroup().to_numpy()
+    counts = merged["count"].to_numpy()
+    values = key_values(merged["key"].to_numpy())
+    totals = np.bincount(group_ids, weights=counts)
+    cumulative = np.cumsum(counts)
+    group_starts = np.r_[0, np.flatnonzero(np.diff(group_ids)) + 1]
+    offsets = np.r_[0, cumulative[group_starts[1:] - 1]]
+
+    result = merged.iloc[group_starts][by].reset_index(drop=True)
+    result["count"] = totals.astype("int64")
+    for label, q in quantiles.items():
+        # Rows are grouped and ordered by key, i.e. by value, so the global
+        # cumulative count finds each group's quantile bin at once
+        targets = offsets + np.maximum(np.ceil(q * totals), 1)
+        result[label] = values[np.searchsorted(cumulative, targets, side="left")]
+    return result.set_index(by)
+
+
+def exact_quantiles(df, quantiles=SKETCH_QUANTILES):
+    """Exact per-metric quantiles of in-memory readings, shaped like sketch_quantiles."""
+    rows = []
+    for metric in SKETCH_METRICS:
+        values = df[metric].to_numpy(dtype="float64", na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            continue
+        estimates = np.quantile(values, list(quantiles.values()), method="inverted_cdf")
+        rows.append({"metric": metric, "count": len(values), **dict(zip(quantiles, estimates))})
+    return pd.DataFrame(rows, columns=["metric", "count", *quantiles]).set_index("metric")
@@ -0,0 +1,115 @@
+import glob
+import os
+from src.anomaly import anomalies_path
+from src.leaderboard import leaderboard_path
+from src.rollups import ROLLUP_FREQS, rollups_path
+from src.sessions import SESSION_TABLES, sessions_path
+from src.store import STORE_DIR, readings_path
+
+try:
+    import duckdb
+except ImportError:  # optional: ad-hoc SQL needs `pip install duckdb`
+    duckdb = None
+
+# Ad-hoc SQL over the store. Every table is a DuckDB view over the store's
+# Parquet files, so nothing is copied or loaded up front and new files show
+# up in the next query. Filters are pushed into the scans: predicates on the
+# readings' Device_ID and day partition columns skip whole directories, and
+# Parquet min/max statistics skip row groups on Timestamp (readings are
+# written sorted by it), so filtered queries read a fraction of a large
+# store. Adding a `day` predicate to a Timestamp range saves opening the
+# files of other days at all. File footers are cached per connection, so
+# callers running many queries keep one connection (the dashboard keeps one
+# per store version) and pass it in; queries run on cursors of their own, so
+# threads can share it. Connections can only read the store's own files: no
+# other local files or URLs through read_csv()/read_text()/COPY, and the
+# setting is locked against SET. Once old data has expired (see
+# src.compaction), readings and rollups_1m only go back to the first days
+# kept in retention.json; rollups_1h and rollups_1d cover everything.
+#
+# Tables:
+#   readings             Timestamp, Network_Type, Signal_dBm, Location, ..., Device_ID, day
+#   rollups_1m/1h/1d     per bucket, Network_Type and Location: rows, <metric>_sum/_count/_min/_max, quality_*
+#   anomalies            Timestamp, Device_ID, Network_Type, kind, value, baseline, detail, day
+#   locations            leaderboard index: per Location and Network_Type signal count, mean, percentiles
+#   session_spans        Device_ID, session, start, end, readings, seconds, day (a session's slice of an
+#                        ingested batch; group by Device_ID and session for whole sessions)
+#   dwell                per hour, Device_ID, Network_Type, Signal_Quality and Location: seconds, readings, runs
+#   handovers            Timestamp, Device_ID, Location, session, from_network, to_network, day
+
+# Rows fetched for people to read (CLI tables, dashboard); None fetches everything
+DEFAULT_LIMIT = 1000
+
+EXAMPLE_QUERY = """SELECT hour(Timestamp) AS hour, Network_Type, count(*) AS readings,
+       round(avg(Signal_dBm), 1) AS avg_signal
+FROM readings
+WHERE day >= DATE '2025-01-01' AND Timestamp >= TIMESTAMP '2025-01-01'
+GROUP BY ALL
+ORDER BY hour, Network_Type"""
+
+
+def table_sources(store_dir=STORE_DIR):
+    """Parquet glob of every table the store currently has files for."""
+    sources = {"readings": os.path.join(readings_path(store_dir), "*", "*", "*.parquet")}
+    for name in ROLLUP_FREQS:
+        sources[f"rollups_{name}"] = os.path.join(rollups_path(store_dir, name), "*", "rollup.parquet")
+    sources["anomalies"] = os.path.join(anomalies_path(store_dir), "events", "*", "*.parquet")
+    sources["locations"] = os.path.join(leaderboard_path(store_dir, "index"), "*.parquet")
+    for name in SESSION_TABLES:
+        table = "session_spans" if name == "spans" else name
+        sources[table] = os.path.join(sessions_path(store_dir), name, "*", "*.parquet")
+    return {name: path for name, path in sources.items() if glob.glob(path)}
+
+
+def connect(store_dir=STORE_DIR):
+    """
+    An in-memory DuckDB connection with a view per table of the store that
+    can't access any files outside the store.
+    """
+    if duckdb is None:
+        raise ImportError("SQL queries need DuckDB: pip install duckdb")
+    con = duckdb.connect()
+    con.execute("SET parquet_metadata_cache = true")
+    for name, path in table_sources(store_dir).items():
+        path = path.replace("'", "''")
+        # Device IDs stay text even where every one of them looks like a number
+        types = ", hive_types = {'Device_ID': VARCHAR}" if name == "readings" else ""
+        con.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{path}', hive_partitioning = true{types})")
+
+    store = os.path.join(os.path.abspath(store_dir), "").replace("'", "''")
+    con.execute(f"SET allowed_directories = ['{store}']")
+    con.execute("SET enable_external_access = false")
+    con.execute("SET lock_configuration = true")
+    return con
+
+
+def run_query(sql, store_dir=STORE_DIR, params=None, limit=DEFAULT_LIMIT, con=None):
+    """
+    Runs one SELECT (or EXPLAIN) statement against the store and returns the
+    result as a DataFrame of at most `limit` rows. Anything else (writes,
+    settings, several statements) and queries DuckDB rejects raise ValueError.
+    """
+    con = con or connect(store_dir)
+    try:
+        with con.cursor() as cursor:
+            statements = cursor.extract_statements(sql)
+            allowed = (duckdb.StatementType.SELECT, duckdb.StatementType.EXPLAIN)
+            if len(statements) != 1 or statements[0].type not in allowed:
+                raise ValueError("Only a single SELECT or EXPLAIN statement can be run")
+
+            relation = cursor.sql(sql, params=params)
+            if limit is not None and statements[0].type == duckdb.StatementType.SELECT:
+                relation = relation.limit(limit)
+            return relation.df()
+    except duckdb.Error as error:
+        raise ValueError(str(error)) from error
+
+
+def table_columns(store_dir=STORE_DIR, con=None):
+    """{table: [(column, type), ...]} for every table of the store."""
+    con = con or connect(store_dir)
+    with con.cursor() as cursor:
+        return {
+            name: [(row[0], row[1]) for row in cursor.execute(f"DESCRIBE {name}").fetchall()]
+            for name in table_sources(store_dir)
+        }
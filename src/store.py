@@ -0,0 +1,228 @@
+import glob
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+import pandas as pd
+from src.metrics import count, instrument
+from src.schema import compact_readings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+# Derived files live here, away from the raw exports that are globbed as input
+STORE_DIR = "data/store"
+
+# Readings are kept as zstd-compressed Parquet, partitioned by device and day
+# so readers of some devices or dates skip every other directory; within a
+# partition, rows are sorted by time so row-group statistics prune time ranges
+PARTITION_COLS = ["Device_ID", "day"]
+
+READING_DTYPES = {
+    "Device_ID": "category",
+    "Network_Type": "category",
+    "Signal_dBm": "float64",
+    "Location": "category",
+    "Download_Mbps": "float64",
+    "Upload_Mbps": "float64",
+    "Latency_ms": "float64",
+    "Latitude": "float64",
+    "Longitude": "float64"
+}
+
+
+def readings_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "readings")
+
+
+def manifest_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "manifest.json")
+
+
+def retention_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "retention.json")
+
+
+def load_retention(store_dir=STORE_DIR):
+    """
+    The first day still kept at each tier, as Timestamps: "raw_from" for the
+    readings and "minute_from" for the 1-minute rollups. A tier is missing
+    until src.compaction has expired some of it; older data only survives
+    in the coarser tiers.
+    """
+    try:
+        with open(retention_path(store_dir)) as f:
+            return {tier: pd.Timestamp(day) for tier, day in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def clear_retention(store_dir=STORE_DIR):
+    try:
+        os.remove(retention_path(store_dir))
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def store_lock(store_dir=STORE_DIR):
+    """
+    Holds an exclusive lock on the store while writing, so the collector and
+    the ingestion server never interleave writes. Not reentrant.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, ".lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def store_version(store_dir=STORE_DIR):
+    """
+    Returns a token that changes whenever the collector writes to the store,
+    for use as a cache key by readers.
+    """
+    try:
+        return os.stat(manifest_path(store_dir)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def to_store_types(df):
+    """
+    Casts normalized readings to the store schema: native datetimes,
+    categorical labels and float measurements, so every partition file
+    shares one schema.
+    """
+    df = df.astype(READING_DTYPES)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    return df
+
+
+@instrument("store.write_readings")
+def write_readings(df, store_dir=STORE_DIR):
+    """
+    Appends readings to the partitioned store. Each call adds new files to the
+    affected partitions; existing files are never rewritten.
+    """
+    if df.empty:
+        return
+
+    # Sorting keeps row-group timestamp statistics tight for range filters
+    df = df.sort_values("Timestamp", kind="stable")
+    day = df["Timestamp"].dt.strftime("%Y-%m-%d").fillna("unknown")
+    df = df.assign(day=day)
+
+    df.to_parquet(
+        readings_path(store_dir),
+        engine="pyarrow",
+        compression="zstd",
+        partition_cols=PARTITION_COLS,
+        index=False
+    )
+
+
+def clear_readings(store_dir=STORE_DIR):
+    shutil.rmtree(readings_path(store_dir), ignore_errors=True)
+
+
+def list_devices(store_dir=STORE_DIR):
+    """IDs of the devices the store has readings of, from its partition directories."""
+    prefix = f"{PARTITION_COLS[0]}="
+    try:
+        names = os.listdir(readings_path(store_dir))
+    except OSError:
+        return []
+    return sorted(unquote(name[len(prefix):]) for name in names if name.startswith(prefix))
+
+
+def device_files(store_dir, devices):
+    """
+    The readings files of some devices, found by listing just their partition
+    directories (values are escaped in directory names as pyarrow writes them).
+    """
+    path = readings_path(store_dir)
+    return sorted(
+        file for device in devices
+        for file in glob.glob(os.path.join(
+            glob.escape(os.path.join(path, f"{PARTITION_COLS[0]}={quote(str(device), safe='')}")), "*", "*.parquet"
+        ))
+    )
+
+
+@instrument("store.load_readings")
+def load_readings(store_dir=STORE_DIR, columns=None, network_types=None, start=None, end=None, devices=None):
+    """
+    Loads readings from the store in the compact in-memory schema. Only the
+    requested columns are read; device and [start, end) filters prune
+    partitions before any file is opened, and the network type filter is
+    applied as rows are read. With a device filter only those devices'
+    directories are even listed, so the cost doesn't grow with the fleet.
+    """
+    path = readings_path(store_dir)
+    source = path if devices is None else device_files(store_dir, devices)
+    if not os.path.isdir(path) or not source:
+        return compact_readings(pd.DataFrame(columns=columns or ["Timestamp"] + list(READING_DTYPES)))
+
+    filters = []
+    if devices is not None:
+        filters.append(("Device_ID", "in", list(devices)))
+    if network_types is not None:
+        filters.append(("Network_Type", "in", list(network_types)))
+    if start is not None:
+        filters += [("day", ">=", pd.Timestamp(start).strftime("%Y-%m-%d")), ("Timestamp", ">=", pd.Timestamp(start))]
+    if end is not None:
+        filters += [("day", "<=", pd.Timestamp(end).strftime("%Y-%m-%d")), ("Timestamp", "<", pd.Timestamp(end))]
+
+    df = pd.read_parquet(source, engine="pyarrow", columns=columns, filters=filters or None)
+    if "day" in df.columns and (columns is None or "day" not in columns):
+        df = df.drop(columns="day")
+    if "Device_ID" in df.columns and not pd.api.types.is_string_dtype(df["Device_ID"].cat.categories):
+        # Partition values are typed from the directory names, so all-digit IDs come back as numbers
+        df["Device_ID"] = df["Device_ID"].cat.rename_categories(df["Device_ID"].cat.categories.astype(str))
+    count("store.rows_loaded", len(df))
+    return compact_readings(df)
+
+
+def filter_readings(df, network_types=None, start=None, end=None, devices=None):
+    """
+    The readings of an in-memory frame that load_readings would return for
+    the same filters. Raises ValueError when the frame lacks a column a
+    filter needs, rather than leaving it unfiltered.
+    """
+    keep = pd.Series(True, index=df.index)
+    for column, values in (("Device_ID", devices), ("Network_Type", network_types)):
+        if values is not None:
+            keep &= _filter_column(df, column).astype(str).isin([str(value) for value in values])
+    if start is not None or end is not None:
+        timestamps = pd.to_datetime(_filter_column(df, "Timestamp"), errors="coerce")
+        if start is not None:
+            keep &= timestamps >= pd.Timestamp(start)
+        if end is not None:
+            keep &= timestamps < pd.Timestamp(end)
+    return df if keep.all() else df[keep]
+
+
+def _filter_column(df, column):
+    if column not in df.columns:
+        raise ValueError(f"Can't filter the readings by {column}: they have no {column} column")
+    return df[column]
+
+
+def read_dataset(source, columns=None):
+    """
+    Loads readings from either a store directory or a merged CSV file, so the
+    analyzer and visualizer accept both.
+    """
+    if os.path.isdir(source):
+        return load_readings(source, columns)
+
+    df = pd.read_csv(source, usecols=lambda col: columns is None or col in columns)
+    return compact_readings(df)
@@ -0,0 +1,147 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from src.formats import OUTPUT_COLUMNS
+
+# Synthetic fleets for benchmarks and demos: one export per device, readings
+# every `interval` seconds, with network types and locations that persist
+# for a while instead of changing every reading, so downstream grouping,
+# dedup and compression behave as they do on real logs.
+DEFAULT_START = "2025-01-01"
+DEFAULT_INTERVAL = 3.0
+
+NETWORK_MIX = {"LTE": 0.55, "NR": 0.3, "HSPA": 0.1, "EDGE": 0.05}
+# Typical signal per network type (dBm); unknown types get SIGNAL_BASE["other"]
+SIGNAL_BASE = {"NR": -88, "LTE": -95, "HSPA": -100, "EDGE": -105, "other": -100}
+
+# Mean readings before a device changes network type or location
+NETWORK_RUN = 200
+LOCATION_RUN = 1200
+
+# Locations are scattered over this (lat, lon) box
+REGION = ((8.0, 13.0), (74.0, 78.0))
+
+# Header spellings: canonical names, or the older Android logger names the
+# format registry maps through its netpulse-android-v1 entry and aliases
+HEADER_STYLES = {
+    "netpulse": {},
+    "android": {
+        "Network_Type": "NetworkType",
+        "Signal_dBm": "dBm",
+        "Download_Mbps": "Download",
+        "Upload_Mbps": "Upload",
+        "Latency_ms": "Latency",
+        "Latitude": "lat",
+        "Longitude": "lon"
+    }
+}
+
+
+def _runs(rng, rows, mean_run):
+    # Segment number of every reading; a new segment starts with probability 1/mean_run
+    return np.cumsum(rng.random(rows) < 1.0 / mean_run)
+
+
+def generate_device(rows, start=DEFAULT_START, interval=DEFAULT_INTERVAL, network_mix=NETWORK_MIX, locations=50,
+                    seed=0):
+    """
+    Readings of one device in the canonical columns: sticky network type and
+    location, signal around its network type's typical level, throughput
+    and latency that follow the signal, coordinates near the location.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(network_mix)
+    weights = np.asarray(list(network_mix.values()), dtype="float64")
+
+    networks = np.asarray(names, dtype=object)[
+        rng.choice(len(names), rows + 1, p=weights / weights.sum())[_runs(rng, rows, NETWORK_RUN)]
+    ]
+    # Location centers and signal offsets depend on the fleet, not the device
+    sites = np.random.default_rng(locations)
+    centers = np.column_stack([sites.uniform(*REGION[0], locations), sites.uniform(*REGION[1], locations)])
+    offsets = sites.normal(0, 5, locations)
+    location = rng.integers(0, locations, rows + 1)[_runs(rng, rows, LOCATION_RUN)]
+
+    base = np.array([SIGNAL_BASE.get(name, SIGNAL_BASE["other"]) for name in names], dtype="float64")
+    signal = base[pd.Categorical(networks, categories=names).codes] + offsets[location] + rng.normal(0, 6, rows)
+    signal = np.clip(np.round(signal), -140, -44)
+    # 0 (poor) to 1 (excellent) signal factor for throughput and latency
+    strength = np.clip((signal + 120) / 60, 0.05, 1)
+    # One in twenty speed tests fails and reports 0 Mbps
+    failed = rng.random(rows) < 0.05
+    # Devices don't log in lockstep
+    phase = rng.uniform(0, interval)
+
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp(start) + pd.to_timedelta(np.arange(rows) * interval + phase, unit="s").floor("s"),
+        "Network_Type": networks,
+        "Signal_dBm": signal,
+        "Location": np.array([f"Site-{i:03d}" for i in range(locations)], dtype=object)[location],
+        "Download_Mbps": np.round(rng.lognormal(3, 0.8, rows) * strength * ~failed, 2),
+        "Upload_Mbps": np.round(rng.lognormal(1.5, 0.8, rows) * strength * ~failed, 2),
+        "Latency_ms": np.round(rng.gamma(2, 15, rows) / strength, 1),
+        "Latitude": np.round(centers[location, 0] + rng.normal(0, 0.01, rows), 5),
+        "Longitude": np.round(centers[location, 1] + rng.normal(0, 0.01, rows), 5)
+    })
+
+
+def duration_for_rows(rows, devices, interval=DEFAULT_INTERVAL):
+    """The duration that gives a fleet of `devices` about `rows` readings in total."""
+    return pd.Timedelta(seconds=-(-rows // devices) * interval)
+
+
+def write_exports(folder, devices=10, duration="1D", interval=DEFAULT_INTERVAL, network_mix=NETWORK_MIX,
+                  locations=50, missing_columns=(), legacy_share=0.0, start=DEFAULT_START, seed=0):
+    """
+    Writes one CSV export per device (device-0000.csv, ...) covering
+    `duration` from `start`. Columns in missing_columns are left out of
+    every export, and the first legacy_share of the devices write the
+    Android logger's header spellings. Returns the paths written.
+    """
+    unknown = sorted(set(missing_columns) - set(OUTPUT_COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    os.makedirs(folder, exist_ok=True)
+
+    rows = int(pd.Timedelta(duration).total_seconds() // interval)
+    legacy_devices = int(round(devices * legacy_share))
+    # Like the Android logger's, exports don't name their device; the collector names it after the file
+    columns = [column for column in OUTPUT_COLUMNS if column != "Device_ID" and column not in missing_columns]
+    paths = []
+    for device in range(devices):
+        df = generate_device(rows, start, interval, network_mix, locations, seed=(seed, device))[columns]
+        style = HEADER_STYLES["android" if device < legacy_devices else "netpulse"]
+        path = os.path.join(folder, f"device-{device:04d}.csv")
+        df.rename(columns=style).to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic fleet exports")
+    parser.add_argument("folder")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--duration", default="1D", help="time covered per device, e.g. 6h or 7D")
+    parser.add_argument("--rows", type=int, help="total readings; overrides --duration")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between readings")
+    parser.add_argument("--network-mix", default=",".join(f"{k}={v}" for k, v in NETWORK_MIX.items()),
+                        help="network type weights, e.g. LTE=0.7,NR=0.3")
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--missing", default="", help="comma-separated columns to leave out")
+    parser.add_argument("--legacy-share", type=float, default=0.0, help="share of devices with Android headers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    network_mix = {name: float(weight) for name, weight in (item.split("=") for item in args.network_mix.split(","))}
+    duration = duration_for_rows(args.rows, args.devices, args.interval) if args.rows else args.duration
+    paths = write_exports(
+        args.folder, args.devices, duration, args.interval, network_mix, args.locations,
+        missing_columns=[column for column in args.missing.split(",") if column],
+        legacy_share=args.legacy_share, seed=args.seed
+    )
+    print(f"Wrote {len(paths)} exports to {args.folder}/")
+
+
+if __name__ == "__main__":
+    main()
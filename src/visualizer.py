@@ -1,21 +1,44 @@
-import pandas as pd
+import os
 import matplotlib.pyplot as plt
+import pandas as pd
+from src.downsample import minmax_indices
+from src.metrics import instrument, timed
+from src.store import read_dataset
+
+@instrument("visualize")
+def visualize_data(input_file, save_figures=False, output_dir="graphs", show=True):
+    # Interactive charts for exploring one dataset; scheduled/batch output
+    # goes through src.report, which never opens a window
+    if save_figures:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def finish(name):
+        with timed("visualize.render"):
+            if save_figures:
+                plt.savefig(os.path.join(output_dir, name))
+        if show:
+            plt.show()
+        else:
+            plt.close()
 
-def visualize_data(input_file, save_figures=False):
-    df = pd.read_csv(input_file)
+    # Timestamps come back already parsed from either source; a frame
+    # already in memory (e.g. from the CLI pipeline) is used as is
+    with timed("visualize.load"):
+        if isinstance(input_file, pd.DataFrame):
+            df = input_file
+        else:
+            df = read_dataset(input_file, columns=["Timestamp", "Network_Type", "Signal_dBm"])
 
     # ---- 1. Aggregate signal by Network Type ----
     if "Network_Type" in df.columns:
-        network_avg_signal = df.groupby("Network_Type")["Signal_dBm"].mean()
+        network_avg_signal = df.groupby("Network_Type", observed=True)["Signal_dBm"].mean()
         plt.figure(figsize=(8, 4))
         network_avg_signal.plot(kind="bar", color="skyblue")
         plt.xlabel("Network Type")
         plt.ylabel("Average Signal (dBm)")
         plt.title("Average Signal by Network Type")
         plt.grid(True)
-        if save_figures:
-            plt.savefig("graphs/signal_by_network_type.png")
-        plt.show()
+        finish("signal_by_network_type.png")
 
     # ---- 2. Signal distribution histogram ----
     plt.figure(figsize=(8, 4))
@@ -24,19 +47,17 @@ def visualize_data(input_file, save_figures=False):
     plt.ylabel("Frequency")
     plt.title("Signal Strength Distribution")
     plt.grid(axis="y")
-    if save_figures:
-        plt.savefig("graphs/signal_distribution.png")
-    plt.show()
+    finish("signal_distribution.png")
 
     # ---- 3. Time series of signal over time ----
     if "Timestamp" in df.columns:
-        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+        # Plot min/max per time bucket instead of every reading
+        df = df.sort_values("Timestamp")
+        points = df.iloc[minmax_indices(df["Timestamp"].to_numpy(), df["Signal_dBm"].to_numpy())]
         plt.figure(figsize=(10, 4))
-        plt.plot(df["Timestamp"], df["Signal_dBm"], marker='o', linestyle='-', color='green')
+        plt.plot(points["Timestamp"], points["Signal_dBm"], marker='o', linestyle='-', color='green')
         plt.xlabel("Time")
         plt.ylabel("Signal (dBm)")
         plt.title("Signal Variation Over Time")
         plt.grid(True)
-        if save_figures:
-            plt.savefig("graphs/signal_over_time.png")
-        plt.show()
+        finish("signal_over_time.png")
@@ -0,0 +1,39 @@
+import pytest
+from src.analyzer import analyze_data
+from src.collector import collect_data
+from src.store import load_readings
+from src.synth import write_exports
+
+FILTERS = {"start": "2025-01-01 01:00", "end": "2025-01-01 03:30", "network_types": ["LTE"],
+           "devices": ["device-0001"]}
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    exports = str(tmp_path_factory.mktemp("exports"))
+    store_dir = str(tmp_path_factory.mktemp("store"))
+    write_exports(exports, devices=3, duration="6h")
+    collect_data(exports, store_dir)
+    return store_dir
+
+
+def readings(summary):
+    return sum(summary["Signal Quality Distribution"].values())
+
+
+def test_frames_and_csvs_are_filtered_like_the_store(store, tmp_path):
+    frame = load_readings(store)
+    summary = analyze_data(store, **FILTERS)
+    assert 0 < readings(summary) < readings(analyze_data(frame)) / 10
+    assert analyze_data(frame, **FILTERS) == summary
+
+    path = tmp_path / "merged.csv"
+    frame.to_csv(path, index=False)
+    assert analyze_data(str(path), **FILTERS) == summary
+
+
+def test_a_filter_on_a_missing_column_raises(store):
+    frame = load_readings(store).drop(columns="Device_ID")
+    with pytest.raises(ValueError, match="Device_ID"):
+        analyze_data(frame, devices=["device-0001"])
+    assert readings(analyze_data(frame, network_types=["LTE"])) == (frame["Network_Type"] == "LTE").sum()
@@ -0,0 +1,34 @@
+import pandas as pd
+from src.anomaly import AnomalyDetector
+
+
+def poor_readings(seconds, start="2025-01-01 08:00:00"):
+    """LTE readings with Poor signal at the given seconds after start."""
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s"),
+        "Network_Type": "LTE",
+        "Signal_dBm": -110.0,
+        "Latency_ms": 40.0
+    })
+
+
+def poor_stretches(anomalies):
+    return anomalies[anomalies["kind"] == "poor_stretch"]
+
+
+def test_a_continuous_poor_stretch_is_flagged_once():
+    stretches = poor_stretches(AnomalyDetector().update(poor_readings(range(0, 300, 10))))
+    assert len(stretches) == 1
+    assert stretches["value"].iloc[0] == 60
+
+
+def test_a_time_gap_ends_a_poor_stretch():
+    # Two short Poor stretches three hours apart, in one batch and across two
+    seconds = [0, 30, 3 * 3600, 3 * 3600 + 30]
+    assert poor_stretches(AnomalyDetector().update(poor_readings(seconds))).empty
+
+    detector = AnomalyDetector()
+    assert poor_stretches(detector.update(poor_readings(seconds[:2]))).empty
+    assert poor_stretches(detector.update(poor_readings(seconds[2:]))).empty
+    # Without a gap the stretch carries over into the next batch
+    assert len(poor_stretches(detector.update(poor_readings([3 * 3600 + 60, 3 * 3600 + 90])))) == 1
@@ -0,0 +1,131 @@
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src import metrics
+from src.collector import _chunk_rows, collect_data
+from src.formats import FormatPlan
+from src.sessions import DWELL_COLUMNS, load_sessions
+from src.store import load_readings
+from src.synth import write_exports
+
+
+@pytest.fixture
+def recorded():
+    """Records metrics for the test, then turns them off again."""
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.enable(False)
+    metrics.reset()
+
+
+def store_contents(store_dir):
+    """
+    Every table of a store as a frame sorted by all its columns, plus its row
+    keys and JSON state. Session spans and dwell are kept per batch, so they
+    are compared merged.
+    """
+    roots = set()
+    for path in glob.glob(os.path.join(store_dir, "**", "*.parquet"), recursive=True):
+        parts = os.path.relpath(path, store_dir).split(os.sep)
+        # A hive-partitioned table is read as a whole, since files are split differently per run
+        partition = next((i for i, part in enumerate(parts) if "=" in part), len(parts))
+        roots.add(os.path.join(*parts[:partition]))
+
+    contents = {}
+    for root in sorted(roots):
+        df = pd.read_parquet(os.path.join(store_dir, root))
+        df = df.astype({column: "object" for column in df.select_dtypes("category").columns})
+        if root == os.path.join("sessions", "spans"):
+            df = load_sessions(store_dir)
+        elif root == os.path.join("sessions", "dwell"):
+            df = df.groupby(DWELL_COLUMNS[:5], as_index=False).sum()
+        contents[root] = df.sort_values(list(df.columns), ignore_index=True)
+    for path in glob.glob(os.path.join(store_dir, "*", "state.json")):
+        with open(path) as f:
+            contents[os.path.relpath(path, store_dir)] = json.load(f)
+    contents["row_keys"] = np.load(os.path.join(store_dir, "row_keys.npy"))
+    return contents
+
+
+def assert_same_store(actual_dir, expected_dir):
+    actual, expected = store_contents(actual_dir), store_contents(expected_dir)
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual[name], value, check_dtype=False, obj=name)
+        elif isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(actual[name], value)
+        else:
+            assert actual[name] == value, name
+
+
+def test_repeated_collect_is_idempotent(tmp_path, recorded):
+    exports = str(tmp_path / "exports")
+    store = str(tmp_path / "store")
+    write_exports(exports, devices=2, duration="6h")
+
+    collect_data(exports, store)
+    rows = len(load_readings(store))
+    keys = np.load(tmp_path / "store" / "row_keys.npy")
+    assert rows == 2 * 6 * 3600 // 3
+
+    recorded.reset()
+    collect_data(exports, store)
+    counters = recorded.snapshot()["counters"]
+    # Unchanged exports are only stat'ed: nothing is read, parsed or appended
+    assert counters["collect.files_skipped"] == 2
+    assert counters.get("collect.files_read", 0) == 0
+    assert counters.get("collect.bytes_read", 0) == 0
+    assert counters.get("collect.rows_out", 0) == 0
+    assert len(load_readings(store)) == rows
+    np.testing.assert_array_equal(np.load(tmp_path / "store" / "row_keys.npy"), keys)
+
+
+def test_chunked_collect_keeps_every_row(tmp_path, monkeypatch):
+    exports = str(tmp_path / "exports")
+    [export] = write_exports(exports, devices=1, duration="36h")
+    rows = 36 * 3600 // 3
+    memory_limit_mb = 0.5
+    # Five times the limit, so the export is read in dozens of chunks
+    assert os.path.getsize(export) > 5 * memory_limit_mb * 2**20
+    assert rows > 20 * _chunk_rows(memory_limit_mb)
+
+    # Every chunk pandas parses, as (rows, bytes in memory)
+    chunk_sizes, parsed = [], []
+    read_csv, apply = FormatPlan.read_csv, FormatPlan.apply
+
+    def recording_read_csv(plan, source, **options):
+        chunk_sizes.append(options.get("chunksize"))
+        return read_csv(plan, source, **options)
+
+    def recording_apply(plan, df):
+        parsed.append((len(df), df.memory_usage(deep=True).sum()))
+        return apply(plan, df)
+
+    monkeypatch.setattr(FormatPlan, "read_csv", recording_read_csv)
+    monkeypatch.setattr(FormatPlan, "apply", recording_apply)
+    collect_data(exports, str(tmp_path / "chunked"), memory_limit_mb=memory_limit_mb)
+    monkeypatch.undo()
+
+    assert chunk_sizes == [_chunk_rows(memory_limit_mb)]
+    assert len(parsed) > 20
+    # No parsed chunk holds more rows than the limit allows, or more memory than the limit
+    assert max(chunk_rows for chunk_rows, _ in parsed) <= _chunk_rows(memory_limit_mb)
+    assert max(chunk_bytes for _, chunk_bytes in parsed) <= memory_limit_mb * 2**20
+
+    collect_data(exports, str(tmp_path / "whole"), memory_limit_mb=1024)
+    assert len(load_readings(str(tmp_path / "chunked"))) == rows
+    assert_same_store(str(tmp_path / "chunked"), str(tmp_path / "whole"))
+
+
+def test_parallel_collect_matches_serial(tmp_path):
+    exports = str(tmp_path / "exports")
+    write_exports(exports, devices=4, duration="6h", legacy_share=0.25)
+
+    collect_data(exports, str(tmp_path / "serial"))
+    collect_data(exports, str(tmp_path / "parallel"), workers=2)
+    assert_same_store(str(tmp_path / "parallel"), str(tmp_path / "serial"))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from src.downsample import downsample_frame, minmax_indices
+
+
+def readings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.date_range("2025-01-01", periods=rows, freq="3s"),
+        "Signal_dBm": rng.normal(-80, 8, rows).round(1)
+    })
+
+
+def test_every_bucket_keeps_its_min_and_max():
+    df = readings(50_000)
+    budget = 200
+    kept = df.iloc[minmax_indices(df["Timestamp"].to_numpy(), df["Signal_dBm"].to_numpy(), budget)]
+    assert len(kept) <= budget
+
+    # The same equal-width buckets minmax_indices splits the range into
+    x = df["Timestamp"].to_numpy().view("int64")
+    span = x[-1] - x[0]
+    buckets = np.minimum((x - x[0]) / span * (budget // 2), budget // 2 - 1).astype("int64")
+    expected = df.groupby(buckets)["Signal_dBm"].agg(["min", "max"])
+    kept_buckets = buckets[kept.index]
+    actual = kept.groupby(kept_buckets)["Signal_dBm"].agg(["min", "max"])
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_spikes_survive():
+    df = readings(100_000)
+    df.loc[31_337, "Signal_dBm"] = -140.0
+    df.loc[77_777, "Signal_dBm"] = -20.0
+    kept = downsample_frame(df, by=None, point_budget=100)
+    assert {31_337, 77_777} <= set(kept.index)
+
+
+def test_missing_timestamps_and_signals_are_skipped():
+    df = readings(5_000)
+    df.loc[10, "Signal_dBm"] = np.nan
+    # An unparseable timestamp: NaT sorts last, as the visualizer orders rows
+    df = pd.concat([df, pd.DataFrame({"Timestamp": [pd.NaT], "Signal_dBm": [-75.0]})], ignore_index=True)
+
+    kept = minmax_indices(df["Timestamp"].to_numpy(), df["Signal_dBm"].to_numpy(), point_budget=2000)
+    assert len(df) - 1 not in kept and 10 not in kept
+    # The range is still split over the valid readings, not collapsed into a few buckets
+    assert len(kept) > 1900
@@ -0,0 +1,33 @@
+import io
+import numpy as np
+from src.collector import collect_data
+from src.formats import detect_format
+from src.store import load_readings
+from src.synth import write_exports
+
+EXPORT = """Timestamp,Network_Type,Signal_dBm,Location,Download_Mbps,Upload_Mbps,Latency_ms
+2025-01-01 08:00:00,LTE,-90,Site-001,12.5,3.1,40
+2025-01-01 08:00:03,LTE,N/A,Site-001,--,3.0,41
+2025-01-01 08:00:06,NR,-80,Site-002,100.0,20.5,
+"""
+
+
+def test_malformed_numeric_cells_become_missing():
+    plan = detect_format(EXPORT.splitlines()[0].split(","))
+    df = plan.apply(plan.read_csv(io.StringIO(EXPORT)))
+    np.testing.assert_array_equal(df["Signal_dBm"], [-90, np.nan, -80])
+    np.testing.assert_array_equal(df["Download_Mbps"], [12.5, np.nan, 100.0])
+    np.testing.assert_array_equal(df["Latency_ms"], [40, 41, np.nan])
+    assert list(df["Network_Type"]) == ["LTE", "LTE", "NR"]
+
+
+def test_a_malformed_export_doesnt_stop_the_others(tmp_path):
+    exports = tmp_path / "exports"
+    write_exports(str(exports), devices=2, duration="1h")
+    (exports / "vendor.csv").write_text(EXPORT)
+
+    collect_data(str(exports), str(tmp_path / "store"))
+    readings = load_readings(str(tmp_path / "store"))
+    assert len(readings) == 2 * 3600 // 3 + 3
+    vendor = readings[readings["Device_ID"] == "vendor"].sort_values("Timestamp")
+    np.testing.assert_array_equal(vendor["Signal_dBm"], [-90, np.nan, -80])
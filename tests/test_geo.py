@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+from src.geo import GEO_PRECISIONS, MAX_PRECISION, compute_cells, coverage_cells, geo_path, load_cells, update_cells
+from src.synth import generate_device
+
+
+def test_incremental_updates_match_a_single_update(tmp_path):
+    batches = [generate_device(5000, locations=200, seed=seed) for seed in range(5)]
+    for batch in batches:
+        update_cells(str(tmp_path / "incremental"), [compute_cells(batch)])
+    update_cells(str(tmp_path / "whole"), [compute_cells(pd.concat(batches, ignore_index=True))])
+
+    for precision in GEO_PRECISIONS:
+        cells = load_cells(str(tmp_path / "incremental"), precision)
+        assert cells["cell"].is_monotonic_increasing
+        pd.testing.assert_frame_equal(cells, load_cells(str(tmp_path / "whole"), precision))
+
+
+def test_a_batch_rewrites_only_the_partitions_it_touches(tmp_path):
+    store = str(tmp_path)
+    update_cells(store, [compute_cells(generate_device(20_000, locations=500))])
+    path = geo_path(store, MAX_PRECISION)
+    files = sorted(os.listdir(path))
+    assert len(files) > 1
+    before = {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in files}
+
+    # A few readings around a single spot
+    spot = generate_device(100, seed=1).assign(Latitude=40.0, Longitude=-74.0)
+    update_cells(store, [compute_cells(spot)])
+    after = {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in files}
+    assert sum(before[name] != after[name] for name in files) <= 1
+    assert load_cells(store, MAX_PRECISION)["rows"].sum() == 20_100
+
+
+def test_computed_cells_map_like_a_store_of_them(tmp_path):
+    readings = generate_device(5000, locations=20)
+    update_cells(str(tmp_path), [compute_cells(readings)])
+
+    for bbox in (None, (9, 11, 74, 76)):
+        expected, precision = coverage_cells(str(tmp_path), bbox, ["LTE"])
+        cells, computed_precision = coverage_cells(bbox=bbox, network_types=["LTE"], computed=compute_cells(readings))
+        assert computed_precision == precision
+        pd.testing.assert_frame_equal(cells, expected)
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+from src.leaderboard import (
+    ALL_NETWORKS, HISTOGRAM_KEYS, compute_histograms, histogram_stats, leaderboard_path, load_leaderboard,
+    network_leaderboard, top_locations, update_histograms
+)
+
+
+def readings(rows, locations, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Location": rng.choice([f"Site-{i:03d}" for i in range(locations)], rows),
+        "Network_Type": rng.choice(["LTE", "NR", "HSPA"], rows),
+        "Signal_dBm": rng.normal(-90, 10, rows).round()
+    })
+
+
+def sorted_frame(df, keys):
+    return df.astype({key: str for key in keys}).sort_values(keys, ignore_index=True)
+
+
+def test_incremental_updates_match_a_single_update(tmp_path):
+    batches = [readings(5000, 200, seed) for seed in range(5)]
+    for batch in batches:
+        update_histograms(str(tmp_path / "incremental"), [compute_histograms(batch)])
+    update_histograms(str(tmp_path / "whole"), [compute_histograms(pd.concat(batches, ignore_index=True))])
+
+    for name, keys in (("histograms", HISTOGRAM_KEYS + ["bin"]), ("index", HISTOGRAM_KEYS)):
+        pd.testing.assert_frame_equal(
+            sorted_frame(load_leaderboard(str(tmp_path / "incremental"), name), keys),
+            sorted_frame(load_leaderboard(str(tmp_path / "whole"), name), keys)
+        )
+
+    everything = compute_histograms(pd.concat(batches, ignore_index=True))
+    expected = histogram_stats(everything, ["Location"]).nlargest(10, "mean", keep="first")
+    top = top_locations(str(tmp_path / "incremental"), k=10)
+    assert list(top["Location"]) == list(expected["Location"])
+    assert (top["Network_Type"] == ALL_NETWORKS).all()
+    assert list(network_leaderboard(str(tmp_path / "incremental"))["Network_Type"]) == \
+        list(histogram_stats(everything, ["Network_Type"]).sort_values("mean", ascending=False)["Network_Type"])
+
+
+def test_a_batch_rewrites_only_the_partitions_it_touches(tmp_path):
+    store = str(tmp_path)
+    update_histograms(store, [compute_histograms(readings(20_000, 500, 0))])
+    files = sorted(os.listdir(leaderboard_path(store, "histograms")))
+    before = {name: os.stat(os.path.join(leaderboard_path(store, "histograms"), name)).st_mtime_ns for name in files}
+
+    update_histograms(store, [compute_histograms(readings(100, 1, 1))])
+    after = {name: os.stat(os.path.join(leaderboard_path(store, "histograms"), name)).st_mtime_ns for name in files}
+    assert sum(before[name] != after[name] for name in files) == 1
+    assert top_locations(store, k=1, metric="count", min_samples=0)["count"].iloc[0] >= 100
+
+
+def test_given_histograms_rank_like_a_store_of_them(tmp_path):
+    readings_ = readings(5000, 50, 0)
+    update_histograms(str(tmp_path), [compute_histograms(readings_)])
+    histogram = compute_histograms(readings_)
+
+    for network_types in (None, ["LTE"], ["LTE", "NR"]):
+        pd.testing.assert_frame_equal(
+            sorted_frame(top_locations(k=5, network_types=network_types, histogram=histogram), ["Location"]),
+            sorted_frame(top_locations(str(tmp_path), k=5, network_types=network_types), ["Location"]),
+            check_dtype=False, check_categorical=False
+        )
+    pd.testing.assert_frame_equal(network_leaderboard(histogram=histogram), network_leaderboard(str(tmp_path)),
+                                  check_dtype=False, check_categorical=False)
@@ -0,0 +1,35 @@
+import threading
+import time
+from src.live import LogTailer
+from benchmarks.live_latency import export_lines
+
+
+def test_concurrent_polls_read_every_line_once(tmp_path):
+    header, lines = export_lines(20_000)
+    path = tmp_path / "signal_log.csv"
+    path.write_bytes(header)
+    tailer = LogTailer(str(tmp_path))
+    tailer.poll()
+
+    done = threading.Event()
+
+    def poll_until_done():
+        while not done.is_set():
+            tailer.poll()
+
+    # Like several dashboard sessions sharing one tailer
+    pollers = [threading.Thread(target=poll_until_done) for _ in range(4)]
+    for poller in pollers:
+        poller.start()
+    with open(path, "ab") as f:
+        for start in range(0, len(lines), 200):
+            f.write(b"".join(lines[start:start + 200]))
+            f.flush()
+            time.sleep(0.001)
+    done.set()
+    for poller in pollers:
+        poller.join()
+    tailer.poll()
+
+    timestamps = tailer.buffer.to_frame()["Timestamp"]
+    assert len(timestamps) == len(lines) and timestamps.is_unique
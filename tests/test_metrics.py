@@ -0,0 +1,50 @@
+import threading
+from src import metrics
+
+
+def record_in_thread(registry, stage):
+    def run():
+        metrics.use(registry)
+        metrics.enable()
+        with metrics.timed(stage):
+            metrics.count(f"{stage}.calls")
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+
+def test_registries_record_separately():
+    first, second = metrics.Registry(enabled=False), metrics.Registry(enabled=False)
+    record_in_thread(first, "first")
+
+    assert first.enabled and set(first.stages) == {"first"} and first.counters == {"first.calls": 1}
+    # Another session's registry and the process-wide one are left alone
+    assert not second.enabled and not second.stages and not second.counters
+    assert not metrics.enabled() and metrics.snapshot() == {"stages": {}, "counters": {}}
+
+    metrics.use(first)
+    try:
+        assert metrics.snapshot()["counters"] == {"first.calls": 1}
+        metrics.reset()
+        assert not first.stages and not first.counters
+    finally:
+        metrics.use()
+
+
+def test_resetting_a_session_leaves_the_process_registry_alone():
+    session = metrics.Registry(enabled=False)
+    record_in_thread(session, "session")
+    metrics.enable()
+    try:
+        with metrics.timed("process"):
+            pass
+        # Like a button callback: a new thread that hasn't switched to the session's registry
+        thread = threading.Thread(target=metrics.reset, args=(session,))
+        thread.start()
+        thread.join()
+
+        assert not session.stages and not session.counters
+        assert set(metrics.snapshot()["stages"]) == {"process"}
+    finally:
+        metrics.enable(False)
+        metrics.reset()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analyzer import analyze_data, summarize
+from src.collector import collect_data
+from src.compaction import expire_store
+from src.rollups import split_range
+from src.store import load_readings
+from src.synth import write_exports
+
+
+def collect(tmp_path, duration, interval):
+    exports = str(tmp_path / "exports")
+    store = str(tmp_path / "store")
+    write_exports(exports, devices=2, duration=duration, interval=interval)
+    collect_data(exports, store)
+    return store
+
+
+def assert_same_summary(actual, expected):
+    assert actual["Signal Quality Distribution"] == expected["Signal Quality Distribution"]
+    for name in ("Average Signal (dBm)", "Average Download Speed (Mbps)", "Average Latency (ms)"):
+        assert np.isclose(actual[name], expected[name], atol=0.01)
+
+
+def test_split_range():
+    t = pd.Timestamp
+    assert split_range("2025-01-01 00:00:01", "2025-01-01 00:00:05", "1min") == (
+        (t("2025-01-01 00:01"), t("2025-01-01 00:00")), [(t("2025-01-01 00:00:01"), t("2025-01-01 00:00:05"))]
+    )
+    assert split_range("2025-01-01 00:00:30", "2025-01-01 00:02:30", "1min") == (
+        (t("2025-01-01 00:01"), t("2025-01-01 00:02")),
+        [(t("2025-01-01 00:00:30"), t("2025-01-01 00:01")), (t("2025-01-01 00:02"), t("2025-01-01 00:02:30"))]
+    )
+    assert split_range("2025-01-01", None, "1min") == ((t("2025-01-01"), None), [])
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2025-01-01 00:00:01", "2025-01-01 00:00:05"),
+    ("2025-01-01 00:00:30", "2025-01-01 00:01:30"),
+    ("2025-01-01 00:10:59", "2025-01-01 01:20:01"),
+    ("2025-01-01 00:59:00", "2025-01-01 01:00:00"),
+    (None, "2025-01-01 00:30:40")
+])
+def test_unaligned_ranges_match_the_readings(tmp_path, start, end):
+    store = collect(tmp_path, "2h", 3)
+    expected = summarize(load_readings(store, start=start, end=end)).as_dict()
+    assert sum(expected["Signal Quality Distribution"].values()) > 0
+    assert_same_summary(analyze_data(store, start, end), expected)
+
+
+def test_ranges_reaching_into_expired_tiers(tmp_path):
+    store = collect(tmp_path, "4D", 60)
+    # Before expiry, as answered from the 1-minute rollups and the raw readings
+    expected = analyze_data(store, "2025-01-01 05:00", "2025-01-04 12:00:30")
+    expire_store(store, raw_days=1, minute_days=2)
+
+    # 1-minute rollups are kept from Jan 3, raw readings from Jan 4
+    assert_same_summary(analyze_data(store, "2025-01-01 05:00", "2025-01-04 12:00:30"), expected)
+    analyze_data(store, "2025-01-03 05:30", "2025-01-04 12:00")
+    with pytest.raises(ValueError, match="on the hour"):
+        analyze_data(store, "2025-01-01 05:30", "2025-01-04")
+    with pytest.raises(ValueError, match="on a minute"):
+        analyze_data(store, "2025-01-03 05:30:10", "2025-01-04")
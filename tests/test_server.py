@@ -0,0 +1,18 @@
+from http import HTTPStatus
+from src.server import parse_uploads
+
+GOOD = b'{"Timestamp": "2025-01-01 08:00:00", "Network_Type": "LTE", "Signal_dBm": -90}\n'
+NESTED = [
+    b'{"Timestamp": "2025-01-01 08:00:03", "Network_Type": {"name": "LTE"}, "Signal_dBm": -91}\n',
+    b'{"Timestamp": "2025-01-01 08:00:06", "Network_Type": "LTE", "Signal_dBm": [-92, -93]}\n'
+]
+
+
+def test_nested_json_refuses_only_its_upload():
+    uploads = [(GOOD, "application/json", "phone"), *((body, "application/json", "phone") for body in NESTED),
+               (b"Timestamp,Network_Type,Signal_dBm\n2025-01-01 08:00:09,NR,-80\n", "text/csv", "phone")]
+    frames, errors = parse_uploads(uploads)
+
+    assert sorted(errors) == [1, 2]
+    assert all(error.status == HTTPStatus.BAD_REQUEST for error in errors.values())
+    assert sorted(signal for frame in frames for signal in frame["Signal_dBm"]) == [-90, -80]
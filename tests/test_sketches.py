@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.sketches import (
+    MIN_VALUE, RELATIVE_ACCURACY, SKETCH_QUANTILES, compute_sketches, exact_quantiles, merge_sketches,
+    sketch_quantiles
+)
+
+
+def readings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 3 * 86400, rows), unit="s"),
+        "Network_Type": rng.choice(["LTE", "NR", "HSPA"], rows),
+        "Signal_dBm": np.round(rng.normal(-95, 10, rows)),
+        # Failed speed tests report 0 Mbps
+        "Download_Mbps": rng.lognormal(3, 1, rows) * (rng.random(rows) > 0.1),
+        "Upload_Mbps": rng.lognormal(1, 1, rows),
+        "Latency_ms": rng.gamma(2, 30, rows)
+    })
+
+
+def assert_within_bound(estimates, exact):
+    labels = list(SKETCH_QUANTILES)
+    assert (estimates["count"] == exact.loc[estimates.index, "count"]).all()
+    estimated, expected = estimates[labels].to_numpy(), exact.loc[estimates.index, labels].to_numpy()
+    # Values under MIN_VALUE are reported as 0, an absolute error below it
+    errors = np.abs(estimated - expected) / np.maximum(np.abs(expected), MIN_VALUE)
+    assert errors.max() <= RELATIVE_ACCURACY
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    return readings(200_000)
+
+
+def test_quantiles_are_within_the_relative_accuracy(fleet):
+    sketch = compute_sketches(fleet)["1d"]
+    assert_within_bound(sketch_quantiles(sketch), exact_quantiles(fleet))
+
+
+def test_merged_sketches_keep_the_bound(fleet):
+    batches = [compute_sketches(fleet.iloc[start:start + 30_000]) for start in range(0, len(fleet), 30_000)]
+    merged = {name: merge_sketches([batch[name] for batch in batches]) for name in batches[0]}
+
+    # Merging is lossless: the same bins as sketching everything at once
+    def bins(sketch):
+        sketch = sketch.astype({"Network_Type": str, "metric": str})
+        return sketch.sort_values(["bucket", "Network_Type", "metric", "key"], ignore_index=True)
+
+    pd.testing.assert_frame_equal(bins(merged["1h"]), bins(compute_sketches(fleet)["1h"]))
+
+    assert_within_bound(sketch_quantiles(merged["1d"]), exact_quantiles(fleet))
+    per_network = sketch_quantiles(merged["1h"], by=["Network_Type", "metric"])
+    for network, group in fleet.groupby("Network_Type"):
+        assert_within_bound(per_network.loc[network], exact_quantiles(group))
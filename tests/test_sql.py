@@ -0,0 +1,32 @@
+import pytest
+from src.collector import collect_data
+from src.sql import connect, run_query
+from src.synth import write_exports
+
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    exports = str(tmp_path_factory.mktemp("exports"))
+    store_dir = str(tmp_path_factory.mktemp("store"))
+    write_exports(exports, devices=2, duration="2h")
+    collect_data(exports, store_dir)
+    return store_dir
+
+
+def test_queries_share_one_connection(store):
+    con = connect(store)
+    rows = run_query("SELECT count(*) AS n FROM readings", store, con=con)["n"].iloc[0]
+    assert rows == 2 * 2 * 3600 // 3
+    devices = run_query("SELECT DISTINCT Device_ID FROM readings", store, con=con)
+    assert len(devices) == 2
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_text('/etc/passwd')",
+    "SELECT * FROM read_csv('/etc/passwd')"
+])
+def test_files_outside_the_store_cannot_be_read(store, sql):
+    with pytest.raises(ValueError):
+        run_query(sql, store)